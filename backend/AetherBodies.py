@@ -5,7 +5,14 @@
 
 from os import walk, path, remove
 from datetime import datetime
-from SPKParser import SPKParser
+from collections import OrderedDict
+import time
+import multiprocessing
+import spiceypy as spice
+from SPKParser import SPKParser, readCoverage, mergeIntervals
+from KernelCatalog import KernelCatalog
+from BodyRecord import BodyRecord
+from CoverageIndex import CoverageIndex
 from pprint import pprint
 
 
@@ -13,7 +20,7 @@ def toDatetime(spice_datetime_str):
     """
     AetherBodies.py -- toDatetime
         This function converts a date/time string into a datetime object and returns it. The format of the inputted
-        string mirrors that of brief's output, and therefore the output of the SPKParser object.
+        string mirrors that of the output of the SPKParser object, which is the format brief prints.
 
     Params: spice_datetime_str <str>
 
@@ -35,6 +42,22 @@ def fromDatetime(dtime_obj):
     return dtime_obj.strftime("%Y-%m-%d %H:%M:%S.%f")
 
 
+def scanKernel(kern_path):
+    """
+    AetherBodies.py -- scanKernel
+        Runs in a worker process when kernels are scanned in parallel. It reads the coverage of a kernel and times it.
+
+    Params: kern_path <str> -- path to the binary SPK kernel
+
+    Returns: tuple(coverage, seconds <float>) -- coverage as returned by SPKParser.readCoverage
+    """
+
+    start_time = time.time()
+    coverage = readCoverage(kern_path)
+
+    return coverage, time.time() - start_time
+
+
 class AetherBodies:
     """
     AetherBodies class
@@ -45,18 +68,33 @@ class AetherBodies:
         keeping track of valid time ranges for ephemeris, and providing data to the available-bodies endpoint which is
         used to populate the bodies drop-down on the frontend. Each object in the dictionary represents a valid body
         stored in one or more of the SPICE kernels. These kernels are located in backend/SPICE/kernels and data
-        about each body and it's valid time ranges is obtained by using the command-line utility brief. Output from
-        brief is parsed using the SPKParser class.
+        about each body and it's valid time ranges is read from the segment summaries of each SPK kernel by the
+        SPKParser class.
     """
 
-    def __init__(self):
+    # smallest number of kernels worth starting worker processes for -- reading the summaries of a cached kernel takes
+    # about a millisecond, while spawning the workers takes seconds, so the pool only pays off for large catalogs (or
+    # kernels on slow storage)
+    PARALLEL_SCAN_MIN_KERNELS = 256
+
+    # directories (within backend/SPICE/kernels) holding kernels uploaded by users -- see SessionRegistry.py for the
+    # sessions directory
+    UPLOADED_DIRECTORIES = ('user_uploaded', 'sessions')
+
+    def __init__(self, scan_workers=1, catalog_path=None, base=None):
         """
         AetherBodies -- init
-            Create the AetherBodies object. No params are necessary for initialization. On initialization, the SPICE
-            kernel directories (default and user_uploaded within backend/SPICE/kernels) are traversed, and the bodies
-            dictionary is built based on the parsed brief output of each SPK kernel.
-
-        Params: None
+            Create the AetherBodies object. On initialization, the SPICE kernel directories (default and user_uploaded
+            within backend/SPICE/kernels) are traversed, and the bodies dictionary is built based on the parsed segment
+            summaries of each SPK kernel. With many kernels, the summaries are read by a pool of worker processes,
+            while the results are still added in the same (sorted path) order as a serial scan.
+
+        Params: scan_workers <int> OPTIONAL -- number of worker processes reading kernels at startup, 1 to scan serially
+                catalog_path <str> OPTIONAL -- path of the kernel catalog database (see KernelCatalog.py), so that only
+                    new or changed kernels are read at startup. Every kernel is read if None.
+                base <AetherBodies> OPTIONAL -- start from the kernels of another AetherBodies object instead of
+                    scanning the directories, in the same order and from the coverage it already read. Used to layer a
+                    session's uploaded kernels over the REST server's (see KernelSession.py).
 
         Returns: None
         """
@@ -64,54 +102,63 @@ class AetherBodies:
         # The SPK Parser object -- used for extracting data about bodies and time ranges from binary SPK kernels
         self.spk_parser = SPKParser()
 
+        # snapshot of the coverage read from each kernel by previous runs
+        self.kernel_catalog = KernelCatalog(catalog_path) if catalog_path else None
+
         # ---------- FORMAT OF BODIES DICTIONARY ----------
         # key: NAIF ID <int>
-        # value: data tuple
-        #     ( name <str>, valid times list[tuple[time_start <datetime>, time_end <datetime>]],
-        #       rotationData <bool>, radiusData <bool>, massData <bool>, category <int>, uploaded <bool> )
+        # value: <BodyRecord> -- see BodyRecord.py
 
         # empty dictionary to hold body info
         self.bodies = dict()
 
+        # index of body names -- key: name <str>, value: NAIF ID <int>. If several bodies share a name, the first wins.
+        self.name_ids = dict()
+
+        # other names SPICE knows bodies and barycenters by (e.g. 'ssb'), resolved with bodn2c the first time they're
+        # seen -- key: name <str>, value: NAIF ID <int>
+        self.aliases = dict()
+
+        # paths of the SPK kernels covering each NAIF ID (barycenters included), and the NAIF IDs in each kernel
+        self.body_kernels = dict()
+        self.kernel_bodies = dict()
+
+        # coverage of each SPK kernel (see SPKParser.readCoverage), in the order the kernels were added
+        self.kernel_coverage = OrderedDict()
+
         # mapping of names and NAIF IDs of main barycenters
         self.barycenters = [(0, "solar system barycenter"), (1, "mercury barycenter"), (2, "venus barycenter"),
                             (3, "earth barycenter"), (4, "mars barycenter"), (5, "jupiter barycenter"),
                             (6, "saturn barycenter"), (7, "uranus barycenter"), (8, "neptune barycenter"),
                             (9,"pluto barycenter")]
 
-        # NAIF IDs of default bodies for which there is no rotation data
-        # Rotation data is obtained via the pck00010.tpc kernel, which does not include info for these IDs
-        self.no_rotation = (607, 632, 634, 802, 902, 903, 904, 905)
+        # index of barycenter names -- key: name <str>, value: NAIF ID <int>
+        self.barycenter_ids = dict((name, bary_id) for bary_id, name in self.barycenters)
+
+        # index of the valid time ranges of every body, built the first time it's queried -- see getBodiesCovering
+        self.coverage_index = None
+
+        # centers of the segments of each NAIF ID over every kernel, built the first time it's needed -- see
+        # getChainKernelPaths
+        self.center_index = None
 
-        # Similarly to self.no_rotation above, these NAIF IDs do not have radii data within the default PCK kernels
-        self.no_radius = (902, 903, 904, 905)
+        # physical constants the has rotation/radius/mass data flags are derived from -- see setBodyConstants
+        self.body_constants = None if base is None else base.body_constants
 
-        # NAIF IDs of default bodies for which there is no mass data
-        # Mass data is obtained via the gm_de431.tpc kernel, which does not include info for these IDs
-        self.no_mass = (905, 802, 808, 514, 515, 516, 612, 613, 614, 632, 634)
+        # no file is read again
+        if base is not None:
+            for kern_path in base.getKernels():
+                self.addFromKernel(kern_path, coverage=base.getKernelCoverage(kern_path))
 
-        # Since one of the default SPK kernels in Aether includes data for 300 asteroids and dwarf planets, it is easier
-        # to specify which of those do have radius and mass data, since the vast majority do not.
-        # These NAIF IDs do have either radii or mass data within the PCK kernels
-        self.asteroids_with_radius = (2000001, 2000004, 2000021, 2000433, 2000511)
-        self.asteroids_with_mass = (2000001, 2000002, 2000003, 2000004, 2000006, 2000007, 2000010, 2000015, 2000016,
-                                    2000029, 2000052, 2000065, 2000087, 2000088, 2000433, 2000511, 2000704)
+            return
 
-        # traverse the default kernel directory, add all the bodies from each SPK kernel to the bodies dictionary
-        for root, dirs, files in walk('./SPICE/kernels/default/', topdown=True):
-            for name in files:
-                kern_path = path.join(root, name)
-                if kern_path.endswith('.bsp'):
-                    self.addFromKernel(kern_path)
+        # the default kernels are added before the uploaded ones, each directory in sorted order
+        kern_paths = self.__findKernels('./SPICE/kernels/default/') + \
+            self.__findKernels('./SPICE/kernels/user_uploaded/')
 
-        # traverse the user_uploaded kernel directory, add all the bodies from each SPK kernel to the bodies dictionary
-        for root, dirs, files in walk('./SPICE/kernels/user_uploaded/', topdown=True):
-            for name in files:
-                kern_path = path.join(root, name)
-                if kern_path.endswith('.bsp'):
-                    self.addFromKernel(kern_path)
+        self.__scanKernels(kern_paths, scan_workers)
 
-    def addFromKernel(self, kern_path, returnNewBodies=False):
+    def addFromKernel(self, kern_path, returnNewBodies=False, coverage=None, body_ids=None):
         """
         AetherBodies -- addFromKernel
             This method takes a path to a binary SPK kernel, parses metadata out of it and adds that information to
@@ -122,10 +169,16 @@ class AetherBodies:
         Params: kern_path <str> -- path to the binary SPK kernel to add bodies from
                 returnNewBodies <bool> False by default -- return info on bodies which did not exist in the dictionary
                     prior to running this method on a new kernel.
+                coverage OPTIONAL -- the kernel's coverage if it was already read, see SPKParser.readCoverage
+                body_ids set[<int>] OPTIONAL -- only add these bodies from the kernel, used by removeKernels to rebuild
+                    the bodies a removed kernel covered. Every body is added if None.
 
         Returns: list[<dict>] -- only has a return value when returnNewBodies is declared True
         """
 
+        # the same kernel may be given as e.g. SPICE/... or ./SPICE/...
+        kern_path = path.normpath(kern_path)
+
         # empty list to hold IDs of new bodies that were added
         newly_added_bodies = list()
 
@@ -136,22 +189,42 @@ class AetherBodies:
         # flag specifying whether or not the kernel is default, or uploaded by a user
         uploaded = False
 
-        # check if the kernel came from the user_uploaded directory, if so, set uploaded flag to True
-        if 'user_uploaded' in kern_path.split('/'):
+        # check if the kernel came from the user_uploaded (or a session's) directory, if so, set uploaded flag to True
+        if not set(self.UPLOADED_DIRECTORIES).isdisjoint(kern_path.split('/')):
             uploaded = True
 
+        if coverage is None:
+            coverage = readCoverage(kern_path)
+
+            # kernels added after startup (e.g. uploads) go in the kernel catalog too
+            if self.kernel_catalog is not None:
+                self.kernel_catalog.put(kern_path, coverage)
+                self.kernel_catalog.commit()
+
+        # kept so that the bodies can be rebuilt from the remaining kernels when a kernel is removed
+        self.kernel_coverage[kern_path] = coverage
+
         # parse metadata from the kernel using the SPK Parser object
-        parsed_bodies = self.spk_parser.parse(kern_path)
+        parsed_bodies = self.spk_parser.parse(kern_path, coverage)
 
         # traverse the parsed output
         for bod_group in parsed_bodies:
 
+            # remember which kernel covers each body, barycenters included, since they may be observers
+            for body_tuple in bod_group['bodies']:
+                self.body_kernels.setdefault(body_tuple[2], set()).add(kern_path)
+                self.kernel_bodies.setdefault(kern_path, set()).add(body_tuple[2])
+
             # Disregard barycenters
             for body_tuple in [tupe for tupe in bod_group['bodies'] if not tupe[0].endswith('BARYCENTER')]:
 
                 # get body ID
                 body_id = body_tuple[2]
 
+                # only the requested bodies are being rebuilt
+                if body_ids is not None and body_id not in body_ids:
+                    continue
+
                 # check if the body exists in the dictionary already
                 if body_id not in self.bodies:
                     # Set category based on NAIF ID
@@ -177,29 +250,22 @@ class AetherBodies:
                     elif body_id == 10:
                         category = 10
 
-                    # check if kernel is uploaded or default and add info to the dictionary accordingly
-                    # bodies in default kernels may have radii, mass, rotation data, so you need to check
-                    if not uploaded:
-                        self.bodies[body_id] = [
-                            body_tuple[0].lower(),
-                            [(toDatetime(bod_group['time_start']), toDatetime(bod_group['time_end']))],
-                            body_id not in self.no_rotation and 9 < body_id < 1000,
-                            self.__has_radius(body_id),
-                            self.__has_mass(body_id),
-                            category,
-                            uploaded
-                        ]
-                    # bodies in uploaded kernels do not have radii, mass, rotation data
-                    else:
-                        self.bodies[body_id] = [
-                            body_tuple[0].lower(),
-                            [(toDatetime(bod_group['time_start']), toDatetime(bod_group['time_end']))],
-                            False,
-                            False,
-                            False,
-                            category,
-                            uploaded
-                        ]
+                    # the flags follow whatever the loaded PCK kernels hold for the body, uploaded or not
+                    has_rotation, has_radius, has_mass = self.__constantFlags(body_id)
+
+                    self.bodies[body_id] = BodyRecord(
+                        body_tuple[0].lower(),
+                        [(toDatetime(bod_group['time_start']), toDatetime(bod_group['time_end']))],
+                        [(bod_group['et_start'], bod_group['et_end'])],
+                        has_rotation,
+                        has_radius,
+                        has_mass,
+                        category,
+                        uploaded
+                    )
+
+                    # index the name
+                    self.name_ids.setdefault(self.bodies[body_id].name, body_id)
 
                     # append ID to list of newly added bodies
                     newly_added_bodies.append(body_id)
@@ -207,8 +273,9 @@ class AetherBodies:
                 # the body already exists in the dictionary
                 else:
                     # append the start and end times to the list of time ranges for that body
-                    self.bodies[body_id][1].append((toDatetime(bod_group['time_start']),
-                                                    toDatetime(bod_group['time_end'])))
+                    self.bodies[body_id].valid_times.append((toDatetime(bod_group['time_start']),
+                                                             toDatetime(bod_group['time_end'])))
+                    self.bodies[body_id].et_times.append((bod_group['et_start'], bod_group['et_end']))
 
                     # append the ID to the list of bodies that need time intervals to be merged
                     merge_time_ids.add(body_id)
@@ -216,10 +283,20 @@ class AetherBodies:
         # traverse bodies that need time intervals merged
         for body_id in merge_time_ids:
             # call private class method to merge the time intervals of the specified body
-            merged_times = self.__mergeTimeIntervals(self.bodies[body_id][1])
+            merged_times = self.__mergeTimeIntervals(self.bodies[body_id].valid_times)
 
             # assign time interval list to the newly merged one
-            self.bodies[body_id][1] = merged_times
+            self.bodies[body_id].valid_times = merged_times
+
+            # the exact ETs are merged the same way
+            self.bodies[body_id].et_times = list(mergeIntervals(self.bodies[body_id].et_times))
+
+        # kernels may change which names SPICE knows
+        self.aliases = dict()
+
+        # valid time ranges and segment centers changed
+        self.coverage_index = None
+        self.center_index = None
 
         # check if newly added bodies should be returned -- this is False by default
         if returnNewBodies:
@@ -231,38 +308,123 @@ class AetherBodies:
                 # return empty list
                 return list()
 
+    def removeKernels(self, kern_paths):
+        """
+        AetherBodies -- removeKernels
+            Removes SPK kernels. Bodies only covered by the removed kernels are removed from the dictionary, the others
+            are rebuilt from the remaining kernels (in the order they were added) so that their valid time ranges no
+            longer include the removed kernels'. Only bodies covered by the removed kernels are touched.
+
+        Params: kern_paths list[<str>] -- paths to the binary SPK kernels, which may no longer exist
+
+        Returns: list[tuple[<str>, <int>]] -- name and NAIF ID of each body which was removed
+        """
+
+        kern_paths = [path.normpath(kern_path) for kern_path in kern_paths]
+        kern_paths = [kern_path for kern_path in kern_paths if kern_path in self.kernel_coverage]
+
+        if not kern_paths:
+            return list()
+
+        for kern_path in kern_paths:
+            del self.kernel_coverage[kern_path]
+
+        if self.kernel_catalog is not None:
+            self.kernel_catalog.discard(kern_paths)
+            self.kernel_catalog.commit()
+
+        # forget which bodies the kernels covered
+        kern_ids = set()
+        for kern_path in kern_paths:
+            for bod_id in self.kernel_bodies.pop(kern_path, set()):
+                kern_ids.add(bod_id)
+
+                self.body_kernels[bod_id].discard(kern_path)
+                if not self.body_kernels[bod_id]:
+                    del self.body_kernels[bod_id]
+
+        # drop the records of the kernels' bodies, then add them back from the other kernels covering them
+        affected = dict((bod_id, self.bodies.pop(bod_id)) for bod_id in kern_ids if bod_id in self.bodies)
+
+        for other_path, coverage in list(self.kernel_coverage.items()):
+            if not affected.keys().isdisjoint(self.kernel_bodies.get(other_path, ())):
+                self.addFromKernel(other_path, coverage=coverage, body_ids=affected.keys())
+
+        removed_body_list = [(record.name, bod_id) for bod_id, record in affected.items() if bod_id not in self.bodies]
+
+        # rebuild the name index, a removed body may have hidden a remaining one of the same name
+        self.name_ids = dict()
+        for bod_id, record in self.bodies.items():
+            self.name_ids.setdefault(record.name, bod_id)
+
+        # kernels may change which names SPICE knows
+        self.aliases = dict()
+
+        # valid time ranges and segment centers changed
+        self.coverage_index = None
+        self.center_index = None
+
+        return removed_body_list
+
+    def getKernels(self):
+        """
+        AetherBodies -- getKernels
+            Gets the paths of every SPK kernel bodies were added from.
+
+        Params: None
+
+        Returns: list[<str>] -- normalized paths, in the order the kernels were added
+        """
+
+        return list(self.kernel_coverage)
+
+    def getKernelCoverage(self, kern_path):
+        """
+        AetherBodies -- getKernelCoverage
+            Gets the coverage read from an SPK kernel bodies were added from.
+
+        Params: kern_path <str>
+
+        Returns: list -- see SPKParser.readCoverage, or None if no bodies were added from the kernel
+        """
+
+        return self.kernel_coverage.get(path.normpath(kern_path))
+
     def isValidID(self, bod_id):
         """
         AetherBodies -- isValidID
             Checks whether or not the given NAIF body ID exists in the dictionary or not.
 
-        Params: bod_id <int>
+        Params: bod_id <int> or <str> -- NAIF ID, or NAIF ID as a string (e.g. '499')
 
         Returns: <bool>
         """
 
+        if type(bod_id) == str:
+            try:
+                bod_id = int(bod_id)
+            except ValueError:
+                return False
+
         return bod_id in self.bodies
 
     def isValidName(self, bod_name):
         """
         AetherBodies -- isValidName
-            Checks whether or not the given body name exists in the dictionary or not.
+            Checks whether or not the given body name exists in the dictionary or not. Other names SPICE knows the body
+            by are accepted too.
 
         Params: bod_name <str>
 
         Returns: <bool>
         """
 
-        # get list of all body names from the dictionary
-        names = [tupe[0] for tupe in self.bodies.values()]
-
-        # check if the name exists in the list
-        return bod_name in names
+        return self.__lookupName(bod_name.lower()) in self.bodies
 
     def getBodyID(self, bod_name):
         """
         AetherBodies -- getBodyID
-            Gets the NAIF ID of a body by name. Note: there's also a SPICE function which does this...
+            Gets the NAIF ID of a body by name.
 
         Params: bod_name <str>
 
@@ -272,12 +434,11 @@ class AetherBodies:
         # ensure lowercase
         bod_name = bod_name.lower()
 
-        # iterate over keys and values in the dictionary, check if name matches, return key (NAIF ID)
-        for key, value in self.bodies.items():
-            if value[0] == bod_name:
-                return key
+        body_id = self.__lookupName(bod_name)
+        if body_id not in self.bodies:
+            raise KeyError("Body {} does not exist in the dictionary.".format(bod_name))
 
-        raise KeyError("Body {} does not exist in the dictionary.".format(bod_name))
+        return body_id
 
     def isValidRefFrame(self, ref_frame):
         """
@@ -285,51 +446,179 @@ class AetherBodies:
             Checks whether or not the provided reference frame is valid. For it to be valid, it must either be a known
             reference frame, or a known body.
 
-        Params: ref_frame <int> or <str>
+        Params: ref_frame <int> or <str> -- NAIF ID, NAIF ID as a string, or name
 
         Returns: <bool> or Raises TypeError if the argument supplied is not a string or int
         """
 
-        # if the reference frame is a int, check if the ID is in barycenter IDs or body IDs
-        if type(ref_frame) == int:
-            return ref_frame in [tupe[0] for tupe in self.barycenters] or self.isValidID(ref_frame)
-        # if the reference frame is a string, check if the name is in barycenter names or body names
-        elif type(ref_frame) == str:
-            return ref_frame in [tupe[1] for tupe in self.barycenters] or self.isValidName(ref_frame)
-        else:
+        if type(ref_frame) == str:
+            try:
+                ref_frame = int(ref_frame)
+            except ValueError:
+                ref_frame = self.__lookupName(ref_frame)
+        elif type(ref_frame) != int:
             raise TypeError("Method only accepts int or str.")
 
-    def removeUploadedKernels(self):
+        # the ID must be a barycenter or a body in the dictionary
+        return ref_frame in self.bodies or ref_frame in self.barycenter_ids.values()
+
+    def getUploadedKernels(self):
+        """
+        AetherBodies -- getUploadedKernels
+            Gets the paths of the binary SPK kernels in the user_uploaded directory.
+
+        Params: None
+
+        Returns: list[<str>] -- normalized paths, in sorted order
+        """
+
+        return [path.normpath(kern_path) for kern_path in self.__findKernels('./SPICE/kernels/user_uploaded/')]
+
+    def removeUploadedKernels(self, kern_paths=None):
         """
         AetherBodies -- removeUploadedKernels
-            Removes all kernels from the user_uploaded directory and then removes all uploaded bodies from the
-            dictionary.
+            Deletes uploaded kernel files from the user_uploaded directory and then removes their bodies from the
+            dictionary (see removeKernels). The kernels must be unloaded from the SPICE subsystem by the caller.
 
-        Params: None.
+        Params: kern_paths list[<str>] OPTIONAL -- paths of the uploaded kernels to remove. Every kernel in the
+            user_uploaded directory is removed if this is not given.
 
         Returns: list[<str>] -- a list of body names which were removed.
         """
 
-        # empty list to hold names of bodies that were removed
-        removed_body_list = list()
+        if kern_paths is None:
+            kern_paths = self.getUploadedKernels()
 
-        # traverse user_uploaded directory and delete each binary SPK file
-        for root, dirs, files in walk('./SPICE/kernels/user_uploaded/', topdown=True):
-            for name in files:
-                kern_path = path.join(root, name)
-                if kern_path.endswith('.bsp'):
-                    remove(kern_path)
+        # delete each binary SPK file
+        for kern_path in kern_paths:
+            try:
+                remove(kern_path)
+            except FileNotFoundError:
+                # already deleted, its bodies must still be removed
+                pass
 
-        # traverse dictionary keys, delete items where the uploaded flag is True
-        for bod_id in self.bodies.keys():
-            if self.bodies[bod_id][6]:
-                removed_body_list.append((self.bodies[bod_id][0], bod_id))
+        # return names of each body that was removed
+        return [bod[0] for bod in self.removeKernels(kern_paths)]
 
-        for body_to_remove in removed_body_list:
-            del self.bodies[body_to_remove[1]]
+    def getChainKernelPaths(self, body):
+        """
+        AetherBodies -- getChainKernelPaths
+            Gets the paths of the SPK kernels the ephemeris of a body or barycenter may be computed from: the kernels
+            covering the body, and those covering every center its segments are chained through on the way to the solar
+            system barycenter (e.g. the earth barycenter for the moon).
 
-        # return names of each body that was removed
-        return [bod[0] for bod in removed_body_list]
+        Params: body <int> or <str> -- NAIF ID, NAIF ID as a string, or name
+
+        Returns: list[<str>] -- sorted paths, empty if the body is unknown
+        """
+
+        # convert names and ID strings to NAIF IDs
+        if type(body) == str:
+            body = self.getRefFrameID(body)
+
+        if body is None:
+            return list()
+
+        kern_paths = set()
+        for chain_id in self.__chainIDs(body):
+            kern_paths.update(self.body_kernels.get(chain_id, ()))
+
+        return sorted(kern_paths)
+
+    def getDependentBodyIDs(self, bod_ids):
+        """
+        AetherBodies -- getDependentBodyIDs
+            Gets the bodies and barycenters whose segments are chained through any of the given NAIF IDs, i.e. whose
+            ephemeris may change when a kernel covering those IDs is added or removed.
+
+        Params: bod_ids iterable[<int>]
+
+        Returns: set[<int>] -- the given NAIF IDs included
+        """
+
+        bod_ids = set(bod_ids)
+
+        return set(body for body in bod_ids.union(self.__centerIndex())
+                   if not bod_ids.isdisjoint(self.__chainIDs(body)))
+
+    def getRefFrameID(self, ref_frame):
+        """
+        AetherBodies -- getRefFrameID
+            Gets the NAIF ID of a body or barycenter without asking SPICE, so it is safe to call from any thread.
+
+        Params: ref_frame <str> -- NAIF ID as a string, or name of a body or barycenter
+
+        Returns: <int> or None if the name is unknown
+        """
+
+        try:
+            return int(ref_frame)
+        except ValueError:
+            return self.__lookupName(ref_frame.lower(), ask_spice=False)
+
+    def getKernelBodyIDs(self, kern_path):
+        """
+        AetherBodies -- getKernelBodyIDs
+            Gets the NAIF IDs of the bodies and barycenters covered by a kernel which was added to the dictionary.
+
+        Params: kern_path <str>
+
+        Returns: set[<int>]
+        """
+
+        return set(self.kernel_bodies.get(path.normpath(kern_path), ()))
+
+    def getEtTimes(self, bod_id):
+        """
+        AetherBodies -- getEtTimes
+            Gets the exact ET ranges a body has valid ephemeris over. Unlike the valid times of getBodies, these aren't
+            clamped to the years a datetime can hold.
+
+        Params: bod_id <int>
+
+        Returns: list[tuple[et_start <float>, et_end <float>]] -- non-overlapping ranges, empty if the ID isn't valid
+        """
+
+        return list(self.bodies[bod_id].et_times) if self.isValidID(bod_id) else list()
+
+    def getBodiesCovering(self, et_start, et_end=None):
+        """
+        AetherBodies -- getBodiesCovering
+            Gets the bodies which have ephemeris at et_start, or over the whole window from et_start to et_end. The
+            coverage index is rebuilt here if bodies were added or removed since it was last used.
+
+        Params: et_start <float> -- ET
+                et_end <float> OPTIONAL -- ET, at least et_start
+
+        Returns: list[<int>] -- sorted NAIF IDs
+        """
+
+        coverage_index = self.coverage_index
+
+        if coverage_index is None:
+            # exact ETs, since valid_times are clamped to the years datetime can hold
+            coverage_index = CoverageIndex([(et_start, et_end, bod_id)
+                                            for bod_id, record in self.bodies.items()
+                                            for et_start, et_end in record.et_times])
+            self.coverage_index = coverage_index
+
+        return coverage_index.query(et_start, et_end)
+
+    def setBodyConstants(self, body_constants):
+        """
+        AetherBodies -- setBodyConstants
+            Must be called whenever the BodyConstants table is rebuilt. The has rotation/radius/mass data flags of every
+            body are derived from the table again, and those of bodies added later from the same table.
+
+        Params: body_constants <BodyConstants>
+
+        Returns: None
+        """
+
+        self.body_constants = body_constants
+
+        for body_id, record in self.bodies.items():
+            record.has_rotation, record.has_radius, record.has_mass = self.__constantFlags(body_id)
 
     def hasRotationData(self, bod_id):
         """
@@ -342,7 +631,7 @@ class AetherBodies:
         """
 
         # python short-circuits by default so this works even if the ID isn't valid
-        return self.isValidID(bod_id) and self.bodies[bod_id][2]
+        return self.isValidID(bod_id) and self.bodies[bod_id].has_rotation
 
     def hasRadiusData(self, bod_id):
         """
@@ -355,7 +644,7 @@ class AetherBodies:
         """
 
         # python short-circuits by default so this works even if the ID isn't valid
-        return self.isValidID(bod_id) and self.bodies[bod_id][3]
+        return self.isValidID(bod_id) and self.bodies[bod_id].has_radius
 
     def hasMassData(self, bod_id):
         """
@@ -368,7 +657,7 @@ class AetherBodies:
         """
 
         # python short-circuits by default so this works even if the ID isn't valid
-        return self.isValidID(bod_id) and self.bodies[bod_id][4]
+        return self.isValidID(bod_id) and self.bodies[bod_id].has_mass
 
     def getBodies(self, specific_ids=[]):
         """
@@ -407,13 +696,14 @@ class AetherBodies:
         for key, value in body_dict.items():
             ret_list.append({
                 'spice id': key,
-                'body name': value[0],
-                'has rotation data': value[2],
-                'has radius data': value[3],
-                'has mass data': value[4],
-                'category': self.__categoryToString(value[5], key),  # convert category to a string for clarity
-                'valid times': [[fromDatetime(dtime) for dtime in list(tupe)] for tupe in value[1]],  # make date a str
-                'is uploaded': value[6]
+                'body name': value.name,
+                'has rotation data': value.has_rotation,
+                'has radius data': value.has_radius,
+                'has mass data': value.has_mass,
+                'category': self.__categoryToString(value.category, key),  # convert category to a string for clarity
+                # make date a str
+                'valid times': [[fromDatetime(dtime) for dtime in list(tupe)] for tupe in value.valid_times],
+                'is uploaded': value.uploaded
             })
 
         # return the list at the end
@@ -434,10 +724,10 @@ class AetherBodies:
         if cat_int > 0:
             # special case for the sun, its category is itself
             if cat_int == 10:
-                return self.bodies[bod_id][0]
+                return self.bodies[bod_id].name
             # the category is the name of the primary body (e.g. moon's category is earth, phobos's is mars)
             else:
-                return self.bodies[self.bodies[bod_id][5]][0]
+                return self.bodies[self.bodies[bod_id].category].name
         elif cat_int == -1:
             return 'spacecraft'
         elif cat_int == -2:
@@ -447,6 +737,178 @@ class AetherBodies:
         else:
             return 'misc'
 
+    def __lookupName(self, name, ask_spice=True):
+        """
+        AetherBodies -- __lookupName
+            Gets the NAIF ID of a lower case body or barycenter name from the indexes. Names which aren't indexed are
+            resolved with bodn2c (unless ask_spice is False) and remembered as aliases.
+
+        Params: name <str> -- lower case
+                ask_spice <bool> -- whether or not SPICE may be asked. False from background threads, since SPICE isn't
+                    thread-safe.
+
+        Returns: <int> or None if the name is unknown
+        """
+
+        body_id = self.name_ids.get(name)
+        if body_id is None:
+            body_id = self.barycenter_ids.get(name)
+        if body_id is None:
+            body_id = self.aliases.get(name)
+
+        if body_id is None and ask_spice:
+            try:
+                body_id = spice.bodn2c(name)
+            except spice.stypes.SpiceyError:
+                return None
+
+            self.aliases[name] = body_id
+
+        return body_id
+
+    def __centerIndex(self):
+        """
+        AetherBodies -- __centerIndex
+            Gets the centers of the segments of each NAIF ID, building the index from the kernels' coverage if bodies
+            were added or removed since it was last used.
+
+        Params: None
+
+        Returns: <dict> -- key: NAIF ID <int>, value: set[<int>] of centers
+        """
+
+        center_index = self.center_index
+
+        if center_index is None:
+            center_index = dict()
+
+            for coverage in self.kernel_coverage.values():
+                for pairs, _ in coverage:
+                    for target, center in pairs:
+                        center_index.setdefault(target, set()).add(center)
+
+            self.center_index = center_index
+
+        return center_index
+
+    def __chainIDs(self, body):
+        """
+        AetherBodies -- __chainIDs
+            Gets a NAIF ID and every center its segments are chained through, over every kernel.
+
+        Params: body <int>
+
+        Returns: set[<int>]
+        """
+
+        center_index = self.__centerIndex()
+
+        chain_ids = set()
+        pending = [body]
+
+        while pending:
+            chain_id = pending.pop()
+
+            if chain_id not in chain_ids:
+                chain_ids.add(chain_id)
+                pending.extend(center_index.get(chain_id, ()))
+
+        return chain_ids
+
+    def __findKernels(self, kern_dir):
+        """
+        AetherBodies -- __findKernels
+            Finds the binary SPK kernels in a directory and its subdirectories.
+
+        Params: kern_dir <str> -- path to the directory
+
+        Returns: list[<str>] -- paths of the kernels, sorted so that scans are deterministic
+        """
+
+        kern_paths = list()
+
+        for root, dirs, files in walk(kern_dir, topdown=True):
+            # walk's listing order depends on the file system, sort it in place to visit subdirectories in order too
+            dirs.sort()
+
+            for name in sorted(files):
+                if name.endswith('.bsp'):
+                    kern_paths.append(path.join(root, name))
+
+        return kern_paths
+
+    def __scanKernels(self, kern_paths, scan_workers):
+        """
+        AetherBodies -- __scanKernels
+            Adds the bodies of every kernel, logging how long each kernel took. The coverage of kernels which didn't
+            change since the last start is taken from the kernel catalog. The others are read, in a pool of worker
+            processes if there are enough of them, and put in the catalog. The bodies are always added in the order of
+            kern_paths by this process, so that the time ranges are merged just like in a serial scan.
+
+        Params: kern_paths list[<str>] -- paths of the binary SPK kernels, in the order they are added
+                scan_workers <int> -- largest number of worker processes to use
+
+        Returns: None
+        """
+
+        start_time = time.time()
+
+        # coverage of the unchanged kernels -- key: path, value: coverage
+        cached = dict()
+        if self.kernel_catalog is not None:
+            for kern_path in kern_paths:
+                coverage = self.kernel_catalog.get(kern_path)
+                if coverage is not None:
+                    cached[kern_path] = coverage
+
+        to_read = [kern_path for kern_path in kern_paths if kern_path not in cached]
+
+        n_workers = min(scan_workers, len(to_read))
+
+        # the worker processes are spawned, so they import the REST server module again -- only the original process
+        # may start them
+        if n_workers < 2 or len(to_read) < self.PARALLEL_SCAN_MIN_KERNELS or \
+                multiprocessing.current_process().name != 'MainProcess':
+            n_workers = 1
+            scans = map(scanKernel, to_read)
+            pool = None
+        else:
+            pool = multiprocessing.get_context('spawn').Pool(n_workers)
+
+            # imap yields the results in the order of to_read, however long each kernel takes
+            scans = pool.imap(scanKernel, to_read)
+
+        try:
+            for kern_path in kern_paths:
+                add_start_time = time.time()
+
+                if kern_path in cached:
+                    coverage, read_seconds, source = cached[kern_path], 0.0, 'catalog'
+                else:
+                    coverage, read_seconds = next(scans)
+                    source = 'kernel'
+
+                    if self.kernel_catalog is not None:
+                        self.kernel_catalog.put(kern_path, coverage)
+
+                self.addFromKernel(kern_path, coverage=coverage)
+
+                print("Scanned {} in {:.3f} s ({} bodies, from {}).".format(
+                    kern_path, read_seconds + time.time() - add_start_time, len(self.getKernelBodyIDs(kern_path)),
+                    source))
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        # forget the kernels which were removed since the last start
+        if self.kernel_catalog is not None:
+            self.kernel_catalog.prune(kern_paths)
+            self.kernel_catalog.commit()
+
+        print("Scanned {} kernels ({} from the catalog) in {:.2f} s with {} worker process(es).".format(
+            len(kern_paths), len(cached), time.time() - start_time, n_workers))
+
     def __mergeTimeIntervals(self, time_intervals):
         """
         AetherBodies -- __mergeTimeIntervals
@@ -489,49 +951,22 @@ class AetherBodies:
 
         return merged
 
-    def __has_mass(self, bod_id):
-        """
-        AetherBodies -- __has_mass
-            Helper function to determine if a default body with the specified NAIF ID has mass data in the PCK kernels
-            or not.
-
-        Params: bod_id <int>
-
-        Returns: <bool>
-        """
-
-        # if ID represents the sun, a planet or a moon
-        if 9 < bod_id < 1000:
-            return bod_id not in self.no_mass
-
-        # if the body is an asteroid
-        elif bod_id > 2000000:
-            return bod_id in self.asteroids_with_mass
-
-        else:
-            return False
-
-    def __has_radius(self, bod_id):
+    def __constantFlags(self, bod_id):
         """
-        AetherBodies -- __has_radius
-            Helper function to determine if a default body with the specified NAIF ID has radii data in the PCK kernels
-            or not.
+        AetherBodies -- __constantFlags
+            Checks which physical constants the body has in the BodyConstants table given to setBodyConstants.
 
         Params: bod_id <int>
 
-        Returns: <bool>
+        Returns: tuple[has_rotation <bool>, has_radius <bool>, has_mass <bool>] -- all False until a table is set
         """
 
-        # if ID represents the sun, a planet or moon
-        if 9 < bod_id < 1000:
-            return bod_id not in self.no_radius
-
-        # if the ID represents an asteroid
-        elif bod_id > 2000000:
-            return bod_id in self.asteroids_with_radius
+        if self.body_constants is None:
+            return False, False, False
 
-        else:
-            return False
+        return (self.body_constants.getRotationData(bod_id) is not None,
+                self.body_constants.getRadius(bod_id) is not None,
+                self.body_constants.getMass(bod_id) is not None)
 
     def debugPrint(self):
         pprint(self.bodies)
@@ -0,0 +1,224 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import re
+import numpy as np
+import spiceypy as spice
+
+
+class BodyConstants:
+    """
+    BodyConstants class
+
+    Purpose: This class is a table of the physical constants of every body in the kernel pool -- radii, mass (from GM)
+        and rotation data (pole right ascension and declination, prime meridian, nutation/precession coefficients and
+        angles) -- for the available-bodies and spk-upload endpoints. Rather than probing the pool with bodvrd for each
+        body on every request, every BODY<ID>_<ITEM> variable is read once with gnpool/dtpool/gdpool whenever kernels
+        are furnished or unloaded. Radii, GM and the rotation coefficients are held in NumPy arrays indexed by a sorted
+        array of NAIF IDs (NaN where a body has no value), the variable length nutation/precession terms in a
+        dictionary. A single global instance of this class is instantiated by the REST server.
+    """
+
+    # the gravitational constant (m^3 / (kg s^2))
+    G = 6.67430e-11
+
+    # kernel pool variables read, e.g. BODY599_POLE_RA
+    VARIABLE_PATTERN = re.compile(r'^BODY(-?\d+)_(RADII|GM|POLE_RA|POLE_DEC|PM|NUT_PREC_RA|NUT_PREC_DEC|'
+                                  r'NUT_PREC_ANGLES)$')
+
+    # order of the rotation items in the rotation array
+    ROTATION_ITEMS = ('POLE_RA', 'POLE_DEC', 'PM')
+
+    # largest number of variables returned by one gnpool call
+    GNPOOL_ROOM = 1000
+
+    def __init__(self):
+        """
+        BodyConstants -- init
+            Create an empty BodyConstants object. The table is filled by reload.
+
+        Params: None
+
+        Returns: None
+        """
+
+        # sorted NAIF IDs, and the row of each ID in the arrays below
+        self.ids = np.zeros(0, dtype=np.int64)
+
+        # (n, 3) radii in km
+        self.radii = np.zeros((0, 3))
+
+        # (n,) GM in km^3 / s^2
+        self.gm = np.zeros(0)
+
+        # (n, 3, 2) value at J2000 and rate of POLE_RA, POLE_DEC and PM, in degrees (per century or per day)
+        self.rotation = np.zeros((0, 3, 2))
+
+        # nutation/precession terms by (NAIF ID, item) -- item is NUT_PREC_RA, NUT_PREC_DEC or NUT_PREC_ANGLES
+        self.nutation = dict()
+
+    def reload(self):
+        """
+        BodyConstants -- reload
+            Must be called whenever kernels are furnished or unloaded. Rebuilds the table from the kernel pool.
+
+        Params: None
+
+        Returns: None
+        """
+
+        # values of each variable by NAIF ID, then item
+        values = dict()
+
+        for variable in self.__poolVariables():
+            match = self.VARIABLE_PATTERN.match(variable)
+            if match is None:
+                continue
+
+            n_values, var_type = spice.dtpool(variable)
+            if var_type != 'N' or n_values < 1:
+                continue
+
+            values.setdefault(int(match.group(1)), dict())[match.group(2)] = \
+                np.asarray(spice.gdpool(variable, 0, n_values), dtype=np.float64)
+
+        ids = np.array(sorted(values), dtype=np.int64)
+        radii = np.full((len(ids), 3), np.nan)
+        gm = np.full(len(ids), np.nan)
+        rotation = np.full((len(ids), 3, 2), np.nan)
+        nutation = dict()
+
+        for row, bod_id in enumerate(ids.tolist()):
+            items = values[bod_id]
+
+            if 'RADII' in items and len(items['RADII']) == 3:
+                radii[row] = items['RADII']
+
+            if 'GM' in items:
+                gm[row] = items['GM'][0]
+
+            # the rotation data is only complete with all three items -- a missing rate is 0
+            if all(item in items for item in self.ROTATION_ITEMS):
+                for item_idx, item in enumerate(self.ROTATION_ITEMS):
+                    rotation[row, item_idx] = np.concatenate((items[item][:2], np.zeros(1)))[:2]
+
+            for item in ('NUT_PREC_RA', 'NUT_PREC_DEC', 'NUT_PREC_ANGLES'):
+                if item in items:
+                    nutation[(bod_id, item)] = items[item]
+
+        self.ids, self.radii, self.gm, self.rotation, self.nutation = ids, radii, gm, rotation, nutation
+
+    def getRadius(self, bod_id):
+        """
+        BodyConstants -- getRadius
+            Gets the radii of a body.
+
+        Params: bod_id <int> or <str> -- NAIF ID
+
+        Returns: list[<float>, <float>, <float>] -- radii in km, or None if the body has no radii
+        """
+
+        row = self.__row(bod_id)
+        if row is None or np.isnan(self.radii[row, 0]):
+            return None
+
+        return self.radii[row].tolist()
+
+    def getMass(self, bod_id):
+        """
+        BodyConstants -- getMass
+            Gets the mass of a body, derived from its GM.
+
+        Params: bod_id <int> or <str> -- NAIF ID
+
+        Returns: <float> -- mass in kg, or None if the body has no GM
+        """
+
+        row = self.__row(bod_id)
+        if row is None or np.isnan(self.gm[row]):
+            return None
+
+        # GM is in km^3 / s^2, G is divided in km^3 so the result is in kg
+        return float(self.gm[row] / (self.G / 1000000000))
+
+    def getRotationData(self, bod_id):
+        """
+        BodyConstants -- getRotationData
+            Gets the rotation data of a body: POLE_RA, POLE_DEC and PM (plus the rate of each), and the
+            nutation/precession coefficients if the body has them. Nutation/precession angles are defined for the
+            barycenter of a planetary system, so they are added for planets (NAIF IDs ending in 99) which have them.
+
+        Params: bod_id <int> or <str> -- NAIF ID
+
+        Returns: <dict> -- see get_available_bodies in aether-rest-server.py, or None if the body has no rotation data
+        """
+
+        bod_id = int(bod_id)
+
+        row = self.__row(bod_id)
+        if row is None or np.isnan(self.rotation[row, 0, 0]):
+            return None
+
+        (ra, ra_delta), (dec, dec_delta), (pm, pm_delta) = self.rotation[row].tolist()
+
+        ret_dict = {
+            "ra": ra,
+            "ra_delta": ra_delta,
+            "dec": dec,
+            "dec_delta": dec_delta,
+            "pm": pm,
+            "pm_delta": pm_delta
+        }
+
+        # nutation/precession coefficients come as a pair
+        if (bod_id, 'NUT_PREC_RA') in self.nutation and (bod_id, 'NUT_PREC_DEC') in self.nutation:
+            ret_dict['nut_prec_ra'] = self.nutation[(bod_id, 'NUT_PREC_RA')].tolist()
+            ret_dict['nut_prec_dec'] = self.nutation[(bod_id, 'NUT_PREC_DEC')].tolist()
+
+            # angles of the system's barycenter, e.g. 5 for 599
+            if 100 < bod_id < 1000 and bod_id % 100 == 99 and (bod_id // 100, 'NUT_PREC_ANGLES') in self.nutation:
+                ret_dict['nut_prec_angles'] = self.nutation[(bod_id // 100, 'NUT_PREC_ANGLES')].tolist()
+
+        return ret_dict
+
+    def __poolVariables(self):
+        """
+        BodyConstants -- __poolVariables
+            Gets the names of every BODY variable in the kernel pool.
+
+        Params: None
+
+        Returns: list[<str>]
+        """
+
+        variables = list()
+
+        while True:
+            try:
+                batch = spice.gnpool('BODY*', len(variables), self.GNPOOL_ROOM)
+            except spice.stypes.SpiceyError:
+                # no (more) variables found
+                break
+
+            variables.extend(batch)
+            if len(batch) < self.GNPOOL_ROOM:
+                break
+
+        return variables
+
+    def __row(self, bod_id):
+        """
+        BodyConstants -- __row
+            Gets the row of a body in the arrays.
+
+        Params: bod_id <int> or <str> -- NAIF ID
+
+        Returns: <int> or None if the body isn't in the table
+        """
+
+        row = int(np.searchsorted(self.ids, int(bod_id)))
+        if row == len(self.ids) or self.ids[row] != int(bod_id):
+            return None
+
+        return row
@@ -0,0 +1,56 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+
+class BodyRecord:
+    """
+    BodyRecord class
+
+    Purpose: This class holds the metadata AetherBodies keeps for a single body. It uses __slots__ so that catalogs of
+        tens of thousands of small bodies stay compact, since each record is then a fixed set of fields rather than a
+        dictionary.
+    """
+
+    __slots__ = ('name', 'valid_times', 'et_times', 'has_rotation', 'has_radius', 'has_mass', 'category', 'uploaded')
+
+    def __init__(self, name, valid_times, et_times, has_rotation, has_radius, has_mass, category, uploaded):
+        """
+        BodyRecord -- init
+            Create the BodyRecord object.
+
+        Params: name <str> -- lower case body name
+                valid_times list[tuple[time_start <datetime>, time_end <datetime>]] -- non-overlapping time ranges.
+                    datetime only holds years 1 to 9999, so ranges reaching past those are clamped.
+                et_times list[tuple[et_start <float>, et_end <float>]] -- the same time ranges as exact ETs
+                has_rotation <bool>, has_radius <bool>, has_mass <bool> -- whether or not the PCK kernels have rotation,
+                    radius and mass data for the body
+                category <int> -- -1 = spacecraft, -2 = asteroids, -3 = comets, -4 = misc, positive = NAIF ID of the
+                    body it orbits
+                uploaded <bool> -- whether or not the body came from an uploaded kernel
+
+        Returns: None
+        """
+
+        self.name = name
+        self.valid_times = valid_times
+        self.et_times = et_times
+        self.has_rotation = has_rotation
+        self.has_radius = has_radius
+        self.has_mass = has_mass
+        self.category = category
+        self.uploaded = uploaded
+
+    def __repr__(self):
+        """
+        BodyRecord -- repr
+            Formats the record for debug printing.
+
+        Params: None
+
+        Returns: <str>
+        """
+
+        fields = ', '.join('{}={!r}'.format(slot, getattr(self, slot)) for slot in self.__slots__)
+
+        return 'BodyRecord({})'.format(fields)
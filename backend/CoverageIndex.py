@@ -0,0 +1,103 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import numpy as np
+
+
+class CoverageIndex:
+    """
+    CoverageIndex class
+
+    Purpose: This class answers "which bodies have ephemeris at epoch t (or over a whole window)" over the merged valid
+        time ranges of every body, for the bodies-covering endpoint. It is a centered interval tree: each node holds
+        a center time and the intervals containing it, the intervals entirely before the center go to the left child
+        and those entirely after to the right child. The intervals of a node are kept in NumPy arrays sorted by start
+        and by end, so the ones containing a time are a prefix or suffix found with searchsorted. A query walks a single
+        root-to-leaf path, which takes O(log n + k) time for n intervals and k matches. The tree is static, AetherBodies
+        builds a new one whenever bodies are added or removed.
+    """
+
+    def __init__(self, intervals):
+        """
+        CoverageIndex -- init
+            Build the tree.
+
+        Params: intervals list[tuple[<float>, <float>, <int>]] -- (ET start, ET end, NAIF ID) of each interval
+
+        Returns: None
+        """
+
+        self.n_intervals = len(intervals)
+
+        # nodes as tuple(center, by start, by end, left child, right child), see __build
+        self.root = self.__build(intervals)
+
+    def query(self, et_start, et_end=None):
+        """
+        CoverageIndex -- query
+            Gets the bodies with an interval covering et_start, or the whole window from et_start to et_end.
+
+        Params: et_start <float> -- ET
+                et_end <float> OPTIONAL -- ET, at least et_start. Only et_start needs to be covered if None.
+
+        Returns: list[<int>] -- sorted NAIF IDs
+        """
+
+        if et_end is None:
+            et_end = et_start
+
+        matches = list()
+        node = self.root
+
+        # every interval covering the window contains et_start, so only the path towards et_start needs to be walked
+        while node is not None:
+            center, (starts, start_ends, start_ids), (ends, end_ids), left, right = node
+
+            if et_start < center:
+                # the node's intervals all end after the center, so those starting early enough contain et_start
+                count = np.searchsorted(starts, et_start, side='right')
+                matches.append(start_ids[:count][start_ends[:count] >= et_end])
+                node = left
+            else:
+                # the node's intervals all start before the center, so those ending late enough cover the window
+                matches.append(end_ids[np.searchsorted(ends, max(et_start, et_end), side='left'):])
+                node = right if et_start > center else None
+
+        if not matches:
+            return list()
+
+        return np.unique(np.concatenate(matches)).tolist()
+
+    def __build(self, intervals):
+        """
+        CoverageIndex -- __build
+            Builds the subtree of a list of intervals.
+
+        Params: intervals -- see init
+
+        Returns: tuple(center <float>, tuple(starts, ends, ids) sorted by start, tuple(ends, ids) sorted by end,
+            left child, right child) or None if there are no intervals
+        """
+
+        if not intervals:
+            return None
+
+        # the median of the end points splits the intervals roughly in half
+        center = float(np.median([time for start, end, _ in intervals for time in (start, end)]))
+
+        here = [interval for interval in intervals if interval[0] <= center <= interval[1]]
+        before = [interval for interval in intervals if interval[1] < center]
+        after = [interval for interval in intervals if interval[0] > center]
+
+        by_start = sorted(here, key=lambda interval: interval[0])
+        by_end = sorted(here, key=lambda interval: interval[1])
+
+        return (center,
+                (np.array([interval[0] for interval in by_start], dtype=np.float64),
+                 np.array([interval[1] for interval in by_start], dtype=np.float64),
+                 np.array([interval[2] for interval in by_start], dtype=np.int64)),
+                (np.array([interval[1] for interval in by_end], dtype=np.float64),
+                 np.array([interval[2] for interval in by_end], dtype=np.int64)),
+                self.__build(before),
+                self.__build(after))
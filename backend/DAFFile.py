@@ -0,0 +1,113 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import struct
+import numpy as np
+
+
+class DAFFile:
+    """
+    DAFFile class
+
+    Purpose: This class reads a binary DAF file (the container format of SPK kernels) directly, without going through
+        the SPICE subsystem. The file is memory-mapped as an array of doubles and its summary records are read once, so
+        each array (an SPK segment) is available as its summary values plus a NumPy view of its data. Nothing is copied
+        out of the file. Both little- and big-endian files are supported. Layout of a DAF file...
+
+        file record      1024 bytes: id word (e.g. 'DAF/SPK ') <8s>, ND <int32>, NI <int32>, internal file name <60s>,
+                         first summary record <int32>, last summary record <int32>, first free address <int32>,
+                         binary format ('LTL-IEEE' or 'BIG-IEEE') <8s>, ...
+        summary records  128 doubles: next summary record, previous summary record, number of summaries, then the
+                         summaries. Each summary is ND doubles followed by NI integers (packed two per double). The
+                         record after each summary record holds the names of its arrays.
+        arrays           the data of each array, between the first and last double addresses (1-based) given by the
+                         last two integers of its summary.
+    """
+
+    # size of a record in bytes
+    RECORD_BYTES = 1024
+
+    # id word, ND, NI, internal file name, FWARD, BWARD, FREE, binary format
+    FILE_RECORD = struct.Struct('8sii60siii8s')
+
+    def __init__(self, path):
+        """
+        DAFFile -- init
+            Map the file and read every summary. Raises ValueError if the file is not a binary DAF file.
+
+        Params: path <str> -- path to the DAF file
+
+        Returns: None
+        """
+
+        self.path = path
+
+        with open(path, 'rb') as DAF_FILE:
+            file_record = DAF_FILE.read(self.RECORD_BYTES)
+
+        if len(file_record) < self.RECORD_BYTES or not file_record.startswith(b'DAF/'):
+            raise ValueError('{} is not a binary DAF file.'.format(path))
+
+        # the binary format is needed to know how to read the integers of the file record itself
+        binary_format = file_record[88:96]
+        if binary_format == b'LTL-IEEE':
+            byte_order = '<'
+        elif binary_format == b'BIG-IEEE':
+            byte_order = '>'
+        else:
+            raise ValueError('{} has an unsupported binary format.'.format(path))
+
+        id_word, self.nd, self.ni, internal_name, fward, _, _, _ = \
+            struct.unpack_from(byte_order + self.FILE_RECORD.format, file_record)
+
+        # e.g. 'SPK' for 'DAF/SPK '
+        self.kind = id_word[4:].decode('ascii', 'replace').strip()
+        self.internal_name = internal_name.decode('ascii', 'replace').strip()
+
+        # the whole file as doubles -- double address a (1-based) is at index a - 1
+        self.data = np.memmap(path, dtype=np.dtype(byte_order + 'f8'), mode='r')
+
+        # the integer part of the summaries, viewed with the file's byte order
+        int_type = np.dtype(byte_order + 'i4')
+
+        # each summary is ND doubles followed by (NI + 1) // 2 doubles holding the integers
+        summary_size = self.nd + (self.ni + 1) // 2
+
+        # list of (doubles, integers) for each array, in file order
+        self.summaries = list()
+
+        record_num = fward
+        while record_num > 0:
+            first_double = (record_num - 1) * self.RECORD_BYTES // 8
+            record = self.data[first_double:first_double + self.RECORD_BYTES // 8]
+
+            # control area -- next record, previous record, number of summaries
+            next_record = int(record[0])
+            n_summaries = int(record[2])
+
+            for i in range(n_summaries):
+                summary = record[3 + i * summary_size:3 + (i + 1) * summary_size]
+
+                doubles = tuple(float(value) for value in summary[:self.nd])
+                integers = tuple(int(value) for value in
+                                 np.frombuffer(summary[self.nd:].tobytes(), dtype=int_type)[:self.ni])
+
+                self.summaries.append((doubles, integers))
+
+            record_num = next_record
+
+    def getArray(self, summary_idx):
+        """
+        DAFFile -- getArray
+            Gets the data of an array as a read-only view into the mapped file. By convention the last two integers of a
+            summary are the first and last addresses of the array.
+
+        Params: summary_idx <int> -- index of the array in self.summaries
+
+        Returns: <numpy.ndarray> of float64 values
+        """
+
+        _, integers = self.summaries[summary_idx]
+
+        return self.data[integers[-2] - 1:integers[-1]]
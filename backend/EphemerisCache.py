@@ -0,0 +1,384 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import os
+import hashlib
+import shutil
+from collections import OrderedDict
+import numpy as np
+import spiceypy as spice
+
+
+def fingerprintFiles(file_paths):
+    """
+    EphemerisCache.py -- fingerprintFiles
+        Computes a short fingerprint of a set of files from their paths, sizes and modification times. It is used to key
+        cached results to the kernels they were computed from, so that results are never served from a different
+        kernel set.
+
+    Params: file_paths list[<str>]
+
+    Returns: <str> -- a hex digest. Files that no longer exist are fingerprinted by path only.
+    """
+
+    digest = hashlib.sha1()
+
+    for file_path in sorted(set(file_paths)):
+        try:
+            stat_result = os.stat(file_path)
+            digest.update('{}|{}|{}\n'.format(file_path, stat_result.st_size, stat_result.st_mtime_ns).encode('utf-8'))
+        except OSError:
+            digest.update('{}|missing\n'.format(file_path).encode('utf-8'))
+
+    return digest.hexdigest()[:16]
+
+
+class EphemerisCache:
+    """
+    EphemerisCache class
+
+    Purpose: This class caches computed ephemeris in fixed-size, grid-aligned time tiles so that overlapping position
+        requests (same targets and time step, shifted windows) share work. A request for a uniform grid is split into
+        the tiles covering it. Each tile is keyed by (target, observer, frame, step, grid phase, tile index, kernel set
+        fingerprint, kind), only missing tiles are computed, and the response is assembled from tile slices. The kind
+        tells apart the different results cached for the same grid, e.g. positions and states.
+
+        Tiles are held in an in-memory LRU bounded by a byte budget (L1). Optionally, tiles are also written to a
+        directory as .npy files (L2), which are loaded back through mmap on an L1 miss. L2 files are grouped by kernel
+        set fingerprint, and files for other kernel sets are removed when the fingerprint changes. Hit and miss
+        counters are kept so that the cache can be sized. A single global instance of this class is instantiated by
+        the REST server.
+    """
+
+    # number of samples in each tile
+    TILE_SAMPLES = 512
+
+    # the grid phase is rounded to this many decimal places (seconds) in tile keys, which only absorbs the round off
+    # error of et_start - index * et_delta. Grids with finer steps are never tiled.
+    PHASE_DECIMALS = 6
+
+    def __init__(self, max_bytes, disk_dir=None):
+        """
+        EphemerisCache -- init
+            Create the EphemerisCache object.
+
+        Params: max_bytes <int> -- the byte budget of the in-memory tiles
+                disk_dir <str> OPTIONAL -- directory for the on-disk tier. The on-disk tier is disabled if None.
+
+        Returns: None
+        """
+
+        # in-memory tiles -- key: tile key <tuple>, value: <numpy.ndarray>. Most recently used tiles are at the end.
+        self.tiles = OrderedDict()
+
+        # byte budget and current size of the in-memory tiles
+        self.max_bytes = max_bytes
+        self.cur_bytes = 0
+
+        # on-disk tier directory
+        self.disk_dir = disk_dir
+
+        # fingerprint of the loaded kernel set -- part of every tile key
+        self.fingerprint = ''
+
+        # counters exposed through getStats
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def setFingerprint(self, fingerprint):
+        """
+        EphemerisCache -- setFingerprint
+            Sets the fingerprint of the loaded kernel set. This must be called whenever kernels are loaded or unloaded.
+            Tiles computed from other kernel sets are dropped.
+
+        Params: fingerprint <str>
+
+        Returns: None
+        """
+
+        if fingerprint == self.fingerprint:
+            return
+
+        self.fingerprint = fingerprint
+
+        # tiles from the previous kernel set can never be hit again
+        self.tiles.clear()
+        self.cur_bytes = 0
+
+        # remove on-disk tiles of other kernel sets
+        if self.disk_dir is not None and os.path.exists(self.disk_dir):
+            for entry in os.listdir(self.disk_dir):
+                if entry != fingerprint:
+                    shutil.rmtree(os.path.join(self.disk_dir, entry), ignore_errors=True)
+
+    @staticmethod
+    def fingerprintLoadedKernels():
+        """
+        EphemerisCache -- fingerprintLoadedKernels
+            Fingerprints the kernels currently furnished in the SPICE subsystem. Metakernels are left out on purpose,
+            since the REST server rewrites its metakernel on every start.
+
+        Params: None
+
+        Returns: <str>
+        """
+
+        # kernel types that affect positions and frames
+        kinds = 'SPK PCK CK TEXT'
+
+        return fingerprintFiles([spice.kdata(i, kinds)[0] for i in range(spice.ktotal(kinds))])
+
+    def getPositions(self, queries, et_start, et_delta, n_samples, compute, kind='positions'):
+        """
+        EphemerisCache -- getPositions
+            Gets positions over a uniform grid for several queries, using cached tiles where possible. The grid is
+            et_start + et_delta * k for k in [0, n_samples). Tiles which are missing are computed together with a
+            single call to compute, at exactly those ETs (a missing tile's samples outside the requested grid continue
+            it). Callers should snap et_start (see TimeAxis.snapEt) so that requests on the same grid share tiles.
+
+        Params: queries list[tuple[<str>, <str>, <str>]] -- (target, observer, frame) for each result
+                et_start <float> -- first ET of the grid
+                et_delta <float> -- seconds between samples
+                n_samples <int> -- number of samples in the grid
+                compute <function> -- called as compute(jobs) with jobs being list[tuple[target, observer, frame,
+                    times <numpy.ndarray>]], it must return a list of (len(times), width) arrays, one for each job.
+                    width is 3 for positions.
+                kind <str> OPTIONAL -- what compute returns, e.g. 'positions' or 'states'. Tiles of different kinds are
+                    cached separately.
+
+        Returns: list[<numpy.ndarray>] -- one (n_samples, width) array for each query
+        """
+
+        # grids which are not increasing, or finer than the phase rounding, can't be tiled -- compute them directly
+        if et_delta < 10.0 ** -self.PHASE_DECIMALS or n_samples <= 0:
+            times = et_start + et_delta * np.arange(n_samples, dtype=np.float64)
+            return compute([(target, observer, frame, times) for target, observer, frame in queries])
+
+        # global index of the first sample and the grid phase -- grids with the same step and phase share tiles. The
+        # rounded phase is only part of the key, tiles are computed from et_start itself
+        first_idx = int(np.floor(et_start / et_delta))
+        phase = round(et_start - first_idx * et_delta, self.PHASE_DECIMALS)
+        last_idx = first_idx + n_samples - 1
+
+        # tiles covering the requested grid
+        first_tile = first_idx // self.TILE_SAMPLES
+        last_tile = last_idx // self.TILE_SAMPLES
+
+        # key parts shared by every tile of the request
+        grid_key = (float(et_delta), phase, self.fingerprint, kind)
+
+        # look up every tile -- collect the missing ones so they can be computed together
+        found_tiles = dict()
+        missing_keys = list()
+
+        for target, observer, frame in queries:
+            for tile_idx in range(first_tile, last_tile + 1):
+                tile_key = (target, observer, frame, tile_idx) + grid_key
+
+                if tile_key in found_tiles:
+                    continue
+
+                tile = self.__lookup(tile_key)
+
+                if tile is None:
+                    missing_keys.append(tile_key)
+                    found_tiles[tile_key] = None
+                else:
+                    found_tiles[tile_key] = tile
+
+        # compute the missing tiles
+        if missing_keys:
+            self.__computeTiles(missing_keys, et_start, et_delta, first_idx, last_idx, compute, found_tiles)
+
+        # assemble the result for each query from slices of its tiles
+        results = list()
+
+        for target, observer, frame in queries:
+            positions = None
+
+            for tile_idx in range(first_tile, last_tile + 1):
+                tile = found_tiles[(target, observer, frame, tile_idx) + grid_key]
+
+                # the width of the result (e.g. 3 for positions, 6 for states) is the width of its tiles
+                if positions is None:
+                    positions = np.empty((n_samples, tile.shape[1]), dtype=np.float64)
+
+                # global sample range covered by both the tile and the request
+                tile_first = tile_idx * self.TILE_SAMPLES
+                lo = max(first_idx, tile_first)
+                hi = min(last_idx, tile_first + self.TILE_SAMPLES - 1) + 1
+
+                # partial tiles (see __computeTiles) only hold the requested part, starting at first_idx
+                if len(tile) == self.TILE_SAMPLES:
+                    positions[lo - first_idx:hi - first_idx] = tile[lo - tile_first:hi - tile_first]
+                else:
+                    positions[lo - first_idx:hi - first_idx] = tile[:hi - lo]
+
+            results.append(positions)
+
+        return results
+
+    def getStats(self):
+        """
+        EphemerisCache -- getStats
+            Gets the hit/miss counters and the current size of the cache.
+
+        Params: None
+
+        Returns: <dict>
+        """
+
+        lookups = self.memory_hits + self.disk_hits + self.misses
+
+        return {
+            'memory hits': self.memory_hits,
+            'disk hits': self.disk_hits,
+            'misses': self.misses,
+            'hit rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'tiles in memory': len(self.tiles),
+            'bytes in memory': self.cur_bytes,
+            'max bytes in memory': self.max_bytes,
+            'disk tier enabled': self.disk_dir is not None,
+            'tile samples': self.TILE_SAMPLES,
+            'kernel fingerprint': self.fingerprint
+        }
+
+    def __computeTiles(self, missing_keys, et_start, et_delta, first_idx, last_idx, compute, found_tiles):
+        """
+        EphemerisCache -- __computeTiles
+            Computes missing tiles and stores them. A whole tile may reach past the coverage of a kernel even though
+            the requested grid does not, so if computing the tiles fails, each tile is retried on its own and tiles that
+            still fail are computed over the requested part only. Those partial tiles are returned but never stored.
+
+        Params: missing_keys list[<tuple>] -- keys of the missing tiles
+                et_start <float>, et_delta <float> -- the grid is et_start + et_delta * (global index - first_idx)
+                first_idx <int>, last_idx <int> -- global indexes of the first and last requested samples
+                compute <function> -- see getPositions
+                found_tiles <dict> -- filled in with the computed tiles
+
+        Returns: None
+        """
+
+        def tileTimes(tile_idx, lo=None, hi=None):
+            # global sample indexes of the whole tile, optionally clipped to [lo, hi]
+            tile_first = tile_idx * self.TILE_SAMPLES
+            sample_idx = np.arange(tile_first, tile_first + self.TILE_SAMPLES)
+            if lo is not None:
+                sample_idx = sample_idx[(sample_idx >= lo) & (sample_idx <= hi)]
+            return et_start + et_delta * (sample_idx - first_idx)
+
+        jobs = [(key[0], key[1], key[2], tileTimes(key[3])) for key in missing_keys]
+
+        try:
+            computed = compute(jobs)
+        except spice.stypes.SpiceyError:
+            computed = list()
+
+            for key, job in zip(missing_keys, jobs):
+                try:
+                    computed.append(compute([job])[0])
+                except spice.stypes.SpiceyError:
+                    # partial tile -- a failure here is a genuine error for the request, so let it propagate
+                    partial = compute([(key[0], key[1], key[2], tileTimes(key[3], first_idx, last_idx))])[0]
+                    found_tiles[key] = partial
+                    self.misses += 1
+                    computed.append(None)
+
+        for key, tile in zip(missing_keys, computed):
+            if tile is None:
+                continue
+            self.misses += 1
+            found_tiles[key] = tile
+            self.__store(key, tile)
+
+    def __lookup(self, tile_key):
+        """
+        EphemerisCache -- __lookup
+            Looks a tile up in memory, then on disk. Tiles found on disk are promoted into memory.
+
+        Params: tile_key <tuple>
+
+        Returns: <numpy.ndarray> or None if the tile is not cached
+        """
+
+        # in-memory tier -- move the tile to the most recently used end
+        tile = self.tiles.get(tile_key)
+        if tile is not None:
+            self.tiles.move_to_end(tile_key)
+            self.memory_hits += 1
+            return tile
+
+        # on-disk tier
+        if self.disk_dir is not None:
+            tile_path = self.__tilePath(tile_key)
+            if os.path.exists(tile_path):
+                try:
+                    tile = np.load(tile_path, mmap_mode='r')
+                except (OSError, ValueError):
+                    # unreadable file (e.g. a partial write by a process that was killed) -- treat it as a miss
+                    return None
+
+                self.disk_hits += 1
+                self.__storeInMemory(tile_key, tile)
+                return tile
+
+        return None
+
+    def __store(self, tile_key, tile):
+        """
+        EphemerisCache -- __store
+            Stores a newly computed tile in memory and, if enabled, on disk.
+
+        Params: tile_key <tuple>, tile <numpy.ndarray>
+
+        Returns: None
+        """
+
+        self.__storeInMemory(tile_key, tile)
+
+        if self.disk_dir is not None:
+            tile_path = self.__tilePath(tile_key)
+            os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+
+            # write to a temporary file first so that readers never see a partial tile
+            tmp_path = tile_path + '.{}.tmp'.format(os.getpid())
+            with open(tmp_path, 'wb') as TILE_FILE:
+                np.save(TILE_FILE, tile)
+            os.replace(tmp_path, tile_path)
+
+    def __storeInMemory(self, tile_key, tile):
+        """
+        EphemerisCache -- __storeInMemory
+            Adds a tile to the in-memory LRU and evicts least recently used tiles until the byte budget is met.
+
+        Params: tile_key <tuple>, tile <numpy.ndarray>
+
+        Returns: None
+        """
+
+        self.tiles[tile_key] = tile
+        self.cur_bytes += tile.nbytes
+
+        while self.cur_bytes > self.max_bytes and self.tiles:
+            _, evicted_tile = self.tiles.popitem(last=False)
+            self.cur_bytes -= evicted_tile.nbytes
+            self.evictions += 1
+
+    def __tilePath(self, tile_key):
+        """
+        EphemerisCache -- __tilePath
+            Gets the path of the on-disk file for a tile. Files are grouped by kernel set fingerprint.
+
+        Params: tile_key <tuple>
+
+        Returns: <str>
+        """
+
+        file_name = hashlib.sha1(repr(tile_key).encode('utf-8')).hexdigest() + '.npy'
+
+        return os.path.join(self.disk_dir, self.fingerprint, file_name)
+
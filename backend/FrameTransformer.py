@@ -0,0 +1,145 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+from collections import OrderedDict
+import numpy as np
+import spiceypy as spice
+
+
+class FrameTransformer:
+    """
+    FrameTransformer class
+
+    Purpose: This class rotates positions and states computed in J2000 into other reference frames, e.g. ECLIPJ2000 or
+        body-fixed frames such as IAU_MARS. Ephemeris is always computed (and cached) in J2000, then rotated with a
+        single vectorized einsum. Inertial frames only need one rotation matrix for the whole grid. Other frames need a
+        matrix for every sample (pxform for positions, sxform for states), so those are kept in an LRU keyed by frame
+        and grid, bounded by a byte budget, since consecutive requests for the same view share their grid. A single
+        global instance of this class is instantiated by the REST server.
+    """
+
+    # SPICE frame class of inertial frames
+    INERTIAL_CLASS = 1
+
+    def __init__(self, max_bytes):
+        """
+        FrameTransformer -- init
+            Create the FrameTransformer object.
+
+        Params: max_bytes <int> -- the byte budget of the cached rotation matrices
+
+        Returns: None
+        """
+
+        # rotation matrices by (frame, kind, grid) -- most recently used at the end
+        self.matrices = OrderedDict()
+        self.cur_bytes = 0
+        self.max_bytes = max_bytes
+
+    def reload(self):
+        """
+        FrameTransformer -- reload
+            Must be called whenever kernels are furnished or unloaded, since frame definitions and orientation data
+            come from kernels. Drops every cached matrix.
+
+        Params: None
+
+        Returns: None
+        """
+
+        self.matrices.clear()
+        self.cur_bytes = 0
+
+    @staticmethod
+    def isValidFrame(frame):
+        """
+        FrameTransformer -- isValidFrame
+            Checks whether or not SPICE knows the given frame.
+
+        Params: frame <str> -- frame name, e.g. 'ECLIPJ2000'
+
+        Returns: <bool>
+        """
+
+        return spice.namfrm(frame) != 0
+
+    def isInertial(self, frame):
+        """
+        FrameTransformer -- isInertial
+            Checks whether or not the given frame is inertial, in which case a single rotation applies to every epoch.
+
+        Params: frame <str> -- a frame known to SPICE
+
+        Returns: <bool>
+        """
+
+        _, frame_class, _ = spice.frinfo(spice.namfrm(frame))[:3]
+
+        return frame_class == self.INERTIAL_CLASS
+
+    def transform(self, frame, data, times, grid_key=None):
+        """
+        FrameTransformer -- transform
+            Rotates positions or states from J2000 into the given frame.
+
+        Params: frame <str> -- the frame to rotate into
+                data <numpy.ndarray> -- (n, 3) positions or (n, 6) states in J2000
+                times <numpy.ndarray> -- the n ET times of data
+                grid_key <tuple> OPTIONAL -- identifies the grid of times, e.g. (et_start, et_delta, n_samples), so that
+                    matrices of non-inertial frames are cached. Matrices aren't cached if None.
+
+        Returns: <numpy.ndarray> -- data in the given frame, the same shape as data
+        """
+
+        frame = frame.upper()
+        if frame == 'J2000' or not len(data):
+            return data
+
+        width = data.shape[1]
+
+        # one matrix for the whole grid
+        if self.isInertial(frame):
+            matrix = spice.pxform('J2000', frame, 0.0)
+
+            # velocities rotate the same way as positions when the rotation doesn't change with time
+            if width == 3:
+                return data @ matrix.T
+            return np.hstack((data[:, :3] @ matrix.T, data[:, 3:] @ matrix.T))
+
+        matrices = self.__getMatrices(frame, width, times, grid_key)
+
+        return np.einsum('nij,nj->ni', matrices, data)
+
+    def __getMatrices(self, frame, width, times, grid_key):
+        """
+        FrameTransformer -- __getMatrices
+            Gets a rotation matrix for every time, from the cache if possible.
+
+        Params: frame <str>
+                width <int> -- 3 for pxform matrices, 6 for sxform matrices
+                times <numpy.ndarray>
+                grid_key <tuple> or None
+
+        Returns: <numpy.ndarray> -- (n, width, width) array
+        """
+
+        cache_key = None if grid_key is None else (frame, width) + tuple(grid_key)
+
+        matrices = self.matrices.get(cache_key) if cache_key is not None else None
+        if matrices is not None:
+            self.matrices.move_to_end(cache_key)
+            return matrices
+
+        transform_function = spice.pxform if width == 3 else spice.sxform
+        matrices = np.array([transform_function('J2000', frame, float(et)) for et in times]).reshape(-1, width, width)
+
+        if cache_key is not None and matrices.nbytes <= self.max_bytes:
+            self.matrices[cache_key] = matrices
+            self.cur_bytes += matrices.nbytes
+
+            while self.cur_bytes > self.max_bytes:
+                _, evicted = self.matrices.popitem(last=False)
+                self.cur_bytes -= evicted.nbytes
+
+        return matrices
@@ -0,0 +1,171 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import os
+import json
+import sqlite3
+import threading
+
+
+class KernelCatalog:
+    """
+    KernelCatalog class
+
+    Purpose: This class is an on-disk snapshot of the coverage read from each SPK kernel (see SPKParser.readCoverage),
+        so that AetherBodies only has to read new or changed kernels when the REST server starts. Entries are kept in
+        an SQLite database, keyed by (normalized) kernel path along with the size and modification time of the file.
+        The content of the file isn't hashed: the coverage only depends on the file and summary records, and reading
+        those again when a kernel was touched or copied costs less than hashing the whole kernel. Format of the kernels
+        table...
+
+        path <TEXT> primary key, size <INTEGER>, mtime_ns <INTEGER>, coverage <TEXT> -- JSON list of [pairs,
+        intervals], as returned by readCoverage
+
+        The database is recreated when it was written by another version. An unusable database only disables the
+        catalog, the kernels are then read on every start. A single instance of this class is held by AetherBodies.
+    """
+
+    # must be increased whenever the table or the coverage format changes, stored as the database's user_version
+    VERSION = 1
+
+    def __init__(self, file_path):
+        """
+        KernelCatalog -- init
+            Create the KernelCatalog object and open (or create) its database.
+
+        Params: file_path <str> -- path of the SQLite database
+
+        Returns: None
+        """
+
+        self.file_path = file_path
+
+        # the REST server may add kernels from several threads
+        self.lock = threading.Lock()
+
+        try:
+            self.connection = sqlite3.connect(file_path, check_same_thread=False)
+
+            if self.connection.execute('PRAGMA user_version').fetchone()[0] != self.VERSION:
+                with self.connection:
+                    self.connection.execute('DROP TABLE IF EXISTS kernels')
+                    self.connection.execute('PRAGMA user_version = {}'.format(self.VERSION))
+
+            with self.connection:
+                self.connection.execute('CREATE TABLE IF NOT EXISTS kernels (path TEXT PRIMARY KEY, size INTEGER, '
+                                        'mtime_ns INTEGER, coverage TEXT)')
+        except sqlite3.Error as error:
+            print("Kernel catalog {} is unusable, kernels will be read on every start: {}".format(file_path, error))
+            self.connection = None
+
+    def get(self, kern_path):
+        """
+        KernelCatalog -- get
+            Gets the coverage of a kernel, if the file didn't change since it was put in the catalog.
+
+        Params: kern_path <str> -- path to the kernel
+
+        Returns: list -- coverage as returned by SPKParser.readCoverage, or None if the kernel needs to be read
+        """
+
+        if self.connection is None:
+            return None
+
+        try:
+            stat_result = os.stat(kern_path)
+        except OSError:
+            return None
+
+        with self.lock:
+            row = self.connection.execute('SELECT size, mtime_ns, coverage FROM kernels WHERE path = ?',
+                                          (os.path.normpath(kern_path),)).fetchone()
+
+        if row is None or row[0] != stat_result.st_size or row[1] != stat_result.st_mtime_ns:
+            return None
+
+        # JSON turns the tuples into lists, give readCoverage's format back
+        return [([tuple(pair) for pair in pairs], tuple(tuple(interval) for interval in intervals))
+                for pairs, intervals in json.loads(row[2])]
+
+    def put(self, kern_path, coverage):
+        """
+        KernelCatalog -- put
+            Adds or replaces the entry of a kernel. Entries are written to the file by commit.
+
+        Params: kern_path <str> -- path to the kernel
+                coverage -- as returned by SPKParser.readCoverage
+
+        Returns: None
+        """
+
+        if self.connection is None:
+            return
+
+        try:
+            stat_result = os.stat(kern_path)
+        except OSError:
+            return
+
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO kernels (path, size, mtime_ns, coverage) '
+                                    'VALUES (?, ?, ?, ?)',
+                                    (os.path.normpath(kern_path), stat_result.st_size, stat_result.st_mtime_ns,
+                                     json.dumps(coverage)))
+
+    def discard(self, kern_paths):
+        """
+        KernelCatalog -- discard
+            Removes the entries of kernels. Entries are written to the file by commit.
+
+        Params: kern_paths list[<str>]
+
+        Returns: None
+        """
+
+        if self.connection is None:
+            return
+
+        with self.lock:
+            self.connection.executemany('DELETE FROM kernels WHERE path = ?',
+                                        [(os.path.normpath(kern_path),) for kern_path in kern_paths])
+
+    def prune(self, kern_paths):
+        """
+        KernelCatalog -- prune
+            Removes the entries of every kernel not in a list, i.e. of kernel files which were removed. Entries are
+            written to the file by commit.
+
+        Params: kern_paths list[<str>] -- paths of every kernel that still exists
+
+        Returns: None
+        """
+
+        if self.connection is None:
+            return
+
+        with self.lock:
+            removed = set(row[0] for row in self.connection.execute('SELECT path FROM kernels')) - \
+                set(os.path.normpath(kern_path) for kern_path in kern_paths)
+
+        self.discard(removed)
+
+    def commit(self):
+        """
+        KernelCatalog -- commit
+            Writes the changes made by put, discard and prune to the file, in a single transaction.
+
+        Params: None
+
+        Returns: None
+        """
+
+        if self.connection is None:
+            return
+
+        with self.lock:
+            try:
+                self.connection.commit()
+            except sqlite3.Error as error:
+                # the catalog is only an optimization, the kernels are simply read again next time
+                print("Could not write the kernel catalog {}: {}".format(self.file_path, error))
@@ -0,0 +1,318 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import os
+import time
+import shutil
+import threading
+import spiceypy as spice
+from AetherBodies import AetherBodies
+from SPKParser import readCoverage
+from NativeSPK import NativeSPK
+from SpicePool import SpicePool
+from EphemerisCache import EphemerisCache, fingerprintFiles
+
+
+class KernelSession:
+    """
+    KernelSession class
+
+    Purpose: This class holds the SPK kernels uploaded within a single client session, so that they are registered and
+        evaluated in isolation from the uploads of other sessions. The session's kernels are layered on top of the
+        kernels loaded by the REST server (the shared default set), which are never modified: the session has its own
+        AetherBodies (built from the server's without reading any file again), its own native SPK engine (reusing the
+        server's mapped files) and ephemeris cache, and its own SPICE worker processes for whatever the native engine
+        can't evaluate. The server's own SPICE subsystem never furnishes a session's kernels, so uploading or clearing
+        them costs nothing to other sessions.
+
+        The layers are built the first time a kernel is uploaded, and rebuilt lazily when the server's kernel set
+        changes (see refresh). Instances are created and evicted by SessionRegistry.
+    """
+
+    def __init__(self, session_id, directory, base_bodies, base_native_spk, spice_workers, cache_bytes):
+        """
+        KernelSession -- init
+            Create the KernelSession object. Nothing is built until a kernel is added.
+
+        Params: session_id <str>
+                directory <str> -- the directory the session's kernels are saved in
+                base_bodies <AetherBodies> -- the REST server's bodies
+                base_native_spk <NativeSPK> -- the REST server's native SPK engine
+                spice_workers <int> -- the number of SPICE worker processes, started on first use
+                cache_bytes <int> -- the byte budget of the session's ephemeris cache
+
+        Returns: None
+        """
+
+        self.session_id = session_id
+        self.directory = directory
+
+        self.base_bodies = base_bodies
+        self.base_native_spk = base_native_spk
+
+        # SPK kernels uploaded in the session, in upload order -- normalized paths
+        self.kernel_paths = list()
+
+        # the server's bodies with the session's kernels added, and the native engine over both -- None until built
+        self.bodies = None
+        self.native_spk = None
+
+        # workers furnish the server's kernels followed by the session's -- the pool is used even with a single worker,
+        # since the server's SPICE subsystem doesn't have the session's kernels
+        self.spice_pool = SpicePool(spice_workers)
+
+        self.ephemeris_cache = EphemerisCache(cache_bytes)
+
+        # generation of the server's kernel set the layers were built on -- see SessionRegistry.invalidate
+        self.generation = None
+
+        # time of the last request made in the session, see SessionRegistry.evictIdle
+        self.last_used = time.time()
+
+        # guards the kernels and the layers built from them
+        self.lock = threading.RLock()
+
+    def hasKernels(self):
+        """
+        KernelSession -- hasKernels
+            Checks whether or not any kernel was uploaded in the session. A session without kernels sees exactly what
+            the REST server sees.
+
+        Params: None
+
+        Returns: <bool>
+        """
+
+        return bool(self.kernel_paths)
+
+    def getKernels(self):
+        """
+        KernelSession -- getKernels
+            Gets the paths of the kernels uploaded in the session.
+
+        Params: None
+
+        Returns: list[<str>] -- normalized paths, in upload order
+        """
+
+        return list(self.kernel_paths)
+
+    def refresh(self, generation):
+        """
+        KernelSession -- refresh
+            Rebuilds the layers if the REST server's kernel set changed since they were built. Must be called from a
+            request, since the server's SPICE subsystem is read.
+
+        Params: generation <int> -- the current generation of the server's kernel set
+
+        Returns: None
+        """
+
+        with self.lock:
+            if generation != self.generation:
+                self.generation = generation
+                self.bodies = None
+
+            if self.bodies is None and self.kernel_paths:
+                self.__build()
+
+    def addKernel(self, kern_path, saved_path=None):
+        """
+        KernelSession -- addKernel
+            Adds an SPK kernel saved in the session's directory. A kernel which was already added (i.e. uploaded again
+            under the same name) is replaced.
+
+        Params: kern_path <str>
+                saved_path <str> OPTIONAL -- where the kernel was saved, if not at kern_path. The file is checked there
+                    and only then moved to kern_path, so a kernel already added under the same name is left intact if
+                    it isn't a binary SPK kernel.
+
+        Returns: list[<dict>] -- the bodies which didn't exist before, as returned by AetherBodies.getBodies. Bodies
+            the replaced kernel already had aren't new, so uploading the same kernel again returns an empty list.
+            Raises ValueError if the file isn't a binary SPK kernel.
+        """
+
+        kern_path = os.path.normpath(kern_path)
+
+        if saved_path is None:
+            saved_path = kern_path
+
+        # the file is only read here, SPICE itself never sees it in-process
+        coverage = readCoverage(saved_path)
+        if not coverage:
+            raise ValueError('{} is not a binary SPK kernel with any segment.'.format(os.path.basename(kern_path)))
+
+        with self.lock:
+            if self.bodies is None:
+                self.__build()
+
+            # bodies which existed before the kernel is replaced
+            existing_ids = set()
+
+            if kern_path in self.kernel_paths:
+                existing_ids = set(bod_id for bod_id in self.bodies.getKernelBodyIDs(kern_path)
+                                   if self.bodies.isValidID(bod_id))
+
+                self.kernel_paths.remove(kern_path)
+                self.bodies.removeKernels([kern_path])
+
+            # the native engine keeps the replaced file mapped until it's reloaded below
+            if saved_path != kern_path:
+                os.replace(saved_path, kern_path)
+
+            self.kernel_paths.append(kern_path)
+
+            new_bodies = self.bodies.addFromKernel(kern_path, returnNewBodies=True, coverage=coverage)
+            new_bodies = [bod_dict for bod_dict in new_bodies if bod_dict['spice id'] not in existing_ids]
+
+            self.__reloadEvaluation()
+
+        return new_bodies
+
+    def removeKernels(self, kern_paths):
+        """
+        KernelSession -- removeKernels
+            Removes kernels uploaded in the session and deletes their files.
+
+        Params: kern_paths list[<str>]
+
+        Returns: list[<str>] -- names of the bodies which were removed
+        """
+
+        kern_paths = [os.path.normpath(kern_path) for kern_path in kern_paths]
+
+        with self.lock:
+            kern_paths = [kern_path for kern_path in kern_paths if kern_path in self.kernel_paths]
+
+            for kern_path in kern_paths:
+                self.kernel_paths.remove(kern_path)
+
+                try:
+                    os.remove(kern_path)
+                except FileNotFoundError:
+                    pass
+
+            if self.bodies is None or not kern_paths:
+                return list()
+
+            removed_body_list = self.bodies.removeKernels(kern_paths)
+
+            self.__reloadEvaluation()
+
+        return [bod[0] for bod in removed_body_list]
+
+    def evaluatePositions(self, jobs):
+        """
+        KernelSession -- evaluatePositions
+            Computes positions for a list of jobs over the server's kernels and the session's.
+
+        Params: jobs list[tuple[<str>, <str>, <str>, <numpy.ndarray>]] -- (target, observer, frame, ET times) for each
+                    set of positions to compute.
+
+        Returns: list[<numpy.ndarray>] -- an (n, 3) array of positions in km for each job. Raises SpiceyError if any
+            job fails.
+        """
+
+        return self.__evaluate(jobs, 3)
+
+    def evaluateStates(self, jobs):
+        """
+        KernelSession -- evaluateStates
+            Computes states (positions and velocities) for a list of jobs over the server's kernels and the session's.
+
+        Params: jobs -- see evaluatePositions
+
+        Returns: list[<numpy.ndarray>] -- an (n, 6) array of positions in km and velocities in km/s for each job.
+            Raises SpiceyError if any job fails.
+        """
+
+        return self.__evaluate(jobs, 6)
+
+    def close(self):
+        """
+        KernelSession -- close
+            Shuts the session's worker processes down and deletes its kernel files.
+
+        Params: None
+
+        Returns: None
+        """
+
+        with self.lock:
+            self.spice_pool.close()
+            self.kernel_paths = list()
+            self.bodies = None
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __build(self):
+        """
+        KernelSession -- __build
+            Layers the session's kernels over the REST server's current kernel set.
+
+        Params: None
+
+        Returns: None
+        """
+
+        bodies = AetherBodies(base=self.base_bodies)
+
+        for kern_path in self.kernel_paths:
+            bodies.addFromKernel(kern_path)
+
+        self.bodies = bodies
+        self.native_spk = NativeSPK(self.base_native_spk.isEnabled())
+
+        self.__reloadEvaluation()
+
+    def __reloadEvaluation(self):
+        """
+        KernelSession -- __reloadEvaluation
+            Points the native engine, the worker processes and the ephemeris cache at the server's kernels followed by
+            the session's, so that the session's segments take priority.
+
+        Params: None
+
+        Returns: None
+        """
+
+        server_kernels = SpicePool.loadedKernels()
+        server_spks = [spice.kdata(i, 'SPK')[0] for i in range(spice.ktotal('SPK'))]
+
+        self.native_spk.reload(server_spks + self.kernel_paths, self.base_native_spk.files, self.bodies)
+        self.spice_pool.reload(server_kernels + self.kernel_paths)
+        self.ephemeris_cache.setFingerprint(fingerprintFiles(server_kernels + self.kernel_paths))
+
+    def __evaluate(self, jobs, width):
+        """
+        KernelSession -- __evaluate
+            Computes positions (width 3) or states (width 6) for a list of jobs. Jobs the native SPK engine can evaluate
+            are done in-process, the rest go to the session's SPICE worker processes.
+
+        Params: jobs -- see evaluatePositions
+                width <int> -- 3 or 6
+
+        Returns: list[<numpy.ndarray>] -- an (n, width) array for each job
+        """
+
+        with self.lock:
+            native_spk = self.native_spk
+
+        if width == 6:
+            results = [native_spk.evaluateStates(*job) for job in jobs]
+        else:
+            results = [native_spk.evaluatePositions(*job) for job in jobs]
+
+        spice_idx = [i for i, result in enumerate(results) if result is None]
+        if spice_idx:
+            spice_jobs = [jobs[i] for i in spice_idx]
+            if width == 6:
+                spice_results = self.spice_pool.evaluateStates(spice_jobs)
+            else:
+                spice_results = self.spice_pool.evaluatePositions(spice_jobs)
+
+            for i, result in zip(spice_idx, spice_results):
+                results[i] = result
+
+        return results
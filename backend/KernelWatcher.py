@@ -0,0 +1,339 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import os
+import time
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+
+
+# inotify event masks, see inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+# events that change the set of files in a directory, or mean a file was completely written
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+# wd <int32>, mask <uint32>, cookie <uint32>, length of the name <uint32>, followed by the name
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+class KernelWatcher:
+    """
+    KernelWatcher class
+
+    Purpose: This class watches the kernel directories, so that kernels dropped into (or deleted from) them while the
+        REST server is running are furnished (or unloaded) without a restart. Changes are detected by a background
+        thread, with inotify when the platform has it and by polling the directories otherwise. The thread only
+        records the changes, since the SPICE subsystem isn't thread-safe: they are taken with takeChanges and applied by
+        the REST server before handling its next request.
+
+        Either way, the directories are scanned and compared to the files known to be loaded. A new or changed file is
+        only reported once it is complete, i.e. inotify reported it was closed after writing or moved into place, or
+        its size and modification time didn't change between two scans. A single global instance of this class is
+        instantiated by the REST server.
+    """
+
+    def __init__(self, directories, extensions, poll_interval=2.0):
+        """
+        KernelWatcher -- init
+            Create the KernelWatcher object. Nothing is watched until start is called.
+
+        Params: directories list[<str>] -- the directories to watch, subdirectories included
+                extensions tuple[<str>] -- extensions of the kernel files, without the dot (e.g. 'bsp')
+                poll_interval <float> OPTIONAL -- seconds between scans when polling, and before scanning a file again
+                    to check that it is complete
+
+        Returns: None
+        """
+
+        self.directories = list(directories)
+        self.extensions = tuple(extensions)
+        self.poll_interval = poll_interval
+
+        # 'inotify' or 'polling' once started
+        self.mode = None
+
+        # the C library, for the inotify functions
+        self.libc = None
+
+        # size and modification time of the files known to be loaded -- key: normalized path, value: (size, mtime)
+        self.known = dict()
+
+        # files which changed since the last scan and may still be being written -- same format as known
+        self.unsettled = dict()
+
+        # changes not taken yet -- key: normalized path, value: 'add' (new or changed file) or 'remove'
+        self.pending = dict()
+
+        # guards known, unsettled and pending
+        self.lock = threading.Lock()
+
+        self.thread = None
+
+    def start(self):
+        """
+        KernelWatcher -- start
+            Starts watching. Must be called once the kernels present in the directories are loaded, they are taken as
+            the known files.
+
+        Params: None
+
+        Returns: None
+        """
+
+        if self.thread is not None:
+            return
+
+        with self.lock:
+            self.known = self.__scan()
+
+        inotify = self.__initInotify()
+        self.mode = 'polling' if inotify is None else 'inotify'
+
+        self.thread = threading.Thread(target=self.__run, args=(inotify,), name='aether-kernel-watcher', daemon=True)
+        self.thread.start()
+
+        print("Watching {} for kernel changes ({}).".format(', '.join(self.directories), self.mode))
+
+    def takeChanges(self):
+        """
+        KernelWatcher -- takeChanges
+            Takes the changes detected since the last call. A changed file is reported as added, its old version must
+            be unloaded first.
+
+        Params: None
+
+        Returns: tuple(added list[<str>], removed list[<str>]) -- sorted normalized paths
+        """
+
+        with self.lock:
+            pending, self.pending = self.pending, dict()
+
+        return (sorted(kern_path for kern_path, change in pending.items() if change == 'add'),
+                sorted(kern_path for kern_path, change in pending.items() if change == 'remove'))
+
+    def acknowledge(self, kern_path):
+        """
+        KernelWatcher -- acknowledge
+            Records that the REST server itself added, replaced or removed a file (e.g. an upload), so that the change
+            isn't reported again.
+
+        Params: kern_path <str>
+
+        Returns: None
+        """
+
+        kern_path = os.path.normpath(kern_path)
+
+        try:
+            stat_result = os.stat(kern_path)
+            state = (stat_result.st_size, stat_result.st_mtime_ns)
+        except OSError:
+            state = None
+
+        with self.lock:
+            self.unsettled.pop(kern_path, None)
+            self.pending.pop(kern_path, None)
+
+            if state is None:
+                self.known.pop(kern_path, None)
+            else:
+                self.known[kern_path] = state
+
+    def __run(self, inotify):
+        """
+        KernelWatcher -- __run
+            The background thread. Waits for inotify events (or for the poll interval) and scans the directories.
+
+        Params: inotify tuple(<int>, <dict>) -- inotify file descriptor and watched directories by watch descriptor, or
+                    None to poll
+
+        Returns: None
+        """
+
+        unsettled = False
+
+        while True:
+            # files reported as completely written by inotify
+            complete = set()
+
+            if inotify is None:
+                time.sleep(self.poll_interval)
+            else:
+                inotify_fd, watches = inotify
+
+                # wake up after the poll interval only if some file has to be checked again
+                readable, _, _ = select.select([inotify_fd], [], [], self.poll_interval if unsettled else None)
+                if readable:
+                    complete = self.__readEvents(inotify_fd, watches)
+
+            unsettled = self.__update(complete)
+
+    def __update(self, complete):
+        """
+        KernelWatcher -- __update
+            Scans the directories and records the changes.
+
+        Params: complete set[<str>] -- paths of files known to be completely written
+
+        Returns: <bool> -- whether or not some file has to be checked again
+        """
+
+        current = self.__scan()
+
+        with self.lock:
+            for kern_path, state in current.items():
+                if self.known.get(kern_path) == state:
+                    self.unsettled.pop(kern_path, None)
+
+                elif kern_path in complete or self.unsettled.get(kern_path) == state:
+                    self.unsettled.pop(kern_path, None)
+                    self.known[kern_path] = state
+                    self.pending[kern_path] = 'add'
+
+                else:
+                    self.unsettled[kern_path] = state
+
+            for kern_path in [kern_path for kern_path in self.known if kern_path not in current]:
+                del self.known[kern_path]
+                self.pending[kern_path] = 'remove'
+
+            for kern_path in [kern_path for kern_path in self.unsettled if kern_path not in current]:
+                del self.unsettled[kern_path]
+
+            return bool(self.unsettled)
+
+    def __scan(self):
+        """
+        KernelWatcher -- __scan
+            Lists the kernel files in the directories.
+
+        Params: None
+
+        Returns: <dict> -- key: normalized path, value: (size, mtime)
+        """
+
+        files = dict()
+
+        for directory in self.directories:
+            for root, dirs, names in os.walk(directory, topdown=True):
+                for name in names:
+                    if name.split('.')[-1] not in self.extensions:
+                        continue
+
+                    kern_path = os.path.normpath(os.path.join(root, name))
+
+                    try:
+                        stat_result = os.stat(kern_path)
+                    except OSError:
+                        # deleted while scanning
+                        continue
+
+                    files[kern_path] = (stat_result.st_size, stat_result.st_mtime_ns)
+
+        return files
+
+    def __initInotify(self):
+        """
+        KernelWatcher -- __initInotify
+            Sets up inotify watches on the directories and their subdirectories.
+
+        Params: None
+
+        Returns: tuple(<int>, <dict>) -- inotify file descriptor and watched directories by watch descriptor, or None
+            if inotify isn't available
+        """
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        except (OSError, AttributeError, TypeError):
+            return None
+
+        inotify_fd = libc.inotify_init1(IN_CLOEXEC)
+        if inotify_fd < 0:
+            return None
+
+        self.libc = libc
+
+        watches = dict()
+        for directory in self.directories:
+            self.__addWatches(inotify_fd, watches, directory)
+
+        if not watches:
+            os.close(inotify_fd)
+            return None
+
+        return inotify_fd, watches
+
+    def __addWatches(self, inotify_fd, watches, directory):
+        """
+        KernelWatcher -- __addWatches
+            Watches a directory and its subdirectories.
+
+        Params: inotify_fd <int>
+                watches <dict> -- watched directories by watch descriptor, updated
+                directory <str>
+
+        Returns: None
+        """
+
+        for root, dirs, names in os.walk(directory, topdown=True):
+            watch_descriptor = self.libc.inotify_add_watch(inotify_fd, os.fsencode(root), WATCH_MASK)
+            if watch_descriptor >= 0:
+                watches[watch_descriptor] = root
+
+    def __readEvents(self, inotify_fd, watches):
+        """
+        KernelWatcher -- __readEvents
+            Reads the pending inotify events, watching any new subdirectory.
+
+        Params: inotify_fd <int>
+                watches <dict> -- watched directories by watch descriptor, updated
+
+        Returns: set[<str>] -- normalized paths of the files which were closed after writing or moved into place
+        """
+
+        complete = set()
+
+        buffer = os.read(inotify_fd, 64 * 1024)
+
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(buffer):
+            watch_descriptor, mask, _, name_length = INOTIFY_EVENT.unpack_from(buffer, offset)
+            name = os.fsdecode(buffer[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + name_length]
+                               .split(b'\0', 1)[0])
+            offset += INOTIFY_EVENT.size + name_length
+
+            directory = watches.get(watch_descriptor)
+            if directory is None:
+                continue
+
+            # the directory itself is gone
+            if mask & IN_IGNORED:
+                del watches[watch_descriptor]
+                continue
+
+            event_path = os.path.join(directory, name)
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.__addWatches(inotify_fd, watches, event_path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                complete.add(os.path.normpath(event_path))
+
+        return complete
@@ -11,9 +11,12 @@ class MetakernelWriter:
 
     Purpose: This class handles creation of a metakernel file. It simply traverses the default and user_uploaded
         directories of SPICE kernels and adds each path to the metakernel file. This class is created and run once
-        when the REST server starts.
+        when the REST server starts, and again whenever the kernels in the directories change.
     """
 
+    # extensions of the kernel files written into the metakernel
+    KERNEL_EXTENSIONS = ('bsp', 'bpc', 'tls', 'tpc', 'tf')
+
     def write(self):
         """
         MetakernelWriter -- write
@@ -28,7 +31,7 @@ class MetakernelWriter:
         kernel_paths_to_write = list()
 
         # set of valid kernel extensions.
-        valid_kernel_extensions = ('bsp', 'bpc', 'tls', 'tpc', 'tf')
+        valid_kernel_extensions = self.KERNEL_EXTENSIONS
 
         # traverse default kernels directory and add each path to the list
         for root, dirs, files in os.walk('./SPICE/kernels/default/', topdown=True):
@@ -49,8 +52,9 @@ class MetakernelWriter:
         # remove the comma from the end of the last kernel path and change it to a ) instead
         kernel_paths_to_write[-1] = kernel_paths_to_write[-1][:-2] + ')\n'
 
-        # open the metakernel file for writing
-        with open('./SPICE/kernels/cumulative_metakernel.tm', mode='w') as METAKERNEL_FILE:
+        # open a temporary file for writing -- the metakernel is only replaced once it's complete, so a server that
+        # starts up and furnishes it meanwhile, or one restarted after a crash mid-write, never reads a partial file
+        with open('./SPICE/kernels/cumulative_metakernel.tm.tmp', mode='w') as METAKERNEL_FILE:
 
             # write the first two lines
             METAKERNEL_FILE.write('\\begindata\nKERNELS_TO_LOAD=(\n')
@@ -63,3 +67,6 @@ class MetakernelWriter:
 
         # close the file once everything is written
         METAKERNEL_FILE.close()
+
+        # replace the metakernel in a single step
+        os.replace('./SPICE/kernels/cumulative_metakernel.tm.tmp', './SPICE/kernels/cumulative_metakernel.tm')
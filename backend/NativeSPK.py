@@ -0,0 +1,346 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import os
+import numpy as np
+import spiceypy as spice
+from DAFFile import DAFFile
+
+
+class NativeSPK:
+    """
+    NativeSPK class
+
+    Purpose: This class evaluates positions straight from the loaded SPK files, as a fast path in front of spkpos. The
+        default planetary and satellite kernels are made of Chebyshev segments (SPK types 2 and 3), which are simple
+        enough to evaluate with NumPy over a whole time array at once: each SPK file is memory-mapped (see DAFFile.py),
+        the segment covering each sample is picked the same way SPICE picks it (last loaded file first, and within a
+        file the last segment first), and positions are chained through segment centers to the solar system
+        barycenter for both target and observer. Body names are resolved through the name index given to reload
+        (see AetherBodies.getRefFrameID), so no SPICE state is touched while evaluating and it's safe to call from any
+        thread.
+
+        Anything this class can't reproduce exactly -- frames other than J2000, other segment types, or epochs not
+        covered by the loaded kernels -- is left to spkpos: evaluatePositions returns None and the caller falls back.
+        compareWithSpice checks the two engines against each other. A single global instance of this class is
+        instantiated by the REST server.
+    """
+
+    # SPK segment types evaluated natively
+    SUPPORTED_TYPES = (2, 3)
+
+    # frame code of J2000
+    J2000 = 1
+
+    # NAIF ID of the solar system barycenter, the root of every chain
+    SSB = 0
+
+    def __init__(self, enabled=True):
+        """
+        NativeSPK -- init
+            Create the NativeSPK object. No files are mapped until reload is called.
+
+        Params: enabled <bool> -- whether or not evaluatePositions should be used at all
+
+        Returns: None
+        """
+
+        self.enabled = enabled
+
+        # segments of each body, highest priority first -- see reload
+        self.segments = dict()
+
+        # resolves target and observer names without asking SPICE -- see reload
+        self.name_index = None
+
+        # mapped files by (path, size, mtime), so that kernels which didn't change aren't read again
+        self.files = dict()
+
+    def isEnabled(self):
+        """
+        NativeSPK -- isEnabled
+            Checks whether or not the native engine should be used.
+
+        Params: None
+
+        Returns: <bool>
+        """
+
+        return self.enabled
+
+    def reload(self, spk_paths=None, shared_files=None, name_index=None):
+        """
+        NativeSPK -- reload
+            Must be called whenever the REST server furnishes or unloads kernels. Maps every loaded SPK file and indexes
+            its segments by target. The index is built on the side and swapped in with a single assignment, so threads
+            evaluating at the same time see either the old kernel set or the new one.
+
+        Params: spk_paths list[<str>] OPTIONAL -- the SPK files to map, in load order. Every SPK loaded in the SPICE
+                    subsystem if None.
+                shared_files <dict> OPTIONAL -- the files mapped by another NativeSPK object, reused rather than mapped
+                    again when they're in spk_paths
+                name_index <AetherBodies> OPTIONAL -- the bodies whose names targets and observers may be given by.
+                    Only NAIF IDs are evaluated if None.
+
+        Returns: None
+        """
+
+        files = dict()
+        segments = dict()
+
+        # SPKs in load order -- later files take priority, so go backwards
+        if spk_paths is None:
+            spk_paths = [spice.kdata(i, 'SPK')[0] for i in range(spice.ktotal('SPK'))]
+
+        if shared_files is None:
+            shared_files = dict()
+
+        for kern_path in reversed(spk_paths):
+            stat = os.stat(kern_path)
+            file_key = (kern_path, stat.st_size, stat.st_mtime_ns)
+
+            daf_file = self.files.get(file_key) or files.get(file_key) or shared_files.get(file_key) or \
+                DAFFile(kern_path)
+            files[file_key] = daf_file
+
+            # within a file, later segments take priority
+            for summary_idx in reversed(range(len(daf_file.summaries))):
+                (et_start, et_end), (target, center, frame, seg_type, _, _) = daf_file.summaries[summary_idx]
+
+                segments.setdefault(target, list()).append(
+                    (et_start, et_end, center, frame, seg_type, daf_file, summary_idx))
+
+        self.files = files
+        self.segments = segments
+        self.name_index = name_index
+
+    def evaluatePositions(self, target, observer, frame, times):
+        """
+        NativeSPK -- evaluatePositions
+            Computes positions of target w.r.t. observer, the same as spkpos(target, times, frame, 'NONE', observer).
+
+        Params: target <str> -- name or NAIF ID
+                observer <str> -- name or NAIF ID
+                frame <str> -- only 'J2000' is supported
+                times <numpy.ndarray> -- ET times
+
+        Returns: <numpy.ndarray> -- an (n, 3) array of positions in km, or None if the native engine can't evaluate the
+            request and spkpos should be used instead
+        """
+
+        return self.__evaluate(target, observer, frame, times, 3)
+
+    def evaluateStates(self, target, observer, frame, times):
+        """
+        NativeSPK -- evaluateStates
+            Computes states of target w.r.t. observer, the same as spkezr(target, times, frame, 'NONE', observer).
+
+        Params: see evaluatePositions
+
+        Returns: <numpy.ndarray> -- an (n, 6) array of positions in km and velocities in km/s, or None if the native
+            engine can't evaluate the request and spkezr should be used instead
+        """
+
+        return self.__evaluate(target, observer, frame, times, 6)
+
+    def compareWithSpice(self, n_samples=16):
+        """
+        NativeSPK -- compareWithSpice
+            Checks the native engine against spkpos. Every loaded segment of a supported type is evaluated w.r.t. its
+            center at n_samples epochs spread over its time range, by both engines.
+
+        Params: n_samples <int> -- number of epochs per segment
+
+        Returns: list[<dict>] -- {'target', 'center', 'type', 'max error km'} for each segment. 'max error km' is None
+            if either engine couldn't evaluate it (e.g. a higher priority segment of an unsupported type).
+        """
+
+        results = list()
+
+        for target, body_segments in sorted(self.segments.items()):
+            for et_start, et_end, center, frame, seg_type, _, _ in body_segments:
+                if frame != self.J2000 or seg_type not in self.SUPPORTED_TYPES:
+                    continue
+
+                times = np.linspace(et_start, et_end, n_samples)
+
+                native_positions = self.evaluatePositions(str(target), str(center), 'J2000', times)
+
+                try:
+                    spice_positions, _ = spice.spkpos(str(target), times, 'J2000', 'NONE', str(center))
+                except spice.stypes.SpiceyError:
+                    spice_positions = None
+
+                if native_positions is None or spice_positions is None:
+                    max_error = None
+                else:
+                    max_error = float(np.max(np.linalg.norm(native_positions - spice_positions, axis=1)))
+
+                results.append({'target': target, 'center': center, 'type': seg_type, 'max error km': max_error})
+
+        return results
+
+    def __bodyID(self, body):
+        """
+        NativeSPK -- __bodyID
+            Gets the NAIF ID of a target or observer from the name index, without asking SPICE.
+
+        Params: body <str> -- name or NAIF ID
+
+        Returns: <int> or None if the name is unknown, in which case spkpos resolves it
+        """
+
+        try:
+            return int(body)
+        except ValueError:
+            pass
+
+        # capture the index once, in case reload swaps it
+        name_index = self.name_index
+        if name_index is None:
+            return None
+
+        return name_index.getRefFrameID(body)
+
+    def __evaluate(self, target, observer, frame, times, width):
+        """
+        NativeSPK -- __evaluate
+            Computes positions (width 3) or states (width 6) of target w.r.t. observer.
+
+        Params: target <str>, observer <str>, frame <str>, times <numpy.ndarray> -- see evaluatePositions
+                width <int> -- 3 or 6
+
+        Returns: <numpy.ndarray> -- an (n, width) array, or None if the native engine can't evaluate the request
+        """
+
+        if not self.enabled or frame.upper() != 'J2000':
+            return None
+
+        target_id = self.__bodyID(target)
+        observer_id = self.__bodyID(observer)
+        if target_id is None or observer_id is None:
+            return None
+
+        times = np.asarray(times, dtype=np.float64)
+
+        # capture the current index once, in case reload swaps it while evaluating
+        segments = self.segments
+
+        target_states = self.__statesWrtSSB(segments, target_id, times, width)
+        if target_states is None:
+            return None
+
+        observer_states = self.__statesWrtSSB(segments, observer_id, times, width)
+        if observer_states is None:
+            return None
+
+        return target_states - observer_states
+
+    def __statesWrtSSB(self, segments, body_id, times, width):
+        """
+        NativeSPK -- __statesWrtSSB
+            Computes positions or states of a body w.r.t. the solar system barycenter by picking the segment covering
+            each sample, evaluating it, and adding the positions or states of its center (recursively).
+
+        Params: segments <dict> -- the segment index built by reload
+                body_id <int>
+                times <numpy.ndarray> -- ET times
+                width <int> -- 3 for positions, 6 for states
+
+        Returns: <numpy.ndarray> -- an (n, width) array, or None if a sample isn't covered by a segment of a supported
+            type
+        """
+
+        states = np.zeros((len(times), width))
+
+        if body_id == self.SSB:
+            return states
+
+        # samples that haven't been assigned a segment yet
+        remaining = np.ones(len(times), dtype=bool)
+
+        for et_start, et_end, center, frame, seg_type, daf_file, summary_idx in segments.get(body_id, ()):
+            covered = remaining & (times >= et_start) & (times <= et_end)
+            if not covered.any():
+                continue
+
+            # the highest priority segment must be used, so give up if it isn't one that can be evaluated here
+            if frame != self.J2000 or seg_type not in self.SUPPORTED_TYPES:
+                return None
+
+            sample_idx = np.flatnonzero(covered)
+
+            center_states = self.__statesWrtSSB(segments, center, times[sample_idx], width)
+            if center_states is None:
+                return None
+
+            states[sample_idx] = self.__evaluateChebyshev(daf_file.getArray(summary_idx), seg_type, times[sample_idx],
+                                                          width) + center_states
+
+            remaining &= ~covered
+            if not remaining.any():
+                return states
+
+        # some samples aren't covered -- spkpos raises the appropriate error
+        return None
+
+    def __evaluateChebyshev(self, segment, seg_type, times, width):
+        """
+        NativeSPK -- __evaluateChebyshev
+            Evaluates an SPK type 2 or 3 segment. The segment holds N records of RSIZE doubles, followed by INIT,
+            INTLEN, RSIZE and N. Each record is a midpoint and radius followed by Chebyshev coefficients for x, y and z.
+            Type 3 records also hold coefficients for the velocity after those, type 2 velocities are the derivative of
+            the position polynomials.
+
+        Params: segment <numpy.ndarray> -- the segment's data, see DAFFile.getArray
+                seg_type <int> -- 2 or 3
+                times <numpy.ndarray> -- ET times, all within the segment's time range
+                width <int> -- 3 for positions, 6 for positions and velocities
+
+        Returns: <numpy.ndarray> -- an (n, width) array of positions in km (and velocities in km/s)
+        """
+
+        init, intlen, rsize, n_records = segment[-4:]
+        rsize = int(rsize)
+        n_records = int(n_records)
+
+        # the type 3 record holds 6 sets of coefficients rather than 3
+        n_coeffs = (rsize - 2) // (3 if seg_type == 2 else 6)
+
+        records = segment[:n_records * rsize].reshape(n_records, rsize)
+
+        # record covering each sample -- the end of the segment belongs to the last record
+        record_idx = np.clip(np.floor((times - init) / intlen).astype(np.int64), 0, n_records - 1)
+        sample_records = records[record_idx]
+
+        # normalized time within each record's interval
+        radius = sample_records[:, 1]
+        s = (times - sample_records[:, 0]) / radius
+
+        # Chebyshev polynomials T_k(s) with the usual recurrence T_k = 2 s T_k-1 - T_k-2
+        polynomials = np.empty((len(times), n_coeffs))
+        polynomials[:, 0] = 1.0
+        if n_coeffs > 1:
+            polynomials[:, 1] = s
+        for k in range(2, n_coeffs):
+            polynomials[:, k] = 2.0 * s * polynomials[:, k - 1] - polynomials[:, k - 2]
+
+        n_sets = 3 if width == 3 or seg_type == 2 else 6
+        coefficients = sample_records[:, 2:2 + n_sets * n_coeffs].reshape(-1, n_sets, n_coeffs)
+
+        states = np.einsum('nck,nk->nc', coefficients, polynomials)
+
+        if width == 3 or seg_type == 3:
+            return states
+
+        # type 2 velocities -- derivatives T'_k = 2 T_k-1 + 2 s T'_k-1 - T'_k-2, scaled from s to seconds
+        derivatives = np.zeros((len(times), n_coeffs))
+        if n_coeffs > 1:
+            derivatives[:, 1] = 1.0
+        for k in range(2, n_coeffs):
+            derivatives[:, k] = 2.0 * polynomials[:, k - 1] + 2.0 * s * derivatives[:, k - 1] - derivatives[:, k - 2]
+
+        velocities = np.einsum('nck,nk->nc', coefficients, derivatives) / radius[:, np.newaxis]
+
+        return np.hstack((states, velocities))
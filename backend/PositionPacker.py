@@ -0,0 +1,191 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import json
+import struct
+import numpy as np
+
+
+class PositionPacker:
+    """
+    PositionPacker class
+
+    Purpose: This class packs position data into the binary payload format served by the positions endpoint when a
+        client asks for it (Accept: application/octet-stream, or ?format=bin). The JSON payload spells out every
+        coordinate in decimal text, the binary payload instead holds the raw little-endian buffers written directly
+        from the NumPy arrays. Layout of the payload...
+
+        header       magic b'AETH' <4s>, version <uint16>, bytes per coordinate (8 or 4) <uint8>, reserved <uint8>,
+                     number of targets <uint32>, number of samples <uint32>, current time index <int32>,
+                     metadata length <uint32>
+        metadata     UTF-8 JSON: {"grid_et": ..., "targets": [{"name": ..., "info": ..., "origin": [x, y, z]}, ...]},
+                     padded with spaces to a multiple of 8 bytes. grid_et is the ET of the first sample.
+        times        number of samples float64 values (JD)
+        positions    for each target (same order as the metadata), number of samples * 3 float64 or float32 values
+                     (x, y, z interleaved), padded with zeros to a multiple of 8 bytes
+
+        Every buffer starts at an offset that is a multiple of 8 bytes, so a client can view it as a typed array
+        (e.g. a JavaScript Float64Array) without copying. In float32 mode each target's positions are stored relative
+        to its origin (its position at the current time index) to preserve precision. Add the origin back to get
+        positions w.r.t. the observer. In float64 mode the origin is always [0, 0, 0].
+    """
+
+    # binary payload identifier and version
+    MAGIC = b'AETH'
+    VERSION = 1
+
+    # fixed-size part of the header -- see the class docstring
+    HEADER = struct.Struct('<4sHBBIIiI')
+
+    # header of each record of a streamed payload -- see packRecord
+    RECORD = struct.Struct('<IB3xiII4x')
+
+    # record types of a streamed payload
+    RECORD_HEADER = 0
+    RECORD_TIMES = 1
+    RECORD_POSITIONS = 2
+    RECORD_END = 3
+    RECORD_ERROR = 4
+
+    # supported coordinate types
+    DTYPES = {'float64': np.dtype('<f8'), 'float32': np.dtype('<f4')}
+
+    def pack(self, times, cur_time_idx, target_data, dtype='float64', grid_et=None):
+        """
+        PositionPacker -- pack
+            Pack times and per-target positions into a binary payload.
+
+        Params: times <numpy.ndarray> -- the times (JD) shared by every target
+                cur_time_idx <int> -- index of times corresponding to the current time
+                target_data list[tuple[<str>, <str>, <numpy.ndarray>]] -- (name, info, positions) for each target.
+                    positions is an (n, 3) array in km.
+                dtype <str> -- either 'float64' or 'float32'
+                grid_et <float> OPTIONAL -- the ET of the first sample, added to the metadata
+
+        Returns: <bytes>
+        """
+
+        coord_type = self.DTYPES[dtype]
+
+        # metadata and position buffers for each target
+        meta_targets = list()
+        position_buffers = list()
+
+        for name, info, positions in target_data:
+
+            # in float32 mode, store positions relative to the current position so that precision isn't lost far
+            # away from the observer
+            if coord_type.itemsize == 4 and len(positions):
+                origin = positions[min(max(cur_time_idx, 0), len(positions) - 1)]
+                positions = positions - origin
+            else:
+                origin = np.zeros(3)
+
+            meta_targets.append({'name': name, 'info': info, 'origin': origin.tolist()})
+            position_buffers.append(np.ascontiguousarray(positions, dtype=coord_type))
+
+        # encode the metadata and pad it so the buffers after it stay aligned
+        metadata = json.dumps({'grid_et': grid_et, 'targets': meta_targets}).encode('utf-8')
+        metadata += b' ' * (-len(metadata) % 8)
+
+        # assemble the payload -- memoryviews let join copy straight out of the arrays
+        chunks = [
+            self.HEADER.pack(self.MAGIC, self.VERSION, coord_type.itemsize, 0, len(target_data), len(times),
+                             cur_time_idx, len(metadata)),
+            metadata,
+            memoryview(np.ascontiguousarray(times, dtype=self.DTYPES['float64']))
+        ]
+
+        for buffer in position_buffers:
+            chunks.append(memoryview(buffer).cast('B'))
+            chunks.append(b'\0' * (-buffer.nbytes % 8))
+
+        return b''.join(chunks)
+
+    def packRecord(self, record_type, target_idx=-1, offset=0, data=None, origin=None):
+        """
+        PositionPacker -- packRecord
+            Pack a single record of a streamed binary payload. A stream is a sequence of records, each made of a
+            24-byte little-endian header followed by its data...
+
+            header       length of the rest of the record <uint32>, record type <uint8>, reserved <3 bytes>,
+                         target index <int32> (-1 if not a target's record), sample offset <uint32>,
+                         count <uint32>, reserved <uint32>
+            data         RECORD_HEADER / RECORD_ERROR: UTF-8 JSON
+                         RECORD_TIMES: count float64 values (JD)
+                         RECORD_POSITIONS: origin (x, y, z) float64, then count * 3 float64 or float32 values
+                         RECORD_END: nothing
+
+            Data is padded with zeros to a multiple of 8 bytes (included in the length), so every record starts on an
+            8-byte boundary.
+
+        Params: record_type <int> -- one of the RECORD_* constants
+                target_idx <int> -- index of the target in the header record's target list
+                offset <int> -- index of the record's first sample in the whole grid
+                data <bytes>, <numpy.ndarray> or None -- JSON bytes, times or positions (see above)
+                origin <numpy.ndarray> -- only for RECORD_POSITIONS, the origin the positions are relative to
+
+        Returns: <bytes>
+        """
+
+        chunks = list()
+        count = 0
+
+        if record_type == self.RECORD_POSITIONS:
+            count = len(data)
+            chunks.append(memoryview(np.ascontiguousarray(origin, dtype=self.DTYPES['float64'])).cast('B'))
+            chunks.append(memoryview(np.ascontiguousarray(data)).cast('B'))
+        elif record_type == self.RECORD_TIMES:
+            count = len(data)
+            chunks.append(memoryview(np.ascontiguousarray(data, dtype=self.DTYPES['float64'])).cast('B'))
+        elif data is not None:
+            chunks.append(data)
+
+        data_len = sum(len(chunk) for chunk in chunks)
+        padding = b'\0' * (-data_len % 8)
+
+        header = self.RECORD.pack(self.RECORD.size - 4 + data_len + len(padding), record_type, target_idx, offset,
+                                  count)
+
+        return b''.join([header] + chunks + [padding])
+
+    def unpack(self, payload):
+        """
+        PositionPacker -- unpack
+            Decode a binary payload created by pack. This is mostly useful for Python clients and for checking the
+            format, since positions are returned w.r.t. the observer (origins added back) as float64 arrays.
+
+        Params: payload <bytes>
+
+        Returns: <dict> -- {'times': <numpy.ndarray>, 'cur_time_idx': <int>, 'grid_et': <float> or None,
+                            'targets': {name: {'info': <str>, 'positions': <numpy.ndarray>}}}
+        """
+
+        magic, version, itemsize, _, n_targets, n_samples, cur_time_idx, meta_len = self.HEADER.unpack_from(payload)
+
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError("Payload is not a version {} Aether position payload.".format(self.VERSION))
+
+        # metadata follows the header
+        offset = self.HEADER.size
+        metadata = json.loads(payload[offset:offset + meta_len].decode('utf-8'))
+        offset += meta_len
+
+        # times are always float64
+        times = np.frombuffer(payload, dtype=self.DTYPES['float64'], count=n_samples, offset=offset)
+        offset += times.nbytes
+
+        coord_type = self.DTYPES['float64'] if itemsize == 8 else self.DTYPES['float32']
+
+        targets = dict()
+        for meta in metadata['targets']:
+            positions = np.frombuffer(payload, dtype=coord_type, count=n_samples * 3, offset=offset).reshape(-1, 3)
+            offset += positions.nbytes + (-positions.nbytes % 8)
+
+            targets[meta['name']] = {
+                'info': meta['info'],
+                'positions': positions.astype(np.float64) + np.array(meta['origin'])
+            }
+
+        return {'times': times, 'cur_time_idx': cur_time_idx, 'grid_et': metadata.get('grid_et'), 'targets': targets}
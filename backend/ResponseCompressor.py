@@ -0,0 +1,235 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import gzip
+import threading
+from flask import Response
+
+# zstd and brotli are optional -- gzip is always available
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class CompressedBody:
+    """
+    CompressedBody class
+
+    Purpose: This class holds a serialized response body together with its compressed forms, one for each encoding the
+        REST server can produce. It is created by ResponseCompressor.precompress and stored next to a cached result
+        (e.g. a warmed up available-bodies response), so that serving the result neither serializes nor compresses it
+        again.
+    """
+
+    __slots__ = ('body', 'encoded', 'mimetype')
+
+    def __init__(self, body, encoded, mimetype):
+        """
+        CompressedBody -- init
+            Create the CompressedBody object.
+
+        Params: body <bytes> -- the uncompressed body
+                encoded <dict> -- key: encoding <str>, value: compressed body <bytes>
+                mimetype <str>
+
+        Returns: None
+        """
+
+        self.body = body
+        self.encoded = encoded
+        self.mimetype = mimetype
+
+
+class ResponseCompressor:
+    """
+    ResponseCompressor class
+
+    Purpose: This class compresses REST server responses according to the client's Accept-Encoding header. JSON position
+        and time arrays are long runs of decimal text, which compress extremely well. zstd and brotli are used when
+        their packages are installed and the client accepts them, otherwise gzip. Responses are compressed as they are
+        sent, at a level which adapts to the size of the body: small bodies get the best ratio, large ones a fast level
+        so compression doesn't outweigh the transfer it saves.
+
+        Results which are cached anyway (e.g. warmed up available-bodies responses) are compressed once, with every
+        encoding at its best level, when they are computed (see precompress), and the compressed bodies are kept with
+        them. Nothing else is kept, so one-off responses cost no memory. A single global instance of this class is
+        instantiated by the REST server.
+    """
+
+    # bodies smaller than this aren't worth compressing
+    MIN_BYTES = 1024
+
+    # compression levels by encoding, for bodies up to each size (bytes) -- the last level is used above that
+    LEVELS = {
+        'zstd': ((64 * 1024, 19), (1024 * 1024, 10), (None, 3)),
+        'br': ((64 * 1024, 11), (1024 * 1024, 5), (None, 1)),
+        'gzip': ((64 * 1024, 9), (1024 * 1024, 6), (None, 1))
+    }
+
+    def __init__(self):
+        """
+        ResponseCompressor -- init
+            Create the ResponseCompressor object.
+
+        Params: None
+
+        Returns: None
+        """
+
+        # encodings that can be produced, in order of preference
+        self.encodings = list()
+        if zstandard is not None:
+            self.encodings.append('zstd')
+        if brotli is not None:
+            self.encodings.append('br')
+        self.encodings.append('gzip')
+
+        # counters reported by getStats
+        self.precompressed = 0
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        # the REST server may serve requests from several threads
+        self.lock = threading.Lock()
+
+    def compressResponse(self, response, accept_encodings):
+        """
+        ResponseCompressor -- compressResponse
+            Compresses the body of a response in place, if the client accepts one of the available encodings and the
+            response is worth compressing. Streamed responses are left alone, since their body isn't available up front,
+            and so are responses built by makeResponse, which are encoded already.
+
+        Params: response <flask.Response>
+                accept_encodings <werkzeug.datastructures.Accept> -- the request's Accept-Encoding header
+
+        Returns: <flask.Response> -- the same response
+        """
+
+        # only complete, successful responses which aren't encoded already
+        if response.is_streamed or response.direct_passthrough or response.status_code != 200 or \
+                'Content-Encoding' in response.headers:
+            return response
+
+        body = response.get_data()
+        if len(body) < self.MIN_BYTES:
+            return response
+
+        # the response depends on Accept-Encoding from here on, whether it gets compressed or not
+        response.vary.add('Accept-Encoding')
+
+        encoding = accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        compressed = self.compress(body, encoding)
+
+        with self.lock:
+            self.compressed += 1
+            self.bytes_in += len(body)
+            self.bytes_out += len(compressed)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+
+        return response
+
+    def compress(self, body, encoding, level=None):
+        """
+        ResponseCompressor -- compress
+            Compresses a body.
+
+        Params: body <bytes>
+                encoding <str> -- 'zstd', 'br' or 'gzip'
+                level <int> OPTIONAL -- the compression level. Chosen by the size of the body if None.
+
+        Returns: <bytes>
+        """
+
+        if level is None:
+            level = [level for max_size, level in self.LEVELS[encoding]
+                     if max_size is None or len(body) <= max_size][0]
+
+        if encoding == 'zstd':
+            return zstandard.ZstdCompressor(level=level).compress(body)
+        elif encoding == 'br':
+            return brotli.compress(body, quality=level)
+        else:
+            return gzip.compress(body, compresslevel=level)
+
+    def precompress(self, body, mimetype='application/json'):
+        """
+        ResponseCompressor -- precompress
+            Compresses a body with every available encoding, at the best level of each, to be stored with a cached
+            result. Meant to be called where the result is computed (e.g. the warm-up thread) rather than per request.
+
+        Params: body <bytes> -- the serialized result
+                mimetype <str> OPTIONAL
+
+        Returns: <CompressedBody>
+        """
+
+        encoded = dict()
+
+        if len(body) >= self.MIN_BYTES:
+            for encoding in self.encodings:
+                encoded[encoding] = self.compress(body, encoding, self.LEVELS[encoding][0][1])
+
+        return CompressedBody(body, encoded, mimetype)
+
+    def makeResponse(self, compressed_body, accept_encodings, status=200):
+        """
+        ResponseCompressor -- makeResponse
+            Builds a response out of a precompressed body, in the encoding the client prefers. Nothing is serialized or
+            compressed.
+
+        Params: compressed_body <CompressedBody>
+                accept_encodings <werkzeug.datastructures.Accept> -- the request's Accept-Encoding header
+                status <int> OPTIONAL
+
+        Returns: <flask.Response>
+        """
+
+        encoding = accept_encodings.best_match(list(compressed_body.encoded))
+
+        if encoding is None:
+            response = Response(response=compressed_body.body, status=status, mimetype=compressed_body.mimetype)
+        else:
+            response = Response(response=compressed_body.encoded[encoding], status=status,
+                                mimetype=compressed_body.mimetype)
+            response.headers['Content-Encoding'] = encoding
+
+            with self.lock:
+                self.precompressed += 1
+                self.bytes_in += len(compressed_body.body)
+                self.bytes_out += len(compressed_body.encoded[encoding])
+
+        if compressed_body.encoded:
+            response.vary.add('Accept-Encoding')
+
+        return response
+
+    def getStats(self):
+        """
+        ResponseCompressor -- getStats
+            Gets the compression counters.
+
+        Params: None
+
+        Returns: <dict>
+        """
+
+        with self.lock:
+            return {
+                'encodings': list(self.encodings),
+                'served precompressed': self.precompressed,
+                'compressed on request': self.compressed,
+                'compression ratio': self.bytes_out / self.bytes_in if self.bytes_in else None
+            }
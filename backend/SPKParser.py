@@ -1,91 +1,167 @@
-from os import popen
-# import re
-# from datetime import datetime
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+from datetime import datetime, timedelta
+import spiceypy as spice
+from DAFFile import DAFFile
+
+
+def readCoverage(path_to_kernel):
+    """
+    SPKParser.py -- readCoverage
+        Reads the coverage of each (target, center) pair of an SPK kernel from its segment summaries. The segments of
+        each pair are merged into non-overlapping intervals, like brief -c does, and the pairs with the same intervals
+        are grouped together. It doesn't use the SPICE subsystem, so kernels can be read in worker processes.
+
+    Params: path_to_kernel <str> -- path to the kernel
+
+    Returns: list[tuple[pairs list[tuple[target <int>, center <int>]], intervals tuple[tuple[<float>, <float>]]]] --
+        pairs sorted by NAIF ID, intervals as sorted (ET start, ET end). Empty if the file is not a binary SPK kernel.
+    """
+
+    try:
+        daf_file = DAFFile(path_to_kernel)
+    except (ValueError, OSError):
+        return list()
+
+    # SPK summaries have ND = 2 and NI = 6
+    if daf_file.kind != 'SPK' or daf_file.nd != 2 or daf_file.ni != 6:
+        return list()
+
+    # intervals of each (target, center) pair, in file order -- key: (target, center), value: list[(start, end)]
+    pair_intervals = dict()
+
+    for (et_start, et_end), integers in daf_file.summaries:
+        pair_intervals.setdefault((integers[0], integers[1]), list()).append((et_start, et_end))
+
+    # pairs grouped by identical merged intervals -- key: tuple of intervals, value: list of pairs
+    groups = dict()
+
+    for pair, intervals in pair_intervals.items():
+        groups.setdefault(mergeIntervals(intervals), list()).append(pair)
+
+    return [(sorted(pairs), intervals) for intervals, pairs in groups.items()]
+
+
+def mergeIntervals(intervals):
+    """
+    SPKParser.py -- mergeIntervals
+        Merges overlapping or touching intervals.
+
+    Params: intervals list[tuple[<float>, <float>]] -- (ET start, ET end) of each segment
+
+    Returns: tuple[tuple[<float>, <float>]] -- sorted, non-overlapping intervals
+    """
+
+    merged = list()
+
+    for et_start, et_end in sorted(intervals):
+        if merged and et_start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], et_end))
+        else:
+            merged.append((et_start, et_end))
+
+    return tuple(merged)
+
 
 class SPKParser:
-    
-    
-    
-    def parse(self, path_to_kernel):
-        #Input: path_to_kernel: the path of the kernel that needs to parse, under /SPICE/kernels/
-        #Output: Dictionary of bodies infomation, start time nd end time of the time interval of the kernel.
-        #Output formate: {'bodies':[(body_name:str, wrt:str, naif_id:int),...], 'time_start': %Y-%m-%d %H:%M:%S.%f, 'time_end': %Y-%m-%d %H:%M:%S.%f}
-        
-
-        #Stdout of brief
-        output = popen("./SPICE/tools/brief -c " + path_to_kernel).read()
-        
-        
-        lines=output.split('\n')
-        bodies=[]
-        time_start=''
-        time_end=''
-        results=[]
-        for i in range(len(lines)):
-            
-            #Removing the word "Bodies:"
-            
-            if 'Bodies:' or 'Body:' in lines[i]:
-                lines[i]=lines[i][6:]
-                d={}
-                
-                
-            #For each line about bodies
-            
-            if 'w.r.t.' in lines[i]:
-                line=lines[i]
-                name_str, wrt_str=line.split('w.r.t.')
-                
-                #Bodies have both name and naif_id
-                if '(' in name_str:
-                    naif_id=int(name_str[name_str.find('(')+1:name_str.find(')')])
-                    name=''.join(e for e in name_str[:name_str.find('(')] if e.isalnum() or e==' ' or e=='-').strip()
-                
-                #Bodies have only naif_id
-                else:
-                    name = ''.join(e for e in name_str if e.isalnum() or e==' ' or e=='-').strip()
-                    naif_id = int(name)
-                
-                #get w.r.t. of the body
-                #w.r.t. has both name and naif_id
-                if '(' in wrt_str:
-                    wrt = ''.join(e for e in wrt_str[:wrt_str.find('(')] if e.isalnum() or e==' ' or e=='-').strip()
-                #w.r.t. has only naif_id
-                else:
-                    wrt = ''.join(e for e in wrt_str if e.isalnum() or e==' ' or e=='-').strip()
-
-                bodies.append((name,wrt,naif_id)) 
-                
-                
-                
-            #Get Start time and End time of the Kernel   
-                
-            elif 'Start of Interval' in lines[i]:
-                
-                index = 0
-                
-                # While one set of bodies have multiple time range:
-                while lines[i+2+index].strip() != '':
-                    
-                    line=lines[i+2+index].strip()
-                
-                
-                    #Transfer time formate
-                    # time_start = datetime.strptime(line[:24], "%Y %b %d %H:%M:%S.%f").strftime("%Y-%m-%d %H:%M:%S.%f")
-                    # time_end = datetime.strptime(line[-24:], "%Y %b %d %H:%M:%S.%f").strftime("%Y-%m-%d %H:%M:%S.%f")
-                    # results.append({'bodies': bodies, 'time_start':time_start[:-3], 'time_end':time_end[:-3]})
-
-
-                    # B.C. Check
-                    time_start = line[:24] if 'B.C.' not in line[:30] else '0001 JAN 01 00:00:00.000'                    
-                    time_end = line[-24:] if 'B.C.' not in line[-30:] else '0001 Dec 31 00:00:00.000'
-
-
-
-                    results.append({ 'bodies': bodies, 'time_start': time_start, 'time_end': time_end })
-                    
-                    index += 1
-                    
-                bodies = []
+    """
+    SPKParser class
+
+    Purpose: This class gets the bodies and valid time ranges of a binary SPK kernel. Rather than running the
+        command-line utility brief on the kernel and parsing its text output, the segment summaries are read directly
+        from the memory-mapped DAF file (see the DAFFile class). Each SPK segment summary holds its start and end ET
+        (the two doubles) and its target, center, frame, type and addresses (the six integers). Reading the coverage
+        (see readCoverage) is kept apart from looking up body names, so that kernels can be read in parallel.
+    """
+
+    # J2000 epoch as a TDB datetime, ET is seconds past it
+    J2000_EPOCH = datetime(year=2000, month=1, day=1, hour=12)
+
+    # date/time format of time_start and time_end, the format brief prints
+    TIME_FORMAT = "%Y %b %d %H:%M:%S.%f"
+
+    def parse(self, path_to_kernel, coverage=None):
+        """
+        SPKParser -- parse
+            Gets the bodies of an SPK kernel and the time ranges they are covered over. Must be called from the
+            process's main thread since body names are looked up in the SPICE subsystem.
+
+        Params: path_to_kernel <str> -- path to the kernel, under SPICE/kernels/
+                coverage OPTIONAL -- the kernel's coverage if it was already read with readCoverage, e.g. by a worker
+                    process. It is read from the kernel if None.
+
+        Returns: list[dict] -- one dictionary per interval. Format...
+            {
+                'bodies': list[tuple[body_name <str>, wrt <str>, naif_id <int>]] -- upper case names, or the NAIF ID
+                    as a string if the body has no name
+                'time_start': <str> -- TDB, e.g. '2000 JAN 01 12:00:00.000000'
+                'time_end': <str> -- TDB
+                'et_start': <float> -- exact ET of the start of the interval
+                'et_end': <float> -- exact ET of the end of the interval
+            }
+            An empty list is returned if the file is not a binary SPK kernel.
+        """
+
+        if coverage is None:
+            coverage = readCoverage(path_to_kernel)
+
+        # NAIF ID to name lookups -- bodies are usually the center of several others
+        names = dict()
+
+        results = list()
+
+        for pairs, intervals in coverage:
+            bodies = [(self.__bodyName(target, names), self.__bodyName(center, names), target)
+                      for target, center in pairs]
+
+            for et_start, et_end in intervals:
+                results.append({
+                    'bodies': bodies,
+                    'time_start': self.__formatEt(et_start),
+                    'time_end': self.__formatEt(et_end),
+                    'et_start': et_start,
+                    'et_end': et_end
+                })
 
         return results
+
+    def __bodyName(self, naif_id, names):
+        """
+        SPKParser -- __bodyName
+            Gets the name of a body.
+
+        Params: naif_id <int>
+                names <dict> -- names looked up so far, updated
+
+        Returns: <str> -- upper case name, or the NAIF ID as a string if the body has no name
+        """
+
+        if naif_id not in names:
+            try:
+                names[naif_id] = spice.bodc2n(naif_id).upper()
+            except spice.stypes.SpiceyError:
+                names[naif_id] = str(naif_id)
+
+        return names[naif_id]
+
+    def __formatEt(self, et):
+        """
+        SPKParser -- __formatEt
+            Formats an ET as a TDB date/time string. TDB has no leap seconds, so this is simply an offset from J2000.
+
+        Params: et <float>
+
+        Returns: <str> -- see TIME_FORMAT
+        """
+
+        try:
+            dtime_obj = self.J2000_EPOCH + timedelta(seconds=et)
+        except OverflowError:
+            # datetime only holds years 1 to 9999, so e.g. B.C. dates are clamped -- et_start/et_end remain exact and
+            # are what AetherBodies indexes coverage by
+            dtime_obj = datetime.min if et < 0 else datetime.max
+
+        # strftime doesn't zero-pad years before 1000 on every platform, but strptime needs four digits
+        return '{:04d}{}'.format(dtime_obj.year, dtime_obj.strftime(self.TIME_FORMAT[2:])).upper()
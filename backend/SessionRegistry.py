@@ -0,0 +1,184 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import os
+import re
+import time
+import shutil
+import threading
+import multiprocessing
+from KernelSession import KernelSession
+
+
+class SessionRegistry:
+    """
+    SessionRegistry class
+
+    Purpose: This class keeps the kernel sessions of the REST server's clients (see KernelSession.py). A client names
+        its session with an ID of its choosing, and the kernels it uploads are saved in its own directory under
+        backend/SPICE/kernels/sessions and only seen by its own requests. Sessions which made no request for longer
+        than the idle limit are evicted, their worker processes stopped and their kernels deleted. Since clients pick
+        their own IDs, the number of sessions is capped too: creating one more evicts the least recently used session.
+        Sessions only live in memory, so the sessions directory is emptied when the REST server starts.
+
+        The registry also counts the generations of the server's kernel set: the server calls invalidate whenever its
+        kernels change, and each session rebuilds its layers on top of the new set the next time it's used. A single
+        global instance of this class is instantiated by the REST server.
+    """
+
+    # session IDs are used as directory names, so only these are accepted
+    ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+    def __init__(self, root_dir, base_bodies, base_native_spk, idle_seconds, max_sessions, spice_workers, cache_bytes):
+        """
+        SessionRegistry -- init
+            Create the SessionRegistry object, and empty the sessions directory.
+
+        Params: root_dir <str> -- the directory holding a subdirectory for each session
+                base_bodies <AetherBodies> -- the REST server's bodies
+                base_native_spk <NativeSPK> -- the REST server's native SPK engine
+                idle_seconds <float> -- how long a session may go without a request before it is evicted
+                max_sessions <int> -- how many sessions may exist at once
+                spice_workers <int> -- the number of SPICE worker processes of each session
+                cache_bytes <int> -- the byte budget of each session's ephemeris cache
+
+        Returns: None
+        """
+
+        self.root_dir = root_dir
+        self.base_bodies = base_bodies
+        self.base_native_spk = base_native_spk
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max(1, max_sessions)
+        self.spice_workers = spice_workers
+        self.cache_bytes = cache_bytes
+
+        # key: session ID, value: <KernelSession>
+        self.sessions = dict()
+
+        # generation of the server's kernel set -- increased by invalidate
+        self.generation = 0
+
+        # guards sessions and generation
+        self.lock = threading.Lock()
+
+        # kernels of sessions from a previous run can't be used by anyone anymore -- spawned worker processes import the
+        # REST server module again, and must leave the directory alone
+        if multiprocessing.current_process().name == 'MainProcess':
+            shutil.rmtree(root_dir, ignore_errors=True)
+            os.makedirs(root_dir, exist_ok=True)
+
+    @classmethod
+    def isValidID(cls, session_id):
+        """
+        SessionRegistry -- isValidID
+            Checks whether or not a session ID is acceptable: 8 to 64 letters, digits, dashes or underscores.
+
+        Params: session_id <str>
+
+        Returns: <bool>
+        """
+
+        return cls.ID_PATTERN.match(session_id) is not None
+
+    def get(self, session_id, create=False):
+        """
+        SessionRegistry -- get
+            Gets a session, marking it as used. The session's layers are rebuilt if the server's kernel set changed.
+            Must be called from a request.
+
+        Params: session_id <str> -- a valid session ID, see isValidID
+                create <bool> OPTIONAL -- create the session if it doesn't exist. The least recently used session is
+                    evicted if there are max_sessions already.
+
+        Returns: <KernelSession> -- or None if the session doesn't exist and create is False
+        """
+
+        evicted_session = None
+
+        with self.lock:
+            session = self.sessions.get(session_id)
+
+            if session is None and create:
+                if len(self.sessions) >= self.max_sessions:
+                    lru_id = min(self.sessions, key=lambda other_id: self.sessions[other_id].last_used)
+                    evicted_session = self.sessions.pop(lru_id)
+
+                directory = os.path.join(self.root_dir, session_id)
+                os.makedirs(directory, exist_ok=True)
+
+                session = KernelSession(session_id, directory, self.base_bodies, self.base_native_spk,
+                                        self.spice_workers, self.cache_bytes)
+                self.sessions[session_id] = session
+
+            generation = self.generation
+
+        # stop the evicted session's workers outside the lock, like evictIdle
+        if evicted_session is not None:
+            evicted_session.close()
+            print("Evicted session {} to make room for {}.".format(evicted_session.session_id, session_id))
+
+        if session is None:
+            return None
+
+        session.last_used = time.time()
+        session.refresh(generation)
+
+        return session
+
+    def invalidate(self):
+        """
+        SessionRegistry -- invalidate
+            Must be called whenever the REST server furnishes or unloads kernels.
+
+        Params: None
+
+        Returns: None
+        """
+
+        with self.lock:
+            self.generation += 1
+
+    def evictIdle(self):
+        """
+        SessionRegistry -- evictIdle
+            Evicts the sessions which made no request for longer than the idle limit. The REST server calls this
+            before every request.
+
+        Params: None
+
+        Returns: None
+        """
+
+        now = time.time()
+
+        with self.lock:
+            idle_ids = [session_id for session_id, session in self.sessions.items()
+                        if now - session.last_used > self.idle_seconds]
+            idle_sessions = [self.sessions.pop(session_id) for session_id in idle_ids]
+
+        for session in idle_sessions:
+            session.close()
+            print("Evicted idle session {}.".format(session.session_id))
+
+    def getStats(self):
+        """
+        SessionRegistry -- getStats
+            Gets the number of sessions, and of the kernels uploaded in them, along with the limits sessions are
+            evicted by.
+
+        Params: None
+
+        Returns: <dict>
+        """
+
+        with self.lock:
+            sessions = list(self.sessions.values())
+
+        return {
+            'sessions': len(sessions),
+            'session kernels': sum(len(session.getKernels()) for session in sessions),
+            'idle seconds': self.idle_seconds,
+            'max sessions': self.max_sessions
+        }
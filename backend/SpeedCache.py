@@ -0,0 +1,139 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import os
+import json
+import threading
+
+
+class SpeedCache:
+    """
+    SpeedCache class
+
+    Purpose: This class holds the min and max speeds computed for the available-bodies and spk-upload endpoints, so that
+        they're only computed once per body and observer rather than on every new simulation. Each entry is keyed by
+        body, observer and a fingerprint of the kernels the states of the two are computed from (see
+        AetherBodies.getChainKernelPaths), so an entry only goes stale when one of those kernels is added, removed or
+        changed. Entries are persisted to a JSON file so
+        that they survive restarts of the REST server. Format of the file...
+
+        { 'version': VERSION <int>,
+          'bodies': { body <str>: { observer <str>: [fingerprint <str>, min speed <float>, max speed <float>], ... },
+                      ... } }
+
+        A single global instance of this class is instantiated by the REST server.
+    """
+
+    # must be increased whenever the way speeds are computed changes, so that files written before are ignored
+    VERSION = 2
+
+    def __init__(self, file_path):
+        """
+        SpeedCache -- init
+            Create the SpeedCache object and read the entries persisted by a previous run, if any. A missing or
+            unreadable file, or one written by another version, simply starts an empty cache.
+
+        Params: file_path <str> -- path of the JSON file holding the entries
+
+        Returns: None
+        """
+
+        self.file_path = file_path
+
+        # entries by body, then by observer -- see the class docstring
+        self.entries = dict()
+
+        # whether or not the entries changed since they were last written to the file
+        self.dirty = False
+
+        # the REST server may serve requests from several threads
+        self.lock = threading.Lock()
+
+        try:
+            with open(file_path, 'r') as CACHE_FILE:
+                cache_file = json.load(CACHE_FILE)
+
+            if isinstance(cache_file, dict) and cache_file.get('version') == self.VERSION:
+                self.entries = cache_file['bodies']
+        except (OSError, ValueError):
+            pass
+
+    def get(self, bod_id, wrt, fingerprint):
+        """
+        SpeedCache -- get
+            Gets the min and max speeds of a body w.r.t. an observer, if they were computed from the same kernels.
+
+        Params: bod_id <str> -- NAIF ID or name of the body
+                wrt <str> -- NAIF ID or name of the observer
+                fingerprint <str> -- fingerprint of the kernels the states of the body and the observer are computed
+                    from
+
+        Returns: tuple[<float>, <float>] or None if there's no entry for the current kernels
+        """
+
+        with self.lock:
+            entry = self.entries.get(str(bod_id), dict()).get(str(wrt))
+
+        if entry is None or entry[0] != fingerprint:
+            return None
+
+        return entry[1], entry[2]
+
+    def put(self, bod_id, wrt, fingerprint, min_max_speeds):
+        """
+        SpeedCache -- put
+            Stores the min and max speeds of a body w.r.t. an observer. Entries are only written to the file by save.
+
+        Params: bod_id <str>, wrt <str>, fingerprint <str> -- see get
+                min_max_speeds tuple[<float>, <float>]
+
+        Returns: None
+        """
+
+        with self.lock:
+            self.entries.setdefault(str(bod_id), dict())[str(wrt)] = [fingerprint, min_max_speeds[0],
+                                                                       min_max_speeds[1]]
+            self.dirty = True
+
+    def invalidate(self, bod_ids):
+        """
+        SpeedCache -- invalidate
+            Drops every entry of the given bodies. It is called when a kernel covering them is added or removed, since
+            their entries can't be hit again.
+
+        Params: bod_ids iterable[<int> or <str>] -- NAIF IDs of the bodies
+
+        Returns: None
+        """
+
+        with self.lock:
+            for bod_id in bod_ids:
+                if self.entries.pop(str(bod_id), None) is not None:
+                    self.dirty = True
+
+    def save(self):
+        """
+        SpeedCache -- save
+            Writes the entries to the file if they changed. The file is replaced atomically, so a crash while writing
+            never leaves a truncated file behind.
+
+        Params: None
+
+        Returns: None
+        """
+
+        with self.lock:
+            if not self.dirty:
+                return
+
+            temp_path = self.file_path + '.tmp'
+
+            try:
+                with open(temp_path, 'w') as CACHE_FILE:
+                    json.dump({'version': self.VERSION, 'bodies': self.entries}, CACHE_FILE)
+
+                os.replace(temp_path, self.file_path)
+                self.dirty = False
+            except OSError as error:
+                print("Could not write the speed cache to {}: {}".format(self.file_path, error))
@@ -0,0 +1,138 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import numpy as np
+
+
+class SpeedExtrema:
+    """
+    SpeedExtrema class
+
+    Purpose: This class finds the min and max speeds of a body w.r.t. an observer over its valid time ranges, for the
+        available-bodies endpoint. Each time range is sampled uniformly and the states of every sample are computed in
+        a single batch, speeds being the norms of the velocities. Sampling alone misses short-lived extrema such as the
+        periapsis speed of an eccentric orbit, so the best few local maxima and minima are then refined with a bracket
+        search: each bracket (the samples either side of a candidate) is resampled, shrunk around its best sample, and
+        the process repeated. The brackets of every candidate are resampled together in one batch per round. A single
+        global instance of this class is instantiated by the REST server.
+    """
+
+    # number of uniform samples in each time range
+    SAMPLES = 2000
+
+    # seconds kept clear of the ends of each time range, since the printed coverage of a kernel is rounded
+    EDGE_MARGIN = 1.0
+
+    # number of local maxima and of local minima refined
+    CANDIDATES = 16
+
+    # number of samples in each bracket per round, and the number of rounds -- each round shrinks a bracket to
+    # 2 / (BRACKET_SAMPLES - 1) of its width
+    BRACKET_SAMPLES = 9
+    ROUNDS = 8
+
+    def findMinMax(self, et_ranges, compute):
+        """
+        SpeedExtrema -- findMinMax
+            Finds the min and max speeds over the given time ranges.
+
+        Params: et_ranges list[tuple[<float>, <float>]] -- ET start and end of each time range
+                compute <function> -- computes states, called as compute(times) with an array of ET times, returning an
+                    (n, 6) array of positions in km and velocities in km/s
+
+        Returns: tuple[<float>, <float>] -- the min and max speed (km/s)
+        """
+
+        # keep clear of the ends, very short ranges are sampled once in the middle
+        starts = np.array([et_start for et_start, _ in et_ranges], dtype=np.float64) + self.EDGE_MARGIN
+        ends = np.array([et_end for _, et_end in et_ranges], dtype=np.float64) - self.EDGE_MARGIN
+        too_short = ends <= starts
+        starts[too_short] = ends[too_short] = (starts[too_short] + ends[too_short]) / 2
+
+        # sample every range at once -- range_id maps each sample back to its range
+        n_samples = np.where(too_short, 1, self.SAMPLES)
+        range_id = np.repeat(np.arange(len(starts)), n_samples)
+        first_sample = np.cumsum(n_samples) - n_samples
+        fraction = (np.arange(len(range_id)) - first_sample[range_id]) / np.maximum(n_samples[range_id] - 1, 1)
+        times = starts[range_id] + fraction * (ends[range_id] - starts[range_id])
+
+        speeds = self.__speeds(times, compute)
+
+        # neighbours of each sample within its own range
+        has_left = np.concatenate(([False], range_id[1:] == range_id[:-1]))
+        has_right = np.concatenate((range_id[1:] == range_id[:-1], [False]))
+        left_idx = np.where(has_left, np.arange(len(times)) - 1, np.arange(len(times)))
+        right_idx = np.where(has_right, np.arange(len(times)) + 1, np.arange(len(times)))
+
+        # refine the best local maxima (sign 1) and local minima (sign -1) together
+        bracket_starts = list()
+        bracket_ends = list()
+        signs = list()
+
+        for sign in (1.0, -1.0):
+            signed = sign * speeds
+            is_extremum = (signed >= signed[left_idx]) & (signed >= signed[right_idx])
+
+            candidates = np.flatnonzero(is_extremum)
+            candidates = candidates[np.argsort(-signed[candidates])[:self.CANDIDATES]]
+
+            bracket_starts.append(times[left_idx[candidates]])
+            bracket_ends.append(times[right_idx[candidates]])
+            signs.append(np.full(len(candidates), sign))
+
+        best_max, best_min = self.__refine(np.concatenate(bracket_starts), np.concatenate(bracket_ends),
+                                           np.concatenate(signs), compute)
+
+        return float(min(np.min(speeds), best_min)), float(max(np.max(speeds), best_max))
+
+    def __refine(self, bracket_starts, bracket_ends, signs, compute):
+        """
+        SpeedExtrema -- __refine
+            Shrinks each bracket around the largest (sign 1) or smallest (sign -1) speed within it.
+
+        Params: bracket_starts <numpy.ndarray> -- ET start of each bracket
+                bracket_ends <numpy.ndarray> -- ET end of each bracket
+                signs <numpy.ndarray> -- 1 for each bracket around a maximum, -1 for each bracket around a minimum
+                compute <function> -- see findMinMax
+
+        Returns: tuple[<float>, <float>] -- the largest and smallest speeds found in the brackets (-inf and inf if there
+            are no brackets of either kind)
+        """
+
+        best_max = -np.inf
+        best_min = np.inf
+
+        if not len(signs):
+            return best_max, best_min
+
+        steps = np.linspace(0.0, 1.0, self.BRACKET_SAMPLES)
+        rows = np.arange(len(signs))
+
+        for _ in range(self.ROUNDS):
+            times = bracket_starts[:, np.newaxis] + (bracket_ends - bracket_starts)[:, np.newaxis] * steps
+            speeds = self.__speeds(times.ravel(), compute).reshape(times.shape)
+
+            best_max = max(best_max, np.max(speeds[signs > 0], initial=-np.inf))
+            best_min = min(best_min, np.min(speeds[signs < 0], initial=np.inf))
+
+            # shrink each bracket to the samples either side of its best one
+            best_idx = np.argmax(signs[:, np.newaxis] * speeds, axis=1)
+            bracket_starts = times[rows, np.maximum(best_idx - 1, 0)]
+            bracket_ends = times[rows, np.minimum(best_idx + 1, self.BRACKET_SAMPLES - 1)]
+
+        return best_max, best_min
+
+    @staticmethod
+    def __speeds(times, compute):
+        """
+        SpeedExtrema -- __speeds
+            Computes the speed at each time.
+
+        Params: times <numpy.ndarray> -- ET times
+                compute <function> -- see findMinMax
+
+        Returns: <numpy.ndarray> -- speeds in km/s
+        """
+
+        return np.linalg.norm(np.asarray(compute(times))[:, 3:6], axis=1)
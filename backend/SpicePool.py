@@ -0,0 +1,259 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import os
+import tempfile
+import threading
+import multiprocessing
+import numpy as np
+import spiceypy as spice
+
+
+# Directory for the shared-memory files results are written into -- /dev/shm is memory backed on Linux
+SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def initWorker(kernel_paths):
+    """
+    SpicePool.py -- initWorker
+        Runs once in each worker process when it starts. It furnishes every kernel loaded in the REST server, one by
+        one in the same order, so that the worker's kernel pool mirrors the server's. The metakernel isn't furnished
+        itself: it is rewritten when kernel files are added or removed, and may list a file the server has yet to load
+        or one that was already deleted.
+
+    Params: kernel_paths list[<str>]
+
+    Returns: None
+    """
+
+    spice.kclear()
+
+    for kern_path in kernel_paths:
+        try:
+            spice.furnsh(kern_path)
+        except spice.stypes.SpiceyError:
+            # the file was deleted since the server loaded it -- the server unloads it before its next request
+            print("SPICE worker skipped {}, which no longer exists.".format(kern_path))
+
+
+def evaluateJob(job):
+    """
+    SpicePool.py -- evaluateJob
+        Runs in a worker process. It computes positions (or states) for a single job and writes them straight into the
+        shared memory file, so nothing but the job description and an error message (if any) is pickled.
+
+    Params: job tuple -- (target <str>, observer <str>, frame <str>, shm_path <str>, offset <int>, n_times <int>,
+                width <int>). The shared memory file holds n_times ET times at float64 index offset, followed by room
+                for n_times * width values -- positions if width is 3, states (positions and velocities) if it is 6.
+
+    Returns: <str> error message, or None on success
+    """
+
+    target, observer, frame, shm_path, offset, n_times, width = job
+
+    # map only the part of the file belonging to this job
+    shared = np.memmap(shm_path, dtype=np.float64, mode='r+', offset=offset * 8, shape=(n_times * (1 + width),))
+
+    try:
+        # second variable returned is light times, which we may disregard for this purpose
+        if width == 6:
+            results, _ = spice.spkezr(target, shared[:n_times], frame, 'NONE', observer)
+        else:
+            results, _ = spice.spkpos(target, shared[:n_times], frame, 'NONE', observer)
+    except spice.stypes.SpiceyError as error:
+        # SPICE errors are sent back as text and raised again by the server
+        return str(error)
+
+    # write the results right after the times
+    shared[n_times:] = np.asarray(results, dtype=np.float64).ravel()
+
+    return None
+
+
+class SpicePool:
+    """
+    SpicePool class
+
+    Purpose: CSPICE isn't thread-safe, so the REST server can only evaluate one target at a time in-process. This class
+        manages a pool of worker processes, each with its own SPICE subsystem that has furnished the same kernels as
+        the server, and fans position jobs out across them. Job results are written by the workers into a shared
+        memory file and read back as NumPy arrays rather than being pickled. Workers are started lazily, and restarted
+        after the kernel set changes. A single global instance of this class is instantiated by the REST server.
+    """
+
+    def __init__(self, n_workers):
+        """
+        SpicePool -- init
+            Create the SpicePool object. No worker processes are started until the pool is first used.
+
+        Params: n_workers <int> -- the number of worker processes. The pool is disabled if this is less than 2.
+
+        Returns: None
+        """
+
+        self.n_workers = n_workers
+
+        # kernels each worker furnishes -- see initWorker
+        self.kernel_paths = list()
+
+        # the multiprocessing pool, created on first use
+        self.pool = None
+
+        # guards creation and teardown of the pool
+        self.lock = threading.Lock()
+
+    def isEnabled(self):
+        """
+        SpicePool -- isEnabled
+            Checks whether or not the pool has more than one worker. With a single worker there's nothing to gain over
+            evaluating in-process.
+
+        Params: None
+
+        Returns: <bool>
+        """
+
+        return self.n_workers > 1
+
+    def reload(self, kernel_paths):
+        """
+        SpicePool -- reload
+            Must be called whenever the REST server furnishes or unloads kernels. The current workers are shut down once
+            they finish the jobs already handed to them (e.g. by a background warm-up), and new workers are started
+            with the new kernel set the next time the pool is used.
+
+        Params: kernel_paths list[<str>] -- every kernel loaded by the server, in load order. See loadedKernels.
+
+        Returns: None
+        """
+
+        with self.lock:
+            self.kernel_paths = list(kernel_paths)
+
+            # terminating would leave a thread waiting on the old workers blocked forever
+            if self.pool is not None:
+                self.pool.close()
+                self.pool = None
+
+    def close(self):
+        """
+        SpicePool -- close
+            Shuts the worker processes down right away.
+
+        Params: None
+
+        Returns: None
+        """
+
+        with self.lock:
+            if self.pool is not None:
+                self.pool.terminate()
+                self.pool.join()
+                self.pool = None
+
+    def evaluatePositions(self, jobs):
+        """
+        SpicePool -- evaluatePositions
+            Computes positions for a list of jobs across the worker processes.
+
+        Params: jobs list[tuple[<str>, <str>, <str>, <numpy.ndarray>]] -- (target, observer, frame, ET times) for each
+                    set of positions to compute.
+
+        Returns: list[<numpy.ndarray>] -- an (n, 3) array of positions in km for each job. Raises SpiceyError if any
+            job fails.
+        """
+
+        return self.__evaluate(jobs, 3)
+
+    def evaluateStates(self, jobs):
+        """
+        SpicePool -- evaluateStates
+            Computes states (positions and velocities) for a list of jobs across the worker processes.
+
+        Params: jobs -- see evaluatePositions
+
+        Returns: list[<numpy.ndarray>] -- an (n, 6) array of positions in km and velocities in km/s for each job.
+            Raises SpiceyError if any job fails.
+        """
+
+        return self.__evaluate(jobs, 6)
+
+    def __evaluate(self, jobs, width):
+        """
+        SpicePool -- __evaluate
+            Computes positions (width 3) or states (width 6) for a list of jobs across the worker processes.
+
+        Params: jobs -- see evaluatePositions
+                width <int> -- 3 or 6
+
+        Returns: list[<numpy.ndarray>] -- an (n, width) array for each job. Raises SpiceyError if any job fails.
+        """
+
+        # float64 offset of each job's block in the shared memory file -- n times followed by n * width values
+        offsets = list()
+        total_size = 0
+        for job in jobs:
+            offsets.append(total_size)
+            total_size += len(job[3]) * (1 + width)
+
+        # the shared memory file is deleted as soon as it is closed
+        with tempfile.NamedTemporaryFile(dir=SHM_DIR, prefix='aether-', suffix='.f64') as SHM_FILE:
+            shared = np.memmap(SHM_FILE.name, dtype=np.float64, mode='w+', shape=(max(total_size, 1),))
+
+            # write the times of each job into its block
+            for job, offset in zip(jobs, offsets):
+                shared[offset:offset + len(job[3])] = job[3]
+
+            tasks = [(target, observer, frame, SHM_FILE.name, offset, len(times), width)
+                     for (target, observer, frame, times), offset in zip(jobs, offsets)]
+
+            errors = self.__getPool().map(evaluateJob, tasks, chunksize=1)
+
+            # raise the first error the same way an in-process spkpos call would
+            for error in errors:
+                if error is not None:
+                    raise spice.stypes.SpiceyError(error)
+
+            # copy the results out before the file goes away
+            results = [np.array(shared[offset + len(job[3]):offset + len(job[3]) * (1 + width)]).reshape(-1, width)
+                       for job, offset in zip(jobs, offsets)]
+
+            del shared
+
+        return results
+
+    @staticmethod
+    def loadedKernels():
+        """
+        SpicePool -- loadedKernels
+            Gets the kernels which are loaded in the REST server's SPICE subsystem, whether they were furnished directly
+            or through a metakernel, in load order. Metakernels themselves are left out.
+
+        Params: None
+
+        Returns: list[<str>]
+        """
+
+        kinds = 'SPK PCK CK TEXT EK DSK'
+
+        return [spice.kdata(i, kinds)[0] for i in range(spice.ktotal(kinds))]
+
+    def __getPool(self):
+        """
+        SpicePool -- __getPool
+            Gets the multiprocessing pool, starting it if necessary. Workers are spawned rather than forked so they
+            don't inherit the server's SPICE state or threads.
+
+        Params: None
+
+        Returns: <multiprocessing.pool.Pool>
+        """
+
+        with self.lock:
+            if self.pool is None:
+                context = multiprocessing.get_context('spawn')
+                self.pool = context.Pool(self.n_workers, initializer=initWorker,
+                                         initargs=(self.kernel_paths,))
+
+            return self.pool
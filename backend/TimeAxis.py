@@ -0,0 +1,174 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import numpy as np
+import spiceypy as spice
+
+
+class TimeAxis:
+    """
+    TimeAxis class
+
+    Purpose: This class builds the time grids used by the positions endpoint and converts them between ephemeris time
+        (ET) and Julian days (UTC) in bulk. Previously every sample of every target went through spice.et2utc, which
+        is a CSPICE round-trip plus a string parse per sample. Instead, the leap second kernel's DELTET/* variables are
+        read out of the kernel pool once and the same computation SPICE performs in deltet is done with NumPy over the
+        whole grid. A single global instance of this class is instantiated by the REST server.
+    """
+
+    def __init__(self):
+        """
+        TimeAxis -- init
+            Create the TimeAxis object. The leap second data is loaded lazily on first use, since the kernels are
+            furnished after the REST server creates its global objects.
+
+        Params: None
+
+        Returns: None
+        """
+
+        # constants from the leap second kernel -- None until reload() is called
+        self.delta_t_a = None
+        self.k = None
+        self.eb = None
+        self.m = None
+
+        # tai-utc values and the ET and UTC epochs at which each of them takes effect
+        self.delta_at = None
+        self.leap_epochs_et = None
+        self.leap_epochs_utc = None
+
+    def reload(self):
+        """
+        TimeAxis -- reload
+            Read the DELTET/* variables out of the kernel pool. This must be called again whenever the kernel pool is
+            cleared and reloaded, although the leap second kernel itself rarely changes.
+
+        Params: None
+
+        Returns: None
+        """
+
+        # scalar constants used to compute ET - UTC
+        self.delta_t_a = spice.gdpool('DELTET/DELTA_T_A', 0, 1)[0]
+        self.k = spice.gdpool('DELTET/K', 0, 1)[0]
+        self.eb = spice.gdpool('DELTET/EB', 0, 1)[0]
+        self.m = spice.gdpool('DELTET/M', 0, 2)
+
+        # DELTA_AT is stored as (tai-utc, utc epoch) pairs
+        n_values, _ = spice.dtpool('DELTET/DELTA_AT')
+        leap_table = spice.gdpool('DELTET/DELTA_AT', 0, n_values).reshape(-1, 2)
+
+        self.delta_at = leap_table[:, 0]
+        self.leap_epochs_utc = leap_table[:, 1]
+
+        # the same adjustment deltet makes to compare ET epochs against the UTC leap second epochs
+        self.leap_epochs_et = leap_table[:, 1] + leap_table[:, 0] + self.delta_t_a
+
+    def snapEt(self, et):
+        """
+        TimeAxis -- snapEt
+            Snap an ET to the millisecond. A double only holds a Julian day to about 40 microseconds, so ETs converted
+            from JDs which denote the same grid differ by that much, and only share cached tiles (see EphemerisCache.py)
+            once snapped. Grids must be built from the snapped ET, so that the times returned to clients are the ones
+            evaluated.
+
+        Params: et <float>
+
+        Returns: <float>
+        """
+
+        return round(float(et), 3)
+
+    def etGrid(self, et_start, et_delta, total_steps):
+        """
+        TimeAxis -- etGrid
+            Build a uniform grid of ET times. The values are identical to the list comprehension previously used by
+            the positions endpoint (et_start + et_delta * x).
+
+        Params: et_start <float> -- the first ET in the grid
+                et_delta <float> -- the number of seconds between each sample
+                total_steps <int> -- the number of steps in the grid. The grid has total_steps + 1 samples.
+
+        Returns: <numpy.ndarray> of ET times
+        """
+
+        return et_start + et_delta * np.arange(total_steps + 1, dtype=np.float64)
+
+    def etChunk(self, et_start, et_delta, first_step, n_samples):
+        """
+        TimeAxis -- etChunk
+            Build part of a uniform grid of ET times. The values are identical to the corresponding slice of the grid
+            built by etGrid, without building the whole grid.
+
+        Params: et_start <float> -- the first ET in the whole grid
+                et_delta <float> -- the number of seconds between each sample
+                first_step <int> -- the index of the first sample of the chunk within the whole grid
+                n_samples <int> -- the number of samples in the chunk
+
+        Returns: <numpy.ndarray> of ET times
+        """
+
+        return et_start + et_delta * np.arange(first_step, first_step + n_samples, dtype=np.float64)
+
+    def etToJd(self, et_times):
+        """
+        TimeAxis -- etToJd
+            Convert an array of ET times into UTC Julian days, leap seconds included, rounded to the 8 decimal places
+            the positions endpoint used to request from spice.et2utc(et, "J", 8). The result matches et2utc to the
+            precision of its output string, except within an inserted leap second itself, where the UTC Julian day is
+            ambiguous.
+
+        Params: et_times <numpy.ndarray> or list[<float>]
+
+        Returns: <numpy.ndarray> of Julian days (UTC)
+        """
+
+        # load the leap second data the first time this is called
+        if self.leap_epochs_et is None:
+            self.reload()
+
+        et_times = np.asarray(et_times, dtype=np.float64)
+
+        # find the tai-utc value in effect at each epoch -- epochs before the first leap second use one second less,
+        # which is what deltet does as well
+        leap_idx = np.searchsorted(self.leap_epochs_et, et_times, side='right') - 1
+        delta_at = np.where(leap_idx < 0, self.delta_at[0] - 1, self.delta_at[np.maximum(leap_idx, 0)])
+
+        # ET - UTC = DELTA_T_A + DELTA_AT + K * sin(E), E being the eccentric anomaly of the earth-moon barycenter
+        mean_anomaly = self.m[0] + self.m[1] * et_times
+        eccentric_anomaly = mean_anomaly + self.eb * np.sin(mean_anomaly)
+        et_minus_utc = self.delta_t_a + delta_at + self.k * np.sin(eccentric_anomaly)
+
+        # seconds past J2000 (UTC) to Julian days -- J2000 epoch is JD 2451545.0
+        return np.round(2451545.0 + (et_times - et_minus_utc) / 86400.0, 8)
+
+    def jdToEt(self, jd_times):
+        """
+        TimeAxis -- jdToEt
+            Convert an array of UTC Julian days into ET times, leap seconds included. This is the inverse of etToJd and
+            matches spice.str2et('jd ...') for each value.
+
+        Params: jd_times <numpy.ndarray> or list[<float>]
+
+        Returns: <numpy.ndarray> of ET times
+        """
+
+        # load the leap second data the first time this is called
+        if self.leap_epochs_utc is None:
+            self.reload()
+
+        # Julian days to seconds past J2000 (UTC)
+        utc_times = (np.asarray(jd_times, dtype=np.float64) - 2451545.0) * 86400.0
+
+        # find the tai-utc value in effect at each epoch, same as etToJd but against the UTC leap second epochs
+        leap_idx = np.searchsorted(self.leap_epochs_utc, utc_times, side='right') - 1
+        delta_at = np.where(leap_idx < 0, self.delta_at[0] - 1, self.delta_at[np.maximum(leap_idx, 0)])
+
+        # deltet evaluates the periodic term at the approximate ET (UTC + DELTA_T_A + DELTA_AT)
+        approx_et = utc_times + self.delta_t_a + delta_at
+        mean_anomaly = self.m[0] + self.m[1] * approx_et
+        eccentric_anomaly = mean_anomaly + self.eb * np.sin(mean_anomaly)
+
+        return approx_et + self.k * np.sin(eccentric_anomaly)
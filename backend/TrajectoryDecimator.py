@@ -0,0 +1,92 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import numpy as np
+
+
+class TrajectoryDecimator:
+    """
+    TrajectoryDecimator class
+
+    Purpose: This class simplifies trajectories for the positions endpoint's tolerance_km option. Positions are sampled
+        at the frontend's frame rate, but most of a trajectory is a smooth curve that can be drawn from a small fraction
+        of the samples. The Douglas-Peucker algorithm is used, with the distance of a sample measured from the
+        position linearly interpolated in time between the kept samples around it (rather than from the chord), so that
+        interpolating the simplified trajectory by time stays within the tolerance of every dropped sample. Every
+        interval still to be split is processed at once with NumPy, one level of the recursion per pass. A single global
+        instance of this class is instantiated by the REST server.
+    """
+
+    def decimate(self, times, positions, tolerance_km, keep_idx=()):
+        """
+        TrajectoryDecimator -- decimate
+            Picks the samples of a trajectory needed to stay within tolerance_km of every sample. The first and last
+            samples, and the samples in keep_idx, are always kept.
+
+        Params: times <numpy.ndarray> -- times of the samples, increasing
+                positions <numpy.ndarray> -- (n, 3) array of positions in km
+                tolerance_km <float> -- largest allowed distance (km) between a dropped sample and the position
+                    interpolated in time between the kept samples around it
+                keep_idx iterable[<int>] -- indices of samples which must be kept (e.g. the current time index)
+
+        Returns: <numpy.ndarray> -- increasing indices of the kept samples
+        """
+
+        n_samples = len(times)
+        if n_samples <= 2:
+            return np.arange(n_samples)
+
+        times = np.asarray(times, dtype=np.float64)
+        positions = np.asarray(positions, dtype=np.float64)
+
+        # samples kept so far -- the end points, and the samples the caller needs
+        keep = np.zeros(n_samples, dtype=bool)
+        keep[[0, -1]] = True
+        for idx in keep_idx:
+            if 0 <= idx < n_samples:
+                keep[idx] = True
+
+        # the intervals between kept samples are the ones to check
+        kept = np.flatnonzero(keep)
+        starts = kept[:-1]
+        ends = kept[1:]
+
+        while len(starts):
+
+            # intervals with nothing in between are done
+            n_inner = ends - starts - 1
+            has_inner = n_inner > 0
+            starts, ends, n_inner = starts[has_inner], ends[has_inner], n_inner[has_inner]
+            if not len(starts):
+                break
+
+            # flatten the inner samples of every interval -- interval_id maps each back to its interval
+            interval_id = np.repeat(np.arange(len(starts)), n_inner)
+            first_inner = np.cumsum(n_inner) - n_inner
+            sample_idx = starts[interval_id] + 1 + np.arange(len(interval_id)) - first_inner[interval_id]
+
+            # positions interpolated in time between the ends of each interval
+            start_idx = starts[interval_id]
+            end_idx = ends[interval_id]
+            fraction = (times[sample_idx] - times[start_idx]) / (times[end_idx] - times[start_idx])
+            interpolated = positions[start_idx] + fraction[:, np.newaxis] * (positions[end_idx] - positions[start_idx])
+
+            distances = np.linalg.norm(positions[sample_idx] - interpolated, axis=1)
+
+            # farthest sample of each interval -- the first sample of each interval matching its largest distance
+            max_distances = np.maximum.reduceat(distances, first_inner)
+            candidates = np.flatnonzero(distances == max_distances[interval_id])
+            _, first_candidate = np.unique(interval_id[candidates], return_index=True)
+            farthest = candidates[first_candidate]
+
+            # split the intervals whose farthest sample is out of tolerance at that sample
+            split = distances[farthest] > tolerance_km
+            split_idx = sample_idx[farthest[split]]
+
+            keep[split_idx] = True
+
+            starts = np.concatenate((starts[split], split_idx))
+            ends = np.concatenate((split_idx, ends[split]))
+
+        return np.flatnonzero(keep)
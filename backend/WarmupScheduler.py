@@ -0,0 +1,144 @@
+# CU Boulder CS Capstone - NASA/JPL Group (Aether)
+# Spring 2020
+# Maintainer: Aether
+
+import threading
+import time
+
+
+class WarmupScheduler:
+    """
+    WarmupScheduler class
+
+    Purpose: This class precomputes the available-bodies response for a list of commonly used observers (e.g. the
+        solar system barycenter, the sun and the earth) in a background thread, so that the first simulation created
+        after startup or after a kernel change doesn't wait on the speed computations. Every call to schedule starts a
+        new generation: the observers are computed again, one at a time, and until a new result is ready the previous
+        one keeps being served (stale-while-revalidate). A generation which is superseded while computing is abandoned.
+        A single global instance of this class is instantiated by the REST server.
+    """
+
+    def __init__(self, observers, build):
+        """
+        WarmupScheduler -- init
+            Create the WarmupScheduler object. The background thread is started by the first call to schedule.
+
+        Params: observers list[<str>] -- the observers to warm up, lower case. Warm-up is disabled if empty.
+                build <function> -- computes the result for an observer, called as build(observer) from the background
+                    thread. It must not use the in-process SPICE subsystem, which isn't thread-safe.
+
+        Returns: None
+        """
+
+        self.observers = list(observers)
+        self.build = build
+
+        # latest result of each observer -- key: observer, value: tuple(generation <int>, result)
+        self.results = dict()
+
+        # the generation being (or last) computed
+        self.generation = 0
+
+        # set by schedule to wake the background thread up
+        self.wake = threading.Event()
+        self.thread = None
+
+        # guards results, generation and thread
+        self.lock = threading.Lock()
+
+    def schedule(self):
+        """
+        WarmupScheduler -- schedule
+            Starts a new generation. Must be called once kernels are loaded, and whenever kernels are furnished or
+            unloaded afterwards.
+
+        Params: None
+
+        Returns: None
+        """
+
+        if not self.observers:
+            return
+
+        with self.lock:
+            self.generation += 1
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.__run, name='aether-warmup', daemon=True)
+                self.thread.start()
+
+        self.wake.set()
+
+    def get(self, observer):
+        """
+        WarmupScheduler -- get
+            Gets the latest result for an observer, even if it was computed by an older generation.
+
+        Params: observer <str> -- lower case
+
+        Returns: tuple(result, stale <bool>) -- or (None, None) if there is no result for the observer yet
+        """
+
+        with self.lock:
+            entry = self.results.get(observer)
+            generation = self.generation
+
+        if entry is None:
+            return None, None
+
+        return entry[1], entry[0] != generation
+
+    def getStats(self):
+        """
+        WarmupScheduler -- getStats
+            Gets the state of each observer's result.
+
+        Params: None
+
+        Returns: <dict> -- key: observer, value: 'fresh', 'stale' or 'missing'
+        """
+
+        with self.lock:
+            return dict((observer, 'missing' if observer not in self.results else
+                         'fresh' if self.results[observer][0] == self.generation else 'stale')
+                        for observer in self.observers)
+
+    def __run(self):
+        """
+        WarmupScheduler -- __run
+            The background thread. Waits for a new generation and computes every observer's result for it.
+
+        Params: None
+
+        Returns: None
+        """
+
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+
+            with self.lock:
+                generation = self.generation
+
+            for observer in self.observers:
+                # a newer generation was scheduled -- start over with it
+                if self.wake.is_set():
+                    break
+
+                start_time = time.time()
+
+                try:
+                    result = self.build(observer)
+                except Exception as error:
+                    # leave the observer to be computed on request
+                    print("Warm-up of {} failed: {}".format(observer, error))
+                    continue
+
+                with self.lock:
+                    # results computed from kernels which changed in the meantime are dropped
+                    if generation != self.generation:
+                        break
+
+                    self.results[observer] = (generation, result)
+
+                print("Warmed up available-bodies for {} in {:.2f} s.".format(observer, time.time() - start_time))
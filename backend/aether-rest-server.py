@@ -2,27 +2,226 @@
 # Spring 2020
 # Maintainer: Aether
 
-from flask import Flask, Response, request
+from flask import Flask, Response, request, g, has_request_context, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from datetime import datetime, timedelta
 from signal import signal, SIGINT
+import os
+import time
+import tempfile
 #import re
 import jsonpickle
 import numpy as np
 import spiceypy as spice
 from AetherBodies import AetherBodies
 from MetakernelWriter import MetakernelWriter
+from TimeAxis import TimeAxis
+from PositionPacker import PositionPacker
+from EphemerisCache import EphemerisCache, fingerprintFiles
+from SpicePool import SpicePool
+from NativeSPK import NativeSPK
+from TrajectoryDecimator import TrajectoryDecimator
+from ResponseCompressor import ResponseCompressor
+from FrameTransformer import FrameTransformer
+from SpeedCache import SpeedCache
+from SpeedExtrema import SpeedExtrema
+from BodyConstants import BodyConstants
+from WarmupScheduler import WarmupScheduler
+from KernelWatcher import KernelWatcher
+from SessionRegistry import SessionRegistry
 
 
 # Initialize the Flask application
 app = Flask(__name__)
 
-# Enable Cross Origin Resource Sharing (CORS) for the rest server
-CORS(app)
+# Enable Cross Origin Resource Sharing (CORS) for the rest server -- the headers of available-bodies are exposed
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Aether-Stale'])
 
-# Global variable to hold information about the bodies/objects a user can get data for
-aether_bodies = AetherBodies()
+# Global variable to hold information about the bodies/objects a user can get data for -- the kernels are scanned by up
+# to AETHER_SCAN_WORKERS worker processes at startup, unless their coverage is in the kernel catalog (an empty
+# AETHER_CATALOG_PATH disables the catalog)
+aether_bodies = AetherBodies(int(os.environ.get('AETHER_SCAN_WORKERS', os.cpu_count() or 1)),
+                             os.environ.get('AETHER_CATALOG_PATH', './SPICE/kernel_catalog.sqlite'))
+
+# Global variable used to build ET grids and convert them into Julian days in bulk
+time_axis = TimeAxis()
+
+# Global variable used to pack position data into the binary payload format
+position_packer = PositionPacker()
+
+# Global variable used to simplify trajectories for the positions endpoint's tolerance_km option
+trajectory_decimator = TrajectoryDecimator()
+
+# Global variable to hold the radii, masses and rotation data of every body in the kernel pool
+body_constants = BodyConstants()
+
+# Global variable used to precompute available-bodies for common observers in the background -- the observers are
+# configured through the environment as a comma separated list, empty to disable
+warmup_scheduler = WarmupScheduler([observer.strip().lower() for observer in os.environ.get(
+    'AETHER_WARMUP_OBSERVERS', 'solar system barycenter,sun,earth').split(',') if observer.strip()],
+    lambda observer: warm_available_bodies(observer))  # looked up when called, it's defined below
+
+# Global variable used to find the min and max speeds of bodies for the available-bodies endpoint
+speed_extrema = SpeedExtrema()
+
+# Global variable used to compress responses
+response_compressor = ResponseCompressor()
+
+# Global variable used to rotate J2000 results into other reference frames -- the byte budget of cached rotation
+# matrices is configured through the environment
+frame_transformer = FrameTransformer(int(os.environ.get('AETHER_FRAME_CACHE_BYTES', 64 * 1024 * 1024)))
+
+# Global variable to hold computed ephemeris tiles -- the in-memory byte budget and the optional on-disk directory are
+# configured through the environment
+ephemeris_cache = EphemerisCache(int(os.environ.get('AETHER_CACHE_MAX_BYTES', 256 * 1024 * 1024)),
+                                 os.environ.get('AETHER_CACHE_DIR'))
+
+# Global variable to hold the min and max speeds of each body w.r.t. each observer -- persisted to a JSON file, which is
+# configured through the environment
+speed_cache = SpeedCache(os.environ.get('AETHER_SPEED_CACHE_PATH', './SPICE/speed_cache.json'))
+
+# Global variable to hold the pool of SPICE worker processes used to evaluate several targets in parallel -- one worker
+# per core unless configured through the environment
+spice_pool = SpicePool(int(os.environ.get('AETHER_SPICE_WORKERS', os.cpu_count() or 1)))
+
+# Global variable to hold the native SPK engine used in front of spkpos -- enabled unless AETHER_NATIVE_SPK is 0
+native_spk = NativeSPK(os.environ.get('AETHER_NATIVE_SPK', '1') != '0')
+
+# Global variable used to watch the kernel directories for kernels added or removed while the server is running -- the
+# directories are polled every AETHER_KERNEL_POLL_SECONDS when inotify isn't available. Started unless
+# AETHER_KERNEL_WATCH is 0.
+kernel_watcher = KernelWatcher(['./SPICE/kernels/default/', './SPICE/kernels/user_uploaded/'],
+                               MetakernelWriter.KERNEL_EXTENSIONS,
+                               float(os.environ.get('AETHER_KERNEL_POLL_SECONDS', 2.0)))
+
+# Global variable to hold the kernels uploaded within each client session (see KernelSession.py) -- sessions are evicted
+# after AETHER_SESSION_IDLE_SECONDS without a request, or least recently used first once there are AETHER_MAX_SESSIONS.
+# Each has AETHER_SESSION_SPICE_WORKERS worker processes and an ephemeris cache of AETHER_SESSION_CACHE_BYTES
+session_registry = SessionRegistry('./SPICE/kernels/sessions/', aether_bodies, native_spk,
+                                   float(os.environ.get('AETHER_SESSION_IDLE_SECONDS', 3600)),
+                                   int(os.environ.get('AETHER_MAX_SESSIONS', 16)),
+                                   int(os.environ.get('AETHER_SESSION_SPICE_WORKERS', 1)),
+                                   int(os.environ.get('AETHER_SESSION_CACHE_BYTES', 32 * 1024 * 1024)))
+
+# Largest difference (km) from spkpos the native SPK engine may have in its startup check before it's disabled
+NATIVE_SPK_TOLERANCE_KM = 1e-3
+
+
+# Fields of the dictionaries returned by the available-bodies endpoint, in order
+BODY_FIELDS = ('spice id', 'body name', 'category', 'valid times', 'is uploaded', 'has rotation data',
+               'has radius data', 'has mass data', 'min speed', 'max speed', 'radius', 'mass', 'rotation data')
+
+# Upper bound on the total number of samples (summed over every query) a single batch request may ask for
+batch_max_samples = int(os.environ.get('AETHER_BATCH_MAX_SAMPLES', 2000000))
+
+
+@app.before_request
+def apply_kernel_changes():
+    """
+    aether-rest-server.py -- apply_kernel_changes
+        This function is called by Flask before every request. It applies the kernel files added to, changed in or
+        removed from the kernel directories since the last request (see KernelWatcher.py): removed and changed files
+        are unloaded and their bodies removed, new and changed files are furnished and their bodies added, and the
+        metakernel is written again. Changes are applied here rather than by the watcher's thread since the SPICE
+        subsystem isn't thread-safe.
+
+    Params: None
+
+    Returns: None -- the request is then handled as usual
+    """
+
+    added, removed = kernel_watcher.takeChanges()
+    if not added and not removed:
+        return None
+
+    start_time = time.time()
+
+    # NAIF IDs of the bodies covered by the kernels which changed, and of the bodies chained through them -- their cached
+    # speeds are out of date
+    changed_ids = set()
+
+    # changed files are reported as added, their old version is unloaded first
+    unload_kernels(removed + added)
+
+    spk_paths = [kern_path for kern_path in removed + added if kern_path.endswith('.bsp')]
+    for kern_path in spk_paths:
+        changed_ids.update(aether_bodies.getDependentBodyIDs(aether_bodies.getKernelBodyIDs(kern_path)))
+
+    aether_bodies.removeKernels(spk_paths)
+
+    furnished = list()
+    for kern_path in added:
+        try:
+            spice.furnsh(kern_path)
+            furnished.append(kern_path)
+        except spice.stypes.SpiceyError as error:
+            # e.g. the file was removed again, or isn't a valid kernel
+            print("Could not furnish {}: {}".format(kern_path, error))
+
+    # update everything that depends on the loaded kernels
+    refresh_kernel_state(spk_only=all(kern_path.endswith('.bsp') for kern_path in removed + added))
+
+    for kern_path in [kern for kern in furnished if kern.endswith('.bsp')]:
+        aether_bodies.addFromKernel(kern_path)
+        changed_ids.update(aether_bodies.getDependentBodyIDs(aether_bodies.getKernelBodyIDs(kern_path)))
+
+    # keep the metakernel in line with the directories
+    mkw.write()
+
+    speed_cache.invalidate(changed_ids)
+    speed_cache.save()
+
+    # recompute the warmed up observers with the new kernels
+    warmup_scheduler.schedule()
+
+    print("Applied kernel changes in {:.2f} s -- added: {}, removed: {}.".format(
+        time.time() - start_time, ', '.join(furnished) or 'none', ', '.join(removed) or 'none'))
+
+    return None
+
+
+@app.before_request
+def resolve_kernel_session():
+    """
+    aether-rest-server.py -- resolve_kernel_session
+        This function is called by Flask before every request, after apply_kernel_changes. It looks up the client's
+        kernel session (see SessionRegistry.py), named by the X-Aether-Session header or the session query parameter,
+        after evicting idle sessions. Requests without a session see the kernels of the REST server itself.
+
+    Params: None
+
+    Returns: None -- or a Flask response object with an error if the session ID isn't valid
+    """
+
+    session_registry.evictIdle()
+
+    g.session_id = request.headers.get('X-Aether-Session') or request.args.get('session')
+    g.kernel_session = None
+
+    if g.session_id is None:
+        return None
+
+    if not SessionRegistry.isValidID(g.session_id):
+        return returnResponse({'error': 'session must be 8 to 64 letters, digits, dashes or underscores.'}, 400)
+
+    g.kernel_session = session_registry.get(g.session_id)
+
+    return None
+
+
+@app.after_request
+def compress_response(response):
+    """
+    aether-rest-server.py -- compress_response
+        This function is called by Flask after every request. It compresses the response according to the request's
+        Accept-Encoding header (see ResponseCompressor.py). Streamed responses are sent as they are.
+
+    Params: response <flask.Response> -- the response returned by the endpoint
+
+    Returns: <flask.Response>
+    """
+
+    return response_compressor.compressResponse(response, request.accept_encodings)
 
 
 def exitNicely(sig, frame):
@@ -37,223 +236,678 @@ def exitNicely(sig, frame):
     """
 
     spice.kclear()
+    spice_pool.close()
     print("\nCleared loaded kernels.\nExiting...")
     exit(0)
 
 
-def get_min_max_speed(bod_id, time_range_list, wrt):
+def refresh_kernel_state(spk_only=False):
+    """
+    aether-rest-server.py -- refresh_kernel_state
+        This function is called whenever kernels are furnished or unloaded. It updates everything that depends on the
+        set of loaded kernels.
+
+    Params: spk_only <bool> OPTIONAL -- only binary SPK kernels were furnished or unloaded, so the data read from
+        text and PCK kernels (leap seconds, frames, physical constants) is still current
+
+    Returns: None
+    """
+
+    # cached ephemeris is keyed by the loaded kernel set
+    ephemeris_cache.setFingerprint(EphemerisCache.fingerprintLoadedKernels())
+
+    # worker processes must be restarted with the new kernel set
+    spice_pool.reload(SpicePool.loadedKernels())
+
+    # the native SPK engine maps the new set of SPK files -- names are resolved through aether_bodies, which is kept up
+    # to date as kernels are added or removed
+    native_spk.reload(name_index=aether_bodies)
+
+    # sessions layer their kernels over the new set the next time they're used
+    session_registry.invalidate()
+
+    if spk_only:
+        return
+
+    # the kernel pool may have been cleared, so the leap second data must be read again
+    time_axis.reload()
+
+    # frame definitions and orientation data come from kernels too
+    frame_transformer.reload()
+
+    # physical constants come from text kernels, and whether or not each body has them is derived from the table
+    body_constants.reload()
+    aether_bodies.setBodyConstants(body_constants)
+
+
+def unload_kernels(kern_paths):
+    """
+    aether-rest-server.py -- unload_kernels
+        This function unloads kernels from the SPICE subsystem, whether they were furnished directly or through the
+        metakernel. Every other kernel stays loaded. SPICE identifies loaded kernels by the path they were furnished
+        with, so the paths are compared once normalized.
+
+    Params: kern_paths list[<str>]
+
+    Returns: None -- kernels which aren't loaded are skipped
+    """
+
+    kern_paths = set(os.path.normpath(kern_path) for kern_path in kern_paths)
+
+    furnished_paths = set(spice.kdata(i, 'ALL')[0] for i in range(spice.ktotal('ALL')))
+
+    for furnished_path in furnished_paths:
+        if os.path.normpath(furnished_path) in kern_paths:
+            spice.unload(furnished_path)
+
+
+def current_session():
+    """
+    aether-rest-server.py -- current_session
+        Gets the kernel session of the request being handled, if kernels were uploaded in it. Outside of a request
+        (e.g. in the warm-up thread) there is no session.
+
+    Params: None
+
+    Returns: <KernelSession> -- or None if the REST server's kernels should be used
+    """
+
+    if not has_request_context():
+        return None
+
+    session = g.get('kernel_session')
+
+    return session if session is not None and session.hasKernels() else None
+
+
+def current_bodies():
+    """
+    aether-rest-server.py -- current_bodies
+        Gets the bodies the request being handled may use: the session's if kernels were uploaded in it, the REST
+        server's otherwise.
+
+    Params: None
+
+    Returns: <AetherBodies>
+    """
+
+    session = current_session()
+
+    return aether_bodies if session is None else session.bodies
+
+
+def current_ephemeris_cache():
+    """
+    aether-rest-server.py -- current_ephemeris_cache
+        Gets the ephemeris cache of the request being handled, see current_bodies.
+
+    Params: None
+
+    Returns: <EphemerisCache>
+    """
+
+    session = current_session()
+
+    return ephemeris_cache if session is None else session.ephemeris_cache
+
+
+def evaluate_ephemeris(jobs, states):
+    """
+    aether-rest-server.py -- evaluate_ephemeris
+        Computes positions or states for a list of jobs. Jobs the native SPK engine can evaluate are done in-process
+        with NumPy, the rest go through spkpos or spkezr, across the SPICE worker processes when there are several.
+
+    Params: jobs list[tuple[<str>, <str>, <str>, <numpy.ndarray>]] -- (target, observer, frame, ET times) for each
+                set of positions or states to compute.
+            states <bool> -- True for states (positions and velocities), False for positions only
+
+    Returns: list[<numpy.ndarray>] -- an (n, 6) or (n, 3) array for each job, positions in km and velocities in km/s
+    """
+
+    # a session's kernels are only loaded in its own worker processes
+    session = current_session()
+    if session is not None:
+        return session.evaluateStates(jobs) if states else session.evaluatePositions(jobs)
+
+    # try the native SPK engine first -- it returns None for anything it can't evaluate exactly
+    if states:
+        results = [native_spk.evaluateStates(*job) for job in jobs]
+    else:
+        results = [native_spk.evaluatePositions(*job) for job in jobs]
+
+    # jobs left for SPICE
+    spice_idx = [i for i, result in enumerate(results) if result is None]
+    spice_jobs = [jobs[i] for i in spice_idx]
+
+    # fan several jobs out across the SPICE worker processes
+    if spice_pool.isEnabled() and len(spice_jobs) > 1:
+        spice_results = spice_pool.evaluateStates(spice_jobs) if states else spice_pool.evaluatePositions(spice_jobs)
+    elif states:
+        # second variable returned is light times, which we may disregard for this purpose
+        spice_results = [np.asarray(spice.spkezr(target, times, frame, 'NONE', observer)[0]).reshape(-1, 6)
+                         for target, observer, frame, times in spice_jobs]
+    else:
+        spice_results = [spice.spkpos(target, times, frame, 'NONE', observer)[0]
+                         for target, observer, frame, times in spice_jobs]
+
+    for i, result in zip(spice_idx, spice_results):
+        results[i] = result
+
+    return results
+
+
+def evaluate_positions(jobs):
+    """
+    aether-rest-server.py -- evaluate_positions
+        Computes positions for a list of jobs. This is the function the ephemeris cache calls to compute missing
+        position tiles. See evaluate_ephemeris.
+
+    Params: jobs list[tuple[<str>, <str>, <str>, <numpy.ndarray>]] -- (target, observer, frame, ET times) for each
+                set of positions to compute.
+
+    Returns: list[<numpy.ndarray>] -- an (n, 3) array of positions in km for each job
+    """
+
+    return evaluate_ephemeris(jobs, False)
+
+
+def evaluate_states(jobs):
+    """
+    aether-rest-server.py -- evaluate_states
+        Computes states for a list of jobs. This is the function the ephemeris cache calls to compute missing state
+        tiles. See evaluate_ephemeris.
+
+    Params: jobs -- see evaluate_positions
+
+    Returns: list[<numpy.ndarray>] -- an (n, 6) array of positions in km and velocities in km/s for each job
+    """
+
+    return evaluate_ephemeris(jobs, True)
+
+
+def evaluate_states_in_background(jobs):
+    """
+    aether-rest-server.py -- evaluate_states_in_background
+        Computes states for a list of jobs without using the in-process SPICE subsystem, which isn't thread-safe, so
+        that it can be called from a background thread. Names are resolved through AetherBodies, jobs the native SPK
+        engine can't evaluate go to the SPICE worker processes (even when the pool is disabled for requests).
+
+    Params: jobs -- see evaluate_positions
+
+    Returns: list[<numpy.ndarray>] -- an (n, 6) array of positions in km and velocities in km/s for each job
+    """
+
+    id_jobs = list()
+    for target, observer, frame, times in jobs:
+        target_id = aether_bodies.getRefFrameID(target)
+        observer_id = aether_bodies.getRefFrameID(observer)
+
+        if target_id is None or observer_id is None:
+            raise ValueError('{} or {} is not a known body.'.format(target, observer))
+
+        id_jobs.append((str(target_id), str(observer_id), frame, times))
+
+    results = [native_spk.evaluateStates(*job) for job in id_jobs]
+
+    spice_idx = [i for i, result in enumerate(results) if result is None]
+    if spice_idx:
+        for i, result in zip(spice_idx, spice_pool.evaluateStates([id_jobs[i] for i in spice_idx])):
+            results[i] = result
+
+    return results
+
+
+def warm_available_bodies(ref_frame):
+    """
+    aether-rest-server.py -- warm_available_bodies
+        Computes the full available-bodies response for an observer. This is the function the warm-up scheduler calls
+        from its background thread, so it only uses evaluate_states_in_background. The response is serialized and
+        compressed here as well, so that requests served from the warm-up don't pay for it.
+
+    Params: ref_frame <str> -- lower case name or NAIF ID of the observer
+
+    Returns: <CompressedBody> -- the JSON encoded list[<dict>], see get_available_bodies and ResponseCompressor.py
+    """
+
+    known_bodies = aether_bodies.getBodies()
+
+    for bod_dict in known_bodies:
+        add_body_details(bod_dict, ref_frame, BODY_FIELDS, evaluate_states_in_background)
+
+    speed_cache.save()
+
+    return response_compressor.precompress(jsonpickle.encode(known_bodies).encode('utf-8'))
+
+
+def check_native_spk():
+    """
+    aether-rest-server.py -- check_native_spk
+        Compares the native SPK engine against spkpos for every loaded segment it supports (see
+        NativeSPK.compareWithSpice).
+
+    Params: None
+
+    Returns: <dict> -- whether the engine is enabled, the largest difference found in km, and the result for each
+        segment
+    """
+
+    segment_results = native_spk.compareWithSpice()
+
+    errors = [result['max error km'] for result in segment_results if result['max error km'] is not None]
+
+    return {
+        'enabled': native_spk.isEnabled(),
+        'max error km': max(errors) if errors else None,
+        'segments': segment_results
+    }
+
+
+def get_min_max_speed(bod_id, et_ranges, wrt, evaluate=None):
     """
     aether-rest-server.py -- get_min_max_speed
         The purpose of this function is to calculate the approx min and max speeds of a specific object w.r.t another.
         It is used by the available-bodies endpoint and, in turn, determines the range of speeds used for trajectory
-        gradients on the frontend. The comments below detail the procedure of the algorithm...
+        gradients on the frontend. The states of the body are computed in batches, see SpeedExtrema.py.
 
     Params: bod_id <str> -- the NAIF ID of the body for which min and max speeds shall be obtained. Optionally, a valid
                 body name may be passed instead.
-            time_range_list list[tuple[<str>, <str>]] -- a list of tuples holding the starting and ending times for
-                    which the body (specified by bod_id) has valid ephemeris. Typically this list is only of length 1,
-                    but it may be more if the target is valid over multiple non-overlapping time ranges.
+            et_ranges list[tuple[<float>, <float>]] -- a list of tuples holding the starting and ending ET for which
+                    the body (specified by bod_id) has valid ephemeris, see AetherBodies.getEtTimes. Typically this
+                    list is only of length 1, but it may be more if the target is valid over multiple non-overlapping
+                    time ranges.
             wrt <str> -- The observing body for which target speeds are calculated against. This may be either a NAIF ID
                     or body name. (e.g. "0" or "solar system barycenter")
+            evaluate <function> OPTIONAL -- computes states for a list of jobs, evaluate_states unless specified
 
     Returns: tuple[<float>, <float>]  -- the approx min (0 index in tuple) and max (1 index in tuple) speed of the body.
     """
 
-    # PROCEDURE #
-    #
-    #   For each time range
-    #       Do a uniform sample within the time range
-    #       For each time in the sample, create another time 1 minute after
-    #       Get positions for each time tuple from the sample and figure out the speed based on 1 minute offset
-    #       Get the min and max speeds across all time ranges for the body
+    if evaluate is None:
+        evaluate = evaluate_states
 
-    # empty list to hold speeds of the body
-    speed_list = list()
+    # states of the target w.r.t. the observer -- speeds don't depend on the (inertial) frame
+    def compute_states(times):
+        return evaluate([(bod_id, wrt, 'J2000', times)])[0]
 
-    # iterate over time ranges
-    for time_tupe in time_range_list:
+    # sample each time range and refine the extrema found (see SpeedExtrema.py)
+    return speed_extrema.findMinMax(et_ranges, compute_states)
 
-        # this try-except only goes into the except clause when the date is in 1 A.D. or before
-        try:
-            # convert the starting date into a datetime object
-            t_start = datetime.strptime(time_tupe[0], "%Y-%m-%d %H:%M:%S.%f")
-        except ValueError:
-            # handle B.C. dates... This could be a lot more elegant
-            t_start = datetime(year=1, month=1, day=1)
 
-        # convert the ending date into a datetime object
-        t_end = datetime.strptime(time_tupe[1], "%Y-%m-%d %H:%M:%S.%f")
+def get_cached_min_max_speed(bod_id, et_ranges, wrt, evaluate=None):
+    """
+    aether-rest-server.py -- get_cached_min_max_speed
+        Gets the approx min and max speeds of a body w.r.t. an observer from the speed cache, or computes them with
+        get_min_max_speed and stores them. Entries are keyed by the kernels the states of the body and the observer are
+        computed from (see AetherBodies.getChainKernelPaths), so they are reused until one of those kernels changes.
+        Call speed_cache.save() once all bodies are done.
+
+    Params: see get_min_max_speed
 
-        # start - end results in a timedelta object
-        # get total seconds of the interval and do integer division by 60 to get lower bound on total minutes
-        t_delta_minutes = int((t_end - t_start).total_seconds() // 60)
+    Returns: tuple[<float>, <float>] -- the approx min and max speed of the body
+    """
 
-        # uniformly sample 10 offsets from the range
-        sampled_offsets = list(range(0, t_delta_minutes - 1, (t_delta_minutes - 1) // 9))
+    bodies = current_bodies()
+    fingerprint = fingerprintFiles(bodies.getChainKernelPaths(bod_id) + bodies.getChainKernelPaths(wrt))
 
-        # iterate over each of the sampled offsets
-        for offset in sampled_offsets:
+    min_max_speeds = speed_cache.get(bod_id, wrt, fingerprint)
 
-            # generate ET from the starting datetime and offset
-            etStart = spice.datetime2et(t_start + timedelta(minutes=offset))
+    if min_max_speeds is None:
+        min_max_speeds = get_min_max_speed(bod_id, et_ranges, wrt, evaluate)
+        speed_cache.put(bod_id, wrt, fingerprint, min_max_speeds)
 
-            # generate an end time that is 1 minute after the start
-            etEnd = spice.datetime2et(t_start + timedelta(minutes=offset + 1))
+    return min_max_speeds
 
-            # get positions of target w.r.t. observer at both times.
-            # this could be refactored to use spkez, although both bod_id and wrt would need to be ints always.
-            target_positions, _ = spice.spkpos(bod_id, [etStart, etEnd], 'J2000', 'NONE', wrt)
 
-            # get distance between starting and ending positions
-            # logic from: https://stackoverflow.com/questions/20184992/
-            squared_dist = np.sum((target_positions[1] - target_positions[0]) ** 2, axis=0)
+def returnResponse(response, status):
+    """
+    aether-rest-server.py -- returnResponse
+        Simple function to encode and package data into a response that is sent to the frontend by the calling function.
 
-            # dist is in km -- distance traveled by obj in one minute
-            dist = np.sqrt(squared_dist)
+    Params: response <list> or <dict> -- really anything that can be serialized into JSON format.
+            status <int> -- the status code of the response (typically either 200, or 40X).
 
-            # dist is km traveled in one minute. Divide by 60 to get km/sec
-            speed = dist / 60
+    Returns: a Flask response object with the payload being the JSON-encoded data.
+    """
+    response_pickled = jsonpickle.encode(response)
 
-            # append speed to the list
-            speed_list.append(speed)
+    return Response(response=response_pickled, status=status, mimetype="application/json")
 
-    # return the min and max speed from the speeds list
-    return float(np.min(speed_list)), float(np.max(speed_list))
 
+def returnBinaryResponse(payload, status):
+    """
+    aether-rest-server.py -- returnBinaryResponse
+        Simple function to package an already encoded binary payload into a response that is sent to the frontend by
+        the calling function.
 
-def get_radius(bod_id):
+    Params: payload <bytes> -- the encoded payload (see PositionPacker.py for the position payload format).
+            status <int> -- the status code of the response.
+
+    Returns: a Flask response object with the payload as an application/octet-stream body.
     """
-    aether-rest-server.py -- get_radius
-        This function simply gets the radii of the body specified by bod_id.
 
-    Params: bod_id <str> -- the NAIF ID of the body for which min and max speeds shall be obtained. Optionally, a valid
-                body name may be passed instead.
+    return Response(response=payload, status=status, mimetype="application/octet-stream")
 
-    Returns: list[<float>, <float>, <float>]  -- TODO
+
+def get_payload_format():
     """
+    aether-rest-server.py -- get_payload_format
+        Determines which payload format the client of the current request asked for. A format query param
+        (?format=json or ?format=bin) takes precedence, otherwise the binary format is used only when the Accept header
+        prefers application/octet-stream over application/json.
 
-    try:
-        # get radii from SPICE
-        return spice.bodvrd(bod_id, "RADII", 3)[1].tolist()
-    # This should never be hit, since this function is only called on bodies which have radius data, but just in case...
-    except:
-        return "NO RADIUS DATA AVAILABLE"
+    Params: None. The current Flask request is used.
+
+    Returns: <str> -- either 'json' or 'bin', or None if the format query param is not recognized.
+    """
 
+    # explicit format query param
+    requested_format = request.args.get('format')
+    if requested_format is not None:
+        requested_format = requested_format.lower()
+        if requested_format in ('bin', 'binary'):
+            return 'bin'
+        elif requested_format == 'json':
+            return 'json'
+        else:
+            return None
 
-def get_mass(bod_id):
+    # content negotiation -- best_match returns the first option when the client accepts anything
+    best_match = request.accept_mimetypes.best_match(['application/json', 'application/octet-stream'])
+
+    return 'bin' if best_match == 'application/octet-stream' else 'json'
+
+
+def get_target_info(target, ref_frame, frame):
     """
-    aether-rest-server.py -- get_mass
-        This function simply gets the mass in kg of the body specified by bod_id.
+    aether-rest-server.py -- get_target_info
+        Builds the info string describing a target's data in a positions response.
 
-    Params: bod_id <str> -- the NAIF ID of the body for which min and max speeds shall be obtained. Optionally, a valid
-                body name may be passed instead.
+    Params: target <str>, ref_frame <str> -- target and observer
+            frame <str> -- the reference frame of the positions. Only mentioned if it isn't J2000.
 
-    Returns: <float> the mass of the body in kg
+    Returns: <str>
     """
 
-    # the gravitational constant
-    G = 6.67430e-11
+    target_info = 'Positions (x,y,z) and times (JD) of {} w.r.t. {}'.format(target.capitalize(), ref_frame.capitalize())
 
-    try:
-        # return mass from SPICE -- G is divided so the result is in kg
-        return float(spice.bodvrd(bod_id, "GM", 1)[1][0] / (G/1000000000))
-    # This should never be hit, since this function is only called on bodies which have mass data, but just in case...
-    except:
-        return "NO MASS DATA AVAILABLE"
+    if frame != 'J2000':
+        target_info += ' in {}'.format(frame)
 
+    return target_info
 
-def get_rotation_data(bod_id, bod_name):
+
+def add_speed_data(target_dict, velocities, speeds, kept_idx=None):
     """
-    aether-rest-server.py -- get_rotation_data
-        This function gets any and all rotation info for a body. There are four different possibilities:
-            1: The object has no rotation data. In this case a string will be returned. However, this function is only
-               called on objects that have some rotation data, so this is an edge case that should never occur.
-            2: The object only has POLE_RA, POLE_DEC and PM (and deltas of each). A dictionary containing this data is
-               returned.
-            3: In addition to the data mentioned in #2, the object also has nutation/precession info, specifically
-               NUT_PREC_RA and NUT_PREC_DEC. A dictionary containing all this data is returned.
-            4. In addition to the data mentioned in #3, the object also has nutation/precession angles. As you might
-               imagine, a dictionary containing an extra key with this data is returned in this case.
+    aether-rest-server.py -- add_speed_data
+        Adds the velocities and speeds of a target to its dictionary in a positions response (state mode).
 
-    Params: bod_id <str> -- the NAIF ID of the body for which min and max speeds shall be obtained.
-            bod_name <str> -- the body name corresponding to the NAIF ID passed for bod_id. This could be refactored to
-                use the bodc2s function instead if so desired.
+    Params: target_dict <dict> -- the target's dictionary in the response
+            velocities <numpy.ndarray> -- (n, 3) array of velocities in km/s
+            speeds <numpy.ndarray> -- the speed (km/s) at each sample
+            kept_idx <numpy.ndarray> OPTIONAL -- indices of the samples returned, if the trajectory was simplified. The
+                min and max speeds are always over every sample.
 
-    Returns: <dict> -- a dictionary containing all the available rotation data
+    Returns: None
     """
 
-    # try to get POLE_RA, POLE_DEC and PM (plus deltas for each)
-    try:
-        # get basic rotation data and convert to list
-        target_RA_all = spice.bodvrd(bod_id, "POLE_RA", 3)[1].tolist()
-        target_DEC_all = spice.bodvrd(bod_id, "POLE_DEC", 3)[1].tolist()
-        target_PM_all = spice.bodvrd(bod_id, "PM", 3)[1].tolist()
-
-        # get the initial values
-        target_RA_j2000 = target_RA_all[0]
-        target_DEC_j2000 = target_DEC_all[0]
-        target_PM_j2000 = target_PM_all[0]
-
-        # get the deltas
-        target_RA_delta = target_RA_all[1]
-        target_DEC_delta = target_DEC_all[1]
-        target_PM_delta = target_PM_all[1]
-
-        # add each value to a dictionary
-        ret_dict = {
-            "ra": target_RA_j2000,
-            "ra_delta": target_RA_delta,
-            "dec": target_DEC_j2000,
-            "dec_delta": target_DEC_delta,
-            "pm": target_PM_j2000,
-            "pm_delta": target_PM_delta
-        }
-    # this except should never be hit since this function is only called on bodies that have some rotation data,
-    # but just in case...
-    except:
-        ret_dict = "NO ROTATION DATA AVAILABLE"
-        return ret_dict
+    target_dict['min speed'] = float(speeds.min()) if len(speeds) else None
+    target_dict['max speed'] = float(speeds.max()) if len(speeds) else None
+
+    if kept_idx is not None:
+        velocities = velocities[kept_idx]
+        speeds = speeds[kept_idx]
+
+    target_dict['velocities'] = velocities.tolist()
+    target_dict['speeds'] = speeds.tolist()
+
+
+def parse_batch_query(query):
+    """
+    aether-rest-server.py -- parse_batch_query
+        Validates a single query of a batch request and works out the epochs it asks for. Each query is a dictionary
+        with a target, an optional observer (default 'solar system barycenter'), an optional frame (default 'J2000')
+        and either a uniform grid ('grid': {'start_jd', 'step_jd', 'count'}) or an explicit list of epochs
+        ('epochs_jd'). Times are UTC Julian days, the same as the positions endpoint.
+
+    Params: query <dict> -- one item of the batch request's 'queries' list
+
+    Returns: tuple -- (target <str>, observer <str>, frame <str>, epoch_key <tuple>). epoch_key is hashable and equal
+        for queries asking for the same epochs: ('grid', start_jd, step_jd, count) or ('epochs', (jd, ...)). Raises
+        ValueError with a message for the client if the query is invalid.
+    """
+
+    if not isinstance(query, dict):
+        raise ValueError('each query must be an object.')
+
+    # targets and observers may be given as names or NAIF IDs
+    target = query.get('target')
+    observer = query.get('observer', 'solar system barycenter')
+    frame = query.get('frame', 'J2000')
+
+    if isinstance(target, str):
+        target = target.lower()
+        if not current_bodies().isValidName(target):
+            raise ValueError('{} is not a known target.'.format(target))
+    elif not isinstance(target, int) or isinstance(target, bool) or not current_bodies().isValidID(target):
+        raise ValueError('{} is not a known target.'.format(target))
+
+    if isinstance(observer, str):
+        observer = observer.lower()
+    if isinstance(observer, bool) or not isinstance(observer, (str, int)) or \
+            not current_bodies().isValidRefFrame(observer):
+        raise ValueError('{} is not a valid reference frame.'.format(observer))
+
+    # any frame known to SPICE may be used
+    if not isinstance(frame, str) or not FrameTransformer.isValidFrame(frame):
+        raise ValueError('{} is not a known frame.'.format(frame))
+    frame = frame.upper()
+
+    # exactly one of grid and epochs_jd must be given
+    if ('grid' in query) == ('epochs_jd' in query):
+        raise ValueError('each query must have either grid or epochs_jd.')
 
-    # get NUT_PREC_RA, NUT_PREC_DEC and NUT_PREC_ANGLES
     try:
+        if 'grid' in query:
+            grid = query['grid']
+            epoch_key = ('grid', float(grid['start_jd']), float(grid['step_jd']), int(grid['count']))
 
-        # get nutation/precession info... max of 20 values
-        target_NUT_PREC_RA = spice.bodvrd(bod_id, "NUT_PREC_RA", 20)
-        target_NUT_PREC_DEC = spice.bodvrd(bod_id, "NUT_PREC_DEC", 20)
+            # get_json accepts NaN and Infinity, which would otherwise reach the time grid
+            if not np.isfinite(epoch_key[1:3]).all() or epoch_key[2] <= 0.0 or epoch_key[3] < 1:
+                raise ValueError
+        else:
+            epoch_key = ('epochs', tuple(float(jd) for jd in query['epochs_jd']))
 
-        # slice the list based on the first arg which specifies the number of legitimate data points returned
-        ret_dict['nut_prec_ra'] = target_NUT_PREC_RA[1].tolist()[:target_NUT_PREC_RA[0]]
-        ret_dict['nut_prec_dec'] = target_NUT_PREC_DEC[1].tolist()[:target_NUT_PREC_DEC[0]]
+            if not epoch_key[1] or not np.isfinite(epoch_key[1]).all():
+                raise ValueError
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('grid must have start_jd, a positive step_jd and a positive count, and epochs_jd must be a '
+                         'non-empty list of numbers.')
 
-        # try to get nutation/precession angles for the body... max of 72 values, sliced the same way as before
-        try:
-            target_NUT_PREC_ANGLES = spice.bodvrd(bod_name + " BARYCENTER", "NUT_PREC_ANGLES", 72)
-            ret_dict['nut_prec_angles'] = target_NUT_PREC_ANGLES[1].tolist()[:target_NUT_PREC_ANGLES[0]]
-        # the case where there are no nutation-precession angles for the body
-        except:
-            # do nothing, just go onto the next iteration
-            pass
-    # the case where there is no nutation-precession info for the body -- go on to the next loop iteration
-    except:
+    # SPICE functions take strings for both names and IDs
+    return str(target), str(observer), frame, epoch_key
+
+
+def evaluate_batch_jobs(jobs, compute):
+    """
+    aether-rest-server.py -- evaluate_batch_jobs
+        Computes a set of batch jobs together, falling back to computing them one at a time if SPICE raises an error, so
+        that a single query outside of its kernel's coverage doesn't fail the others.
+
+    Params: jobs list -- the jobs to compute, in whatever form compute takes
+            compute function -- takes a list of jobs and returns a list of (n, 3) arrays of positions
+
+    Returns: list -- an (n, 3) array of positions for each job, or the SPICE error message (<str>) if it failed
+    """
+
+    try:
+        return compute(jobs)
+    except spice.stypes.SpiceyError:
         pass
 
-    # return the accumulated rotation info
-    return ret_dict
+    results = list()
+    for job in jobs:
+        try:
+            results.append(compute([job])[0])
+        except spice.stypes.SpiceyError as error:
+            results.append(str(error))
 
+    return results
 
-def returnResponse(response, status):
+
+def parse_body_fields(fields_arg):
     """
-    aether-rest-server.py -- returnResponse
-        Simple function to encode and package data into a response that is sent to the frontend by the calling function.
+    aether-rest-server.py -- parse_body_fields
+        Parses the fields query parameter of the available-bodies endpoint. Field names are the keys of the returned
+        dictionaries, with either spaces or underscores (e.g. body_name,min_speed). 'spice id' is always returned.
 
-    Params: response <list> or <dict> -- really anything that can be serialized into JSON format.
-            status <int> -- the status code of the response (typically either 200, or 40X).
+    Params: fields_arg <str> or None -- the query parameter, None for every field
 
-    Returns: a Flask response object with the payload being the JSON-encoded data.
+    Returns: tuple[<str>] -- the fields to return, or None if a field is unknown
     """
-    response_pickled = jsonpickle.encode(response)
 
-    return Response(response=response_pickled, status=status, mimetype="application/json")
+    if fields_arg is None:
+        return BODY_FIELDS
+
+    fields = set(field.strip().lower().replace('_', ' ') for field in fields_arg.split(',') if field.strip())
+    if not fields.issubset(BODY_FIELDS):
+        return None
+
+    return tuple(field for field in BODY_FIELDS if field in fields or field == 'spice id')
+
+
+def add_body_details(bod_dict, ref_frame, fields, evaluate=None):
+    """
+    aether-rest-server.py -- add_body_details
+        Adds the fields which must be computed (min-max speeds, radius, mass, rotation data) to a body dictionary from
+        AetherBodies.getBodies, but only those in fields. Radius, mass and rotation data are only added if the body has
+        them. Call speed_cache.save() once all bodies are done.
+
+    Params: bod_dict <dict> -- the body's dictionary, modified in place
+            ref_frame <str> -- the observer of the min-max speeds
+            fields tuple[<str>] -- see parse_body_fields
+            evaluate <function> OPTIONAL -- see get_min_max_speed
+
+    Returns: None
+    """
+
+    # convert body's NAIF ID to a string so that it is recognized by spice functions
+    bod_id = str(bod_dict['spice id'])
+
+    # get the min and max speeds -- computed only if they aren't cached for the current kernels
+    if 'min speed' in fields or 'max speed' in fields:
+        min_max_speeds = get_cached_min_max_speed(bod_id, current_bodies().getEtTimes(bod_dict['spice id']), ref_frame,
+                                                  evaluate)
+        bod_dict['min speed'] = min_max_speeds[0]
+        bod_dict['max speed'] = min_max_speeds[1]
+
+    # physical constants are read from the table built when kernels were loaded
+    if 'radius' in fields and bod_dict['has radius data']:
+        bod_dict['radius'] = body_constants.getRadius(bod_id)
+
+    if 'mass' in fields and bod_dict['has mass data']:
+        bod_dict['mass'] = body_constants.getMass(bod_id)
+
+    if 'rotation data' in fields and bod_dict['has rotation data']:
+        bod_dict['rotation data'] = body_constants.getRotationData(bod_id)
+
+
+def generate_position_stream(targets_list, ref_frame, etStart, etDelta, n_samples, cur_idx, payload_format, dtype,
+                             chunk_samples, frame='J2000'):
+    """
+    aether-rest-server.py -- generate_position_stream
+        Generator behind the streaming mode of the positions endpoint. It yields a header record, the times in chunks,
+        then each target's positions in chunks of at most chunk_samples samples, and finally an end record. Only one
+        chunk is held in memory at a time, and a client can start using the first targets while later ones are still
+        being computed. If an error occurs after streaming has started, an error record is yielded instead of the end
+        record.
+
+        Records are newline-delimited JSON objects for the json format...
+            {"type": "header", "cur_time_idx": ..., "grid_et": ..., "n_samples": ..., "chunk_samples": ...,
+             "targets": [...]}
+            {"type": "times", "offset": ..., "times": [...]}
+            {"type": "positions", "target": ..., "offset": ..., "positions": [[x, y, z], ...]}
+            {"type": "end"} or {"type": "error", "error": ...}
+        and length-prefixed binary records for the bin format (see PositionPacker.packRecord).
+
+    Params: targets_list list[<str>], ref_frame <str> -- targets and observer
+            etStart <float>, etDelta <float>, n_samples <int> -- the ET grid
+            cur_idx <int> -- index of the grid corresponding to curVizJd
+            payload_format <str> -- 'json' or 'bin'
+            dtype <str> -- 'float64' or 'float32', only used by the bin format
+            chunk_samples <int> -- maximum number of samples in each chunk
+            frame <str> OPTIONAL -- the reference frame of the positions, see FrameTransformer.py
+
+    Returns: generator of <str> (json) or <bytes> (bin)
+    """
+
+    # start offsets of each chunk
+    chunk_offsets = range(0, n_samples, chunk_samples)
+
+    # coordinate type of binary position records
+    coord_type = PositionPacker.DTYPES[dtype]
+
+    header = {
+        'type': 'header',
+        'cur_time_idx': cur_idx,
+        'grid_et': etStart,
+        'n_samples': n_samples,
+        'chunk_samples': chunk_samples,
+        'targets': [{'name': target, 'info': get_target_info(target, ref_frame, frame)} for target in targets_list]
+    }
+
+    if payload_format == 'bin':
+        yield position_packer.packRecord(PositionPacker.RECORD_HEADER, data=jsonpickle.encode(header).encode('utf-8'))
+    else:
+        yield jsonpickle.encode(header) + '\n'
+
+    try:
+        # times first -- converting them is cheap, and every target uses them
+        for offset in chunk_offsets:
+            count = min(chunk_samples, n_samples - offset)
+            jd_times = time_axis.etToJd(time_axis.etChunk(etStart, etDelta, offset, count))
+
+            if payload_format == 'bin':
+                yield position_packer.packRecord(PositionPacker.RECORD_TIMES, offset=offset, data=jd_times)
+            else:
+                yield jsonpickle.encode({'type': 'times', 'offset': offset, 'times': jd_times.tolist()}) + '\n'
+
+        # then each target, one chunk at a time
+        for target_idx, target in enumerate(targets_list):
+            for offset in chunk_offsets:
+                count = min(chunk_samples, n_samples - offset)
+
+                target_positions = current_ephemeris_cache().getPositions([(target, ref_frame, 'J2000')],
+                                                                          etStart + etDelta * offset, etDelta, count,
+                                                                          evaluate_positions)[0]
+
+                # rotate out of J2000 -- the chunk's matrices are cached, so every target shares them
+                chunk_key = (etStart + etDelta * offset, etDelta, count)
+                target_positions = frame_transformer.transform(frame, target_positions,
+                                                               time_axis.etChunk(etStart, etDelta, offset, count),
+                                                               chunk_key)
+
+                if payload_format == 'bin':
+                    # in float32 mode, positions are relative to the first position of the chunk
+                    origin = target_positions[0] if coord_type.itemsize == 4 else np.zeros(3)
+                    yield position_packer.packRecord(PositionPacker.RECORD_POSITIONS, target_idx, offset,
+                                                     (target_positions - origin).astype(coord_type), origin)
+                else:
+                    yield jsonpickle.encode({'type': 'positions', 'target': target, 'offset': offset,
+                                             'positions': target_positions.tolist()}) + '\n'
+
+    except spice.stypes.SpiceyError as error:
+        # the status code has already been sent, so report the error in the stream itself
+        if payload_format == 'bin':
+            yield position_packer.packRecord(PositionPacker.RECORD_ERROR,
+                                             data=jsonpickle.encode({'error': str(error)}).encode('utf-8'))
+        else:
+            yield jsonpickle.encode({'type': 'error', 'error': str(error)}) + '\n'
+        return
+
+    if payload_format == 'bin':
+        yield position_packer.packRecord(PositionPacker.RECORD_END)
+    else:
+        yield jsonpickle.encode({'type': 'end'}) + '\n'
 
 
 @app.route('/api/positions/<string:ref_frame>/<string:targets>/<string:curVizJd>/<string:curVizJdDelta>/<string:tailLenJd>/<int:validSeconds>', methods=['GET'])
@@ -292,8 +946,41 @@ def get_object_positions(ref_frame, targets, curVizJd, curVizJdDelta, tailLenJd,
             validSeconds <int> -- the amount of position data to gather past curVizJd. Higher values provide more future
                 data, so the frontend won't need to update as much, and vice versa. See Main idea above for more detail.
 
-    Returns: Flask Response object with a dictionary containing position lists (x, y, z) w.r.t. the specified observer,
-        times corresponding to each position, and the current index (index of lists for curVizJd) for each target.
+    Query params (optional):
+            format <str> -- 'json' (default) or 'bin'. Binary payloads can also be requested with an
+                Accept: application/octet-stream header. See PositionPacker.py for the binary layout.
+            dtype <str> -- 'float64' (default) or 'float32'. Only used by the binary format. In float32 mode positions
+                are stored relative to each target's position at cur_time_idx, which is given in the payload metadata.
+            stream <str> -- '1' to stream the response as records (newline-delimited JSON, or length-prefixed binary
+                records with format=bin) instead of building the whole payload in memory. Meant for long tails at
+                fine deltas. See generate_position_stream for the record formats.
+            chunk <int> -- maximum number of samples in each streamed record (default 4096).
+            tolerance_km <float> -- if given, each target's trajectory is simplified to the samples needed to stay within
+                tolerance_km of every dropped sample when interpolating linearly in time (see TrajectoryDecimator.py).
+                The sample at curVizJd is always kept. Since each target then has its own samples, 'times' and
+                'cur_time_idx' are given for each target instead of at the top level. Only supported by the JSON
+                format, without streaming.
+            frame <str> -- the reference frame of the positions (and velocities), e.g. 'ECLIPJ2000' or a body-fixed frame
+                such as 'IAU_MARS' (default 'J2000'). Ephemeris is computed in J2000 and rotated on the server, see
+                FrameTransformer.py.
+            mode <str> -- 'positions' (default) or 'state'. In state mode the whole grid is evaluated with spkezr (or
+                the native SPK engine) once, and each target also gets its velocities (km/s), the speed at each sample
+                and the min and max speed over the window, e.g. for speed gradients. Only supported by the JSON
+                format, without streaming.
+
+    Returns: Flask Response object with a dictionary containing the times (JD) shared by every target, the current
+        index (index of lists for curVizJd), the ET of the first sample (grid_et, to be passed back to the
+        positions-extend endpoint) and, under 'targets', position lists (x, y, z) w.r.t. the specified observer for
+        each target. The binary format holds the same data. Below is an example of the JSON format for reference...
+
+    {
+    'times': [2458849.5, 2458849.51, ...],
+    'cur_time_idx': 100,
+    'grid_et': 631108869.184,
+    'targets': {'earth': {'info': 'Positions (x,y,z) and times (JD) of Earth w.r.t. Sun',
+                          'positions': [[-26262618.2, 132745038.3, 57548421.7], ...]},
+                ...}
+    }
     """
 
     # convert string of targets into a list -- ensure lower case for consistency
@@ -303,14 +990,58 @@ def get_object_positions(ref_frame, targets, curVizJd, curVizJdDelta, tailLenJd,
     ref_frame = ref_frame.lower()
 
     # check to make sure the reference frame is valid
-    if not aether_bodies.isValidRefFrame(ref_frame): #ref_frame not in valid_targets:
+    if not current_bodies().isValidRefFrame(ref_frame): #ref_frame not in valid_targets:
         return returnResponse({'error': '{} is not a valid reference frame.'.format(ref_frame)}, 400)
 
     # check to make sure all targets are valid
     for target in targets_list:
-        if (not aether_bodies.isValidID(target)) and (not aether_bodies.isValidName(target)):
+        if (not current_bodies().isValidID(target)) and (not current_bodies().isValidName(target)):
             return returnResponse({'error': '{} is not a known target.'.format(target)}, 401)
 
+    # figure out which payload format the client wants
+    payload_format = get_payload_format()
+    if payload_format is None:
+        return returnResponse({'error': 'format must be either json or bin.'}, 400)
+
+    # coordinate type for the binary format
+    dtype = request.args.get('dtype', 'float64').lower()
+    if dtype not in PositionPacker.DTYPES:
+        return returnResponse({'error': 'dtype must be either float64 or float32.'}, 400)
+
+    # streaming mode and the number of samples in each streamed chunk
+    stream = request.args.get('stream', '0').lower() in ('1', 'true', 'yes')
+    try:
+        chunk_samples = int(request.args.get('chunk', 8 * EphemerisCache.TILE_SAMPLES))
+    except ValueError:
+        chunk_samples = 0
+    if chunk_samples < 1:
+        return returnResponse({'error': 'chunk must be a positive integer.'}, 400)
+
+    # error bound for trajectory simplification -- None to return every sample
+    tolerance_km = request.args.get('tolerance_km')
+    if tolerance_km is not None:
+        try:
+            tolerance_km = float(tolerance_km)
+        except ValueError:
+            tolerance_km = -1.0
+        if not tolerance_km > 0.0:
+            return returnResponse({'error': 'tolerance_km must be a positive number.'}, 400)
+        if stream or payload_format == 'bin':
+            return returnResponse({'error': 'tolerance_km is only supported by the JSON format without streaming.'},
+                                  400)
+
+    # state mode adds velocities and speeds to the positions
+    mode = request.args.get('mode', 'positions').lower()
+    if mode not in ('positions', 'state'):
+        return returnResponse({'error': 'mode must be either positions or state.'}, 400)
+    if mode == 'state' and (stream or payload_format == 'bin'):
+        return returnResponse({'error': 'mode=state is only supported by the JSON format without streaming.'}, 400)
+
+    # reference frame of the returned positions
+    frame = request.args.get('frame', 'J2000').upper()
+    if not FrameTransformer.isValidFrame(frame):
+        return returnResponse({'error': '{} is not a known frame.'.format(frame)}, 400)
+
     # convert all JD string arguments into floats... maybe they could be specified as floats instead...
     try:
         curVizJd = float(curVizJd)
@@ -337,9 +1068,9 @@ def get_object_positions(ref_frame, targets, curVizJd, curVizJdDelta, tailLenJd,
 
     # ----- REMEMBER: ET (ephemeris time) is simply seconds past J2000 epoch. J2000 epoch is JD 2451545.0 -----
 
-    # calculate ET times from date/time strings
+    # calculate ET times from date/time strings -- the start is snapped so that the grid lines up with cached tiles
     try:
-        etStart = spice.str2et(startDate)
+        etStart = time_axis.snapEt(spice.str2et(startDate))
         etDelta = curVizJdDelta * 86400  # Since JD is in days and ET is in seconds, simply multiply by seconds in a day
     except Exception as error:
 
@@ -348,7 +1079,18 @@ def get_object_positions(ref_frame, targets, curVizJd, curVizJdDelta, tailLenJd,
     # calculate the number of necessary steps...
     total_steps = round((jd_end - jd_start) / curVizJdDelta)
     cur_idx = round((curVizJd - jd_start) / curVizJdDelta)
-    times = [etStart + (etDelta * x) for x in range(total_steps + 1)]
+
+    # stream the response chunk by chunk rather than building it all in memory
+    if stream:
+        mimetype = 'application/octet-stream' if payload_format == 'bin' else 'application/x-ndjson'
+        # the request context is kept while streaming, for the kernel session
+        return Response(stream_with_context(generate_position_stream(targets_list, ref_frame, etStart, etDelta,
+                                                                     total_steps + 1, cur_idx, payload_format, dtype,
+                                                                     chunk_samples, frame)),
+                        status=200, mimetype=mimetype)
+
+    # build the ET grid once -- it is shared by every target
+    times = time_axis.etGrid(etStart, etDelta, total_steps)
 
     # DEBUGGING
     # if etStart not in times:
@@ -358,28 +1100,367 @@ def get_object_positions(ref_frame, targets, curVizJd, curVizJdDelta, tailLenJd,
     # if etEnd not in times:
     #     print("Times list does not contain etEnd")
 
-    # empty dictionary to hold return data
-    response_data = dict()
+    # convert the grid into JD once -- it is shared by every target
+    jd_times = time_axis.etToJd(times)
 
-    # gather data for each target
-    for i, target in enumerate(targets_list):
+    # gather data for every target -- tiles of the grid which were computed for an earlier request are reused
+    queries = [(target, ref_frame, 'J2000') for target in targets_list]
 
-        # second variable returned is light times, which we may disregard for this purpose
-        target_positions, _ = spice.spkpos(target, times, 'J2000', 'NONE', ref_frame)
-
-        response_data[target] = {
-            'info': 'Positions (x,y,z) and times (JD) of {} w.r.t. {}'.format(target.capitalize(),
-                                                                              ref_frame.capitalize()),
-            'positions': [coord.tolist() for coord in target_positions],  # target_positions is a numpy.ndarray
-            'times': [float(spice.et2utc(etTime, "J", 8)[3:]) for etTime in times],
-            # convert times to JD, slice off "JD " and convert to float
-            'cur_time_idx': cur_idx
+    # rotation matrices of the grid are cached under this key
+    grid_key = (etStart, etDelta, len(times))
+
+    if mode == 'state':
+        all_states = current_ephemeris_cache().getPositions(queries, etStart, etDelta, len(times), evaluate_states,
+                                                            'states')
+    else:
+        all_positions = current_ephemeris_cache().getPositions(queries, etStart, etDelta, len(times),
+                                                               evaluate_positions)
+
+    # rotate out of J2000 -- a known frame may still lack orientation data for the grid
+    try:
+        if mode == 'state':
+            all_states = [frame_transformer.transform(frame, target_states, times, grid_key)
+                          for target_states in all_states]
+            all_positions = [target_states[:, :3] for target_states in all_states]
+        else:
+            all_positions = [frame_transformer.transform(frame, target_positions, times, grid_key)
+                             for target_positions in all_positions]
+    except spice.stypes.SpiceyError as error:
+        return returnResponse({'error': str(error)}, 405)
+
+    # velocities and speeds of each target in state mode
+    target_velocities = dict()
+    if mode == 'state':
+        for target, target_states in zip(targets_list, all_states):
+            velocities = target_states[:, 3:]
+            target_velocities[target] = (velocities, np.linalg.norm(velocities, axis=1))
+
+    # list to hold (name, info, positions) for each target
+    target_data = list()
+
+    for target, target_positions in zip(targets_list, all_positions):
+        target_data.append((target, get_target_info(target, ref_frame, frame), target_positions))
+
+    # pack the arrays as they are for binary payloads -- no python lists are created
+    if payload_format == 'bin':
+        return returnBinaryResponse(position_packer.pack(jd_times, cur_idx, target_data, dtype, etStart), 200)
+
+    # simplified trajectories have their own samples, so times and the current index are given for each target
+    if tolerance_km is not None:
+        response_data = {'tolerance_km': tolerance_km, 'grid_et': etStart, 'targets': dict()}
+
+        for target, target_info, target_positions in target_data:
+            kept_idx = trajectory_decimator.decimate(times, target_positions, tolerance_km, [cur_idx])
+
+            response_data['targets'][target] = {
+                'info': target_info,
+                'times': jd_times[kept_idx].tolist(),
+                'cur_time_idx': int(np.searchsorted(kept_idx, cur_idx)),
+                'positions': target_positions[kept_idx].tolist()
+            }
+
+            if mode == 'state':
+                add_speed_data(response_data['targets'][target], *target_velocities[target], kept_idx)
+
+        return returnResponse(response_data, 200)
+
+    # dictionary to hold return data -- times (JD) and the current index are the same for every target, so they are
+    # only sent once at the top level. The ET of the first sample anchors the grid for the positions-extend endpoint.
+    response_data = {
+        'times': jd_times.tolist(),
+        'cur_time_idx': cur_idx,
+        'grid_et': etStart,
+        'targets': dict()
+    }
+
+    for target, target_info, target_positions in target_data:
+        response_data['targets'][target] = {
+            'info': target_info,
+            'positions': target_positions.tolist()  # target_positions is a numpy.ndarray
         }
 
+        if mode == 'state':
+            add_speed_data(response_data['targets'][target], *target_velocities[target])
+
     # return the response to the frontend -- 200 code for success
     return returnResponse(response_data, 200)
 
 
+@app.route('/api/positions-extend/<string:ref_frame>/<string:targets>/<string:lastJd>/<string:curVizJd>/<string:curVizJdDelta>/<string:dropBeforeJd>/<int:validSeconds>', methods=['GET'])
+def get_extended_positions(ref_frame, targets, lastJd, curVizJd, curVizJdDelta, dropBeforeJd, validSeconds):
+    """
+    aether-rest-server.py -- get_extended_positions
+        This function is an incremental version of get_object_positions. A client which already holds positions up to
+        lastJd only needs the samples after it to extend its window, so instead of the whole tail plus the future
+        window, only the samples of the same grid (lastJd + k * curVizJdDelta) after lastJd and up to the end of the new
+        window are computed and returned. Samples before dropBeforeJd are skipped, since the client is going to drop
+        them anyway. During steady playback the cost scales with the elapsed sim time rather than with the tail
+        length. Clients should pass back the grid_et of the response that started their window, so that the new
+        samples are on exactly the same ETs and tiles computed for earlier requests are reused by the ephemeris cache
+        (lastJd alone is only precise to about a millisecond).
+
+    Params: ref_frame <str> -- the name or NAIF ID of the observing body, see get_object_positions
+            targets <str> -- names or NAIF IDs of the desired targets separated by '+', see get_object_positions
+            lastJd <str> -- the last time (JD) the client holds positions for. New samples are aligned to it.
+            curVizJd <str> -- the current time in the frontend visualization (JD)
+            curVizJdDelta <str> -- the granularity in JD between each position coordinate, the same as the client's
+                existing data
+            dropBeforeJd <str> -- the time (JD) before which the client drops its data, e.g. curVizJd - tailLenJd
+            validSeconds <int> -- the amount of position data to gather past curVizJd, see get_object_positions
+
+    Query params (optional):
+            frame <str> -- the reference frame of the positions (default 'J2000'), see get_object_positions
+            grid_et <float> -- the ET of any sample of the client's grid, as returned by the positions endpoint (or
+                by this one). lastJd is snapped to the nearest sample of that grid. Without it, the grid is anchored to
+                lastJd itself.
+
+    Returns: Flask Response object with a dictionary containing the new times (JD) shared by every target, the index
+        of curVizJd within them (negative or past the end if curVizJd isn't among the new samples), drop_before_jd
+        (dropBeforeJd snapped down to the grid), grid_et (the grid's anchor, to be passed to the next call) and, under
+        'targets', the new positions of each target. Below is an example of the JSON format for reference...
+
+    {
+    'times': [2458849.52, 2458849.53, ...],
+    'cur_time_idx': -2,
+    'drop_before_jd': 2458819.5,
+    'grid_et': 631108869.184,
+    'targets': {'earth': {'info': 'Positions (x,y,z) and times (JD) of Earth w.r.t. Sun',
+                          'positions': [[-26262618.2, 132745038.3, 57548421.7], ...]},
+                ...}
+    }
+    """
+
+    # convert string of targets into a list -- ensure lower case for consistency
+    targets_list = [target.lower() for target in targets.split('+')]
+
+    # convert ref frame to lower case for consistency
+    ref_frame = ref_frame.lower()
+
+    # check to make sure the reference frame is valid
+    if not current_bodies().isValidRefFrame(ref_frame):
+        return returnResponse({'error': '{} is not a valid reference frame.'.format(ref_frame)}, 400)
+
+    # check to make sure all targets are valid
+    for target in targets_list:
+        if (not current_bodies().isValidID(target)) and (not current_bodies().isValidName(target)):
+            return returnResponse({'error': '{} is not a known target.'.format(target)}, 401)
+
+    try:
+        lastJd = float(lastJd)
+        curVizJd = float(curVizJd)
+        curVizJdDelta = float(curVizJdDelta)
+        dropBeforeJd = float(dropBeforeJd)
+    except ValueError:
+        return returnResponse({'error': 'lastJd, curVizJd, curVizJdDelta, dropBeforeJd must all be floats.'}, 402)
+
+    if curVizJdDelta <= 0.0:
+        return returnResponse({'error': 'curVizJdDelta must be positive.'}, 403)
+
+    # reference frame of the returned positions
+    frame = request.args.get('frame', 'J2000').upper()
+    if not FrameTransformer.isValidFrame(frame):
+        return returnResponse({'error': '{} is not a known frame.'.format(frame)}, 400)
+
+    # end of the new window, the same as get_object_positions
+    jd_end = curVizJd + (curVizJdDelta * 60 * validSeconds)
+
+    # steps of the grid from lastJd -- the last step of the window, the step at or before dropBeforeJd (the small
+    # value accounts for round off error, as in get_object_positions) and the step of curVizJd
+    last_step = int(round((jd_end - lastJd) / curVizJdDelta))
+    drop_step = int(np.floor((dropBeforeJd - lastJd) / curVizJdDelta + 0.0001))
+    cur_step = int(round((curVizJd - lastJd) / curVizJdDelta))
+
+    # only samples after lastJd which won't be dropped are needed
+    first_step = max(1, drop_step)
+    n_samples = max(0, last_step - first_step + 1)
+
+    etDelta = curVizJdDelta * 86400
+
+    # the grid is anchored to grid_et when the client has it, otherwise to lastJd itself
+    etLast = time_axis.snapEt(time_axis.jdToEt([lastJd])[0])
+    grid_et = request.args.get('grid_et')
+    if grid_et is None:
+        grid_et = etLast
+        last_idx = 0
+    else:
+        try:
+            grid_et = float(grid_et)
+        except ValueError:
+            return returnResponse({'error': 'grid_et must be a float.'}, 402)
+
+        # index of lastJd in the grid -- the steps from lastJd computed above are relative to it
+        last_idx = int(round((etLast - grid_et) / etDelta))
+
+    times = time_axis.etChunk(grid_et, etDelta, last_idx + first_step, n_samples)
+    jd_times = time_axis.etToJd(times)
+
+    # first ET of the new samples, computed the same way as the grid so that the cache tiles line up
+    etFirst = grid_et + etDelta * (last_idx + first_step)
+
+    # gather data for every target -- tiles computed for the client's earlier requests are reused
+    try:
+        all_positions = current_ephemeris_cache().getPositions(
+            [(target, ref_frame, 'J2000') for target in targets_list], etFirst, etDelta, n_samples,
+            evaluate_positions)
+    except spice.stypes.SpiceyError as error:
+        return returnResponse({'error': str(error)}, 405)
+
+    response_data = {
+        'times': jd_times.tolist(),
+        'cur_time_idx': cur_step - first_step,
+        'drop_before_jd': float(time_axis.etToJd(time_axis.etChunk(grid_et, etDelta, last_idx + drop_step, 1))[0]),
+        'grid_et': grid_et,
+        'targets': dict()
+    }
+
+    for target, target_positions in zip(targets_list, all_positions):
+        # rotate out of J2000 -- a known frame may still lack orientation data for the new samples
+        try:
+            target_positions = frame_transformer.transform(frame, np.asarray(target_positions).reshape(-1, 3), times,
+                                                           (etFirst, etDelta, n_samples))
+        except spice.stypes.SpiceyError as error:
+            return returnResponse({'error': str(error)}, 405)
+
+        response_data['targets'][target] = {
+            'info': get_target_info(target, ref_frame, frame),
+            'positions': target_positions.tolist()
+        }
+
+    return returnResponse(response_data, 200)
+
+
+@app.route('/api/positions-batch/', methods=['POST'])
+def get_batch_positions():
+    """
+    aether-rest-server.py -- get_batch_positions
+        This function serves positions for many queries in a single request. Each query has its own target, observer,
+        frame and epochs (see parse_batch_query), so analysis clients don't need one positions request per
+        observer/grid. Queries asking for the same epochs are grouped and evaluated together: uniform grids go through
+        the ephemeris cache, and all explicit epoch lists are fanned out across the SPICE worker processes in one go.
+        Within a group, queries are ordered by observer and frame so neighbouring work shares cache tiles and kernels.
+
+    Params: None. The request body is JSON: {'queries': [query, ...]}, see parse_batch_query. Example...
+
+    {
+    'queries': [{'target': 'earth', 'observer': 'sun', 'grid': {'start_jd': 2458849.5, 'step_jd': 0.5, 'count': 10}},
+                {'target': 'mars', 'observer': 'sun', 'grid': {'start_jd': 2458849.5, 'step_jd': 0.5, 'count': 10}},
+                {'target': 399, 'observer': 'moon', 'frame': 'ECLIPJ2000', 'epochs_jd': [2458849.5, 2458900.25]}]
+    }
+
+    Returns: Flask Response object with a dictionary holding each distinct set of epochs (JD) once, under
+        'epoch_sets', and one result per query, in the same order as the queries. A result refers to its epochs by
+        index. A query SPICE fails on (e.g. outside of its kernel's coverage) gets an 'error' instead of 'positions'.
+        Example for the request above...
+
+    {
+    'epoch_sets': [[2458849.5, 2458850.0, ...], [2458849.5, 2458900.25]],
+    'results': [{'target': 'earth', 'observer': 'sun', 'frame': 'J2000', 'epoch_set': 0,
+                 'positions': [[-26262618.2, 132745038.3, 57548421.7], ...]},
+                ...]
+    }
+    """
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get('queries'), list):
+        return returnResponse({'error': 'request body must be a JSON object with a list of queries.'}, 400)
+
+    # validate every query before computing anything
+    parsed_queries = list()
+    for query_idx, query in enumerate(body['queries']):
+        try:
+            parsed_queries.append(parse_batch_query(query))
+        except ValueError as error:
+            return returnResponse({'error': 'query {}: {}'.format(query_idx, error)}, 400)
+
+    # group query indices by the epochs they ask for, keeping the order in which each set first appears
+    epoch_groups = dict()
+    for query_idx, (_, _, _, epoch_key) in enumerate(parsed_queries):
+        epoch_groups.setdefault(epoch_key, list()).append(query_idx)
+
+    total_samples = sum((key[3] if key[0] == 'grid' else len(key[1])) * len(query_indices)
+                        for key, query_indices in epoch_groups.items())
+    if total_samples > batch_max_samples:
+        return returnResponse({'error': 'batch asks for {} samples, the limit is {}.'.format(total_samples,
+                                                                                         batch_max_samples)}, 413)
+
+    # JD times of each epoch set, and positions (or an error message) for each query
+    epoch_sets = list()
+    results = [None] * len(parsed_queries)
+
+    # ET times of each epoch set and the key its rotation matrices are cached under (None for explicit epochs)
+    set_times = list()
+    set_grid_keys = list()
+
+    # explicit epoch jobs are collected from every group and computed together at the end
+    explicit_jobs = list()
+    explicit_indices = list()
+
+    for set_idx, (epoch_key, query_indices) in enumerate(epoch_groups.items()):
+
+        # order the group so queries with the same observer and frame are next to each other
+        query_indices = sorted(query_indices, key=lambda idx: parsed_queries[idx][1:3] + parsed_queries[idx][:1])
+
+        # everything is computed in J2000 (so the native engine and the cache can be used) and rotated afterwards
+        jobs = [parsed_queries[idx][:2] + ('J2000',) for idx in query_indices]
+
+        if epoch_key[0] == 'grid':
+            _, start_jd, step_jd, count = epoch_key
+
+            # same conversions as the positions endpoint, so grids line up with its cache tiles
+            etStart = time_axis.snapEt(time_axis.jdToEt([start_jd])[0])
+            etDelta = step_jd * 86400
+
+            set_times.append(time_axis.etGrid(etStart, etDelta, count - 1))
+            set_grid_keys.append((etStart, etDelta, count))
+            epoch_sets.append(time_axis.etToJd(set_times[-1]).tolist())
+
+            group_results = evaluate_batch_jobs(
+                jobs, lambda group_jobs: current_ephemeris_cache().getPositions(group_jobs, etStart, etDelta, count,
+                                                                                evaluate_positions))
+
+            for idx, positions in zip(query_indices, group_results):
+                results[idx] = positions
+        else:
+            epoch_sets.append(list(epoch_key[1]))
+
+            # convert the epochs once for the whole group
+            times = time_axis.jdToEt(epoch_key[1])
+            set_times.append(times)
+            set_grid_keys.append(None)
+
+            explicit_jobs.extend(job + (times,) for job in jobs)
+            explicit_indices.extend(query_indices)
+
+        # remember which epoch set each query refers to
+        for idx in query_indices:
+            parsed_queries[idx] = parsed_queries[idx][:3] + (set_idx,)
+
+    for idx, positions in zip(explicit_indices, evaluate_batch_jobs(explicit_jobs, evaluate_positions)):
+        results[idx] = positions
+
+    # build the results in the same order as the queries
+    response_data = {'epoch_sets': epoch_sets, 'results': list()}
+
+    for (target, observer, frame, set_idx), positions in zip(parsed_queries, results):
+        result = {'target': target, 'observer': observer, 'frame': frame, 'epoch_set': set_idx}
+
+        # rotate out of J2000 -- orientation data may be missing for body-fixed frames
+        if not isinstance(positions, str):
+            try:
+                positions = frame_transformer.transform(frame, positions, set_times[set_idx], set_grid_keys[set_idx])
+            except spice.stypes.SpiceyError as error:
+                positions = str(error)
+
+        if isinstance(positions, str):
+            result['error'] = positions
+        else:
+            result['positions'] = np.asarray(positions).tolist()
+
+        response_data['results'].append(result)
+
+    return returnResponse(response_data, 200)
+
+
 # NOTE: This endpoint is unused and is left in only as a reference
 # @app.route('/api/positions-legacy/<string:ref_frame>/<string:targets>/<string:startDate>/<string:endDate>/<string:steps>', methods=['GET'])
 # def get_object_positions_legacy(ref_frame, targets, startDate, endDate, steps):
@@ -486,6 +1567,15 @@ def get_available_bodies(ref_frame):
         are calculated against. This determines the range of speeds which the frontend uses for trajectory gradients. It
         is necessary because the min and max speeds of an object are different for different observers.
 
+    Query params (all optional):
+            fields <str> -- comma separated keys to return, e.g. body_name,category (see BODY_FIELDS). Speeds, radius,
+                mass and rotation data are only computed if requested. 'spice id' is always returned.
+            category <str> -- comma separated categories to return, e.g. spacecraft,mars
+            uploaded <str> -- true for uploaded bodies only, false for default bodies only
+            limit <int> -- return at most this many bodies. When more remain, the X-Next-Cursor header holds the value
+                of after for the next page.
+            after <int> -- return bodies with a NAIF ID greater than this. Paginated results are ordered by NAIF ID.
+
     Returns: a Flask response object with a list of dictionaries. Each dictionary in the list provides metadata for a
         single body that the backend has loaded in it's SPICE kernel set. See the above description for more info. Below
         is an example of a single dictionary in the list for reference...
@@ -517,41 +1607,123 @@ def get_available_bodies(ref_frame):
     ref_frame = ref_frame.lower()
 
     # check to make sure the reference frame is valid
-    if not aether_bodies.isValidRefFrame(ref_frame):
+    if not current_bodies().isValidRefFrame(ref_frame):
         return returnResponse({'error': '{} is not a valid reference frame.'.format(ref_frame)}, 400)
 
-    # get all body info from AetherBodies class
-    known_bodies = aether_bodies.getBodies()
+    # the full response may have been computed in the background -- stale while kernels changed and it's recomputed.
+    # Only the server's own kernels are warmed up.
+    if current_session() is None and not set(request.args).difference(['session']):
+        warm_body, stale = warmup_scheduler.get(ref_frame)
+
+        if warm_body is not None:
+            response = response_compressor.makeResponse(warm_body, request.accept_encodings)
+            if stale:
+                response.headers['X-Aether-Stale'] = '1'
+
+            return response
+
+    # fields to return -- every field unless specified
+    fields = parse_body_fields(request.args.get('fields'))
+    if fields is None:
+        return returnResponse({'error': 'fields must be a comma separated list of: {}.'.format(
+            ', '.join(BODY_FIELDS))}, 400)
+
+    # only bodies in these categories, e.g. spacecraft,mars
+    categories = request.args.get('category')
+    if categories is not None:
+        categories = set(category.strip().lower() for category in categories.split(','))
+
+    # only uploaded bodies, or only default ones
+    uploaded = request.args.get('uploaded')
+    if uploaded is not None:
+        if uploaded.lower() not in ('1', 'true', 'yes', '0', 'false', 'no'):
+            return returnResponse({'error': 'uploaded must be either true or false.'}, 400)
+        uploaded = uploaded.lower() in ('1', 'true', 'yes')
+
+    # pagination -- at most limit bodies with a NAIF ID greater than after
+    try:
+        limit = request.args.get('limit')
+        limit = None if limit is None else int(limit)
+        after = request.args.get('after')
+        after = None if after is None else int(after)
+    except ValueError:
+        return returnResponse({'error': 'limit and after must be integers.'}, 400)
+    if limit is not None and limit < 1:
+        return returnResponse({'error': 'limit must be a positive integer.'}, 400)
+
+    # get all body info from AetherBodies class -- these fields are cheap
+    known_bodies = [bod_dict for bod_dict in current_bodies().getBodies()
+                    if (categories is None or bod_dict['category'] in categories) and
+                    (uploaded is None or bod_dict['is uploaded'] == uploaded)]
+
+    # pages are ordered by NAIF ID so that the cursor stays valid when bodies are added
+    next_cursor = None
+    if limit is not None or after is not None:
+        known_bodies = sorted([bod_dict for bod_dict in known_bodies if after is None or bod_dict['spice id'] > after],
+                              key=lambda bod_dict: bod_dict['spice id'])
+
+        if limit is not None and len(known_bodies) > limit:
+            known_bodies = known_bodies[:limit]
+            next_cursor = known_bodies[-1]['spice id']
+
+    # get rotation, mass, radii, min-max speeds -- only for the bodies and fields returned
+    for bod_dict in known_bodies:
+        add_body_details(bod_dict, ref_frame, fields)
 
-    # get rotation, mass, radii, min-max speeds for each body
+    # persist any newly computed speeds
+    speed_cache.save()
 
-    # traverse list of known bodies
-    for bod_dict in known_bodies:
+    # create the response and return it to the frontend
+    response = returnResponse([dict((key, value) for key, value in bod_dict.items() if key in fields)
+                               for bod_dict in known_bodies], 200)
 
-        # convert body's NAIF ID to a string so that it is recognized by spice functions
-        bod_id = str(bod_dict['spice id'])
+    # the after value of the next page, if there is one
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
 
-        # get the min and max speeds for each body
-        min_max_speeds = get_min_max_speed(bod_id, bod_dict['valid times'], ref_frame)
+    return response
 
-        # add min and max speeds to the dictionary
-        bod_dict['min speed'] = min_max_speeds[0]
-        bod_dict['max speed'] = min_max_speeds[1]
 
-        # check if body has radius data -- if so, get that data and add it to the dictionary
-        if bod_dict['has radius data']:
-            bod_dict['radius'] = get_radius(bod_id)
+@app.route('/api/bodies-covering/<string:jdStart>', defaults={'jdEnd': None}, methods=['GET'])
+@app.route('/api/bodies-covering/<string:jdStart>/<string:jdEnd>', methods=['GET'])
+def get_bodies_covering(jdStart, jdEnd):
+    """
+    aether-rest-server.py -- get_bodies_covering
+        This function serves the bodies which have ephemeris at an epoch, or over a whole window, so that body pickers
+        can be filtered by the simulation time without downloading every body's valid times. It is answered from the
+        coverage index of AetherBodies (see CoverageIndex.py).
 
-        # check if body has mass data -- if so, get that data and add it to the dictionary
-        if bod_dict['has mass data']:
-            bod_dict['mass'] = get_mass(bod_id)
+    Params: jdStart <str> -- the epoch, or the start of the window, as a UTC Julian day
+            jdEnd <str> OPTIONAL -- the end of the window as a UTC Julian day. Only jdStart needs to be covered if not
+                specified.
 
-        # check if body has rotation data -- if so, get that data and add it to the dictionary
-        if bod_dict['has rotation data']:
-            bod_dict['rotation data'] = get_rotation_data(bod_id, bod_dict['body name'])
+    Returns: a Flask response object with a list of dictionaries, one for each covering body, sorted by NAIF ID...
 
-    # create the response and return it to the frontend
-    return returnResponse(known_bodies, 200)
+    [{'spice id': 10, 'body name': 'sun', 'category': 'sun'}, {'spice id': 399, 'body name': 'earth', ...}, ...]
+    """
+
+    # convert JD string arguments into floats
+    try:
+        jd_times = [float(jdStart)] if jdEnd is None else [float(jdStart), float(jdEnd)]
+    except ValueError:
+        return returnResponse({'error': 'jdStart and jdEnd must be floats.'}, 402)
+
+    if len(jd_times) == 2 and jd_times[1] < jd_times[0]:
+        return returnResponse({'error': 'jdEnd must not be before jdStart.'}, 400)
+
+    # coverage is indexed in ET
+    et_times = time_axis.jdToEt(jd_times).tolist()
+
+    covering_ids = current_bodies().getBodiesCovering(*et_times)
+
+    # getBodies returns every body when no IDs are given
+    if not covering_ids:
+        return returnResponse([], 200)
+
+    covering_bodies = [dict((key, bod_dict[key]) for key in ('spice id', 'body name', 'category'))
+                       for bod_dict in current_bodies().getBodies(specific_ids=covering_ids)]
+
+    return returnResponse(covering_bodies, 200)
 
 
 @app.route('/api/spk-upload/<string:ref_frame>', methods=['POST'])
@@ -562,6 +1734,9 @@ def spk_upload(ref_frame):
         a POST request to the above URL with the specified param. This function simply obtains the uploaded file, makes
         sure it's valid, and then registers it with the SPICE subsystem and AetherBodies.
 
+        Kernels uploaded within a session (see resolve_kernel_session) are only registered with the session, and are
+        only seen by the session's requests.
+
     Params: ref_frame <str> -- the name or NAIF ID of the observing body for which min and max speeds for each object
         are calculated against. This determines the range of speeds which the frontend uses for trajectory gradients. It
         is necessary because the min and max speeds of an object are different for different observers. To avoid calling
@@ -581,7 +1756,7 @@ def spk_upload(ref_frame):
     ref_frame = ref_frame.lower()
 
     # check to make sure the reference frame is valid
-    if not aether_bodies.isValidRefFrame(ref_frame):
+    if not current_bodies().isValidRefFrame(ref_frame):
         return returnResponse({'error': '{} is not a valid reference frame.'.format(ref_frame)}, 400)
 
     # file extension for binary spk kernels
@@ -606,6 +1781,39 @@ def spk_upload(ref_frame):
 
         return returnResponse({'error': 'Only .bsp files are allowed.'}, 400)
 
+    elif g.session_id is not None:
+        # the session is created by its first upload
+        session = session_registry.get(g.session_id, create=True)
+        g.kernel_session = session
+
+        # set file path to the session's directory, and save the file under a temporary name -- a kernel uploaded
+        # before under the same name is only replaced once the new file is known to be a binary SPK kernel
+        file_path = os.path.join(session.directory, filename)
+        saved_fd, saved_path = tempfile.mkstemp(suffix='.tmp', dir=session.directory)
+        os.close(saved_fd)
+        file.save(saved_path)
+
+        # add the bodies in the kernel into the session -- other sessions and the server's kernels are untouched
+        try:
+            new_bodies = session.addKernel(file_path, saved_path)
+        except ValueError as error:
+            os.remove(saved_path)
+            return returnResponse({'error': str(error)}, 400)
+
+        # if no new bodies were added, the file may be a duplicate, or there were no new bodies in it...
+        # in this case, return a special code that the frontend will catch
+        if not new_bodies:
+            return returnResponse([], 409)
+
+        # same details as available-bodies, computed over the session's kernels
+        for bod_dict in new_bodies:
+            add_body_details(bod_dict, ref_frame, BODY_FIELDS)
+
+        # persist any newly computed speeds
+        speed_cache.save()
+
+        return returnResponse(new_bodies, 200)
+
     else:
         # set file path to the user_uploaded directory
         file_path = 'SPICE/kernels/user_uploaded/' + filename
@@ -616,9 +1824,21 @@ def spk_upload(ref_frame):
         # furnish the kernel into the SPICE subsystem
         spice.furnsh(file_path)
 
+        # the kernel watcher doesn't need to add it again
+        kernel_watcher.acknowledge(file_path)
+
+        # update everything that depends on the loaded kernels
+        refresh_kernel_state(spk_only=True)
+
         # add the bodies in the kernel into the AetherBodies object
         new_bodies = aether_bodies.addFromKernel(file_path, returnNewBodies=True)
 
+        # cached speeds of the bodies covered by the kernel, or chained through them, are out of date
+        speed_cache.invalidate(aether_bodies.getDependentBodyIDs(aether_bodies.getKernelBodyIDs(file_path)))
+
+        # recompute the warmed up observers with the new kernel
+        warmup_scheduler.schedule()
+
         # if no new bodies were added, the file may be a duplicate, or there were no new bodies in it...
         # in this case, return a special code that the frontend will catch
         if not new_bodies:
@@ -626,21 +1846,10 @@ def spk_upload(ref_frame):
 
         # traverse the new bodies and get mass, radii, min-max speeds, rotations -- same logic as available-bodies
         for bod_dict in new_bodies:
+            add_body_details(bod_dict, ref_frame, BODY_FIELDS)
 
-            bod_id = str(bod_dict['spice id'])
-
-            min_max_speeds = get_min_max_speed(bod_id, bod_dict['valid times'], ref_frame)
-            bod_dict['min speed'] = min_max_speeds[0]
-            bod_dict['max speed'] = min_max_speeds[1]
-
-            if bod_dict['has radius data']:
-                bod_dict['radius'] = get_radius(bod_id)
-
-            if bod_dict['has mass data']:
-                bod_dict['mass'] = get_mass(bod_id)
-
-            if bod_dict['has rotation data']:
-                bod_dict['rotation data'] = get_rotation_data(bod_id, bod_dict['body name'])
+        # persist any newly computed speeds
+        speed_cache.save()
 
         # DEBUG
         # print(new_bodies)
@@ -649,11 +1858,53 @@ def spk_upload(ref_frame):
         return returnResponse(new_bodies, 200)
 
 
+def remove_uploaded_kernels(kern_paths):
+    """
+    aether-rest-server.py -- remove_uploaded_kernels
+        This function removes uploaded kernels: they are unloaded from the SPICE subsystem, their files are deleted and
+        their bodies are removed from AetherBodies. Other kernels stay loaded, so the cost depends only on the kernels
+        being removed.
+
+    Params: kern_paths list[<str>] -- normalized paths of kernels in the user_uploaded directory
+
+    Returns: list[<str>] -- names of the bodies which were removed
+    """
+
+    # cached speeds of the bodies covered by the kernels, or chained through them, are out of date, including default
+    # bodies
+    changed_ids = set()
+    for kern_path in kern_paths:
+        changed_ids.update(aether_bodies.getDependentBodyIDs(aether_bodies.getKernelBodyIDs(kern_path)))
+
+    unload_kernels(kern_paths)
+
+    removed_bod_names = aether_bodies.removeUploadedKernels(kern_paths)
+
+    # the kernel watcher doesn't need to remove them again
+    for kern_path in kern_paths:
+        kernel_watcher.acknowledge(kern_path)
+
+    # update everything that depends on the loaded kernels
+    refresh_kernel_state(spk_only=True)
+
+    # keep the metakernel in line with the directories
+    mkw.write()
+
+    speed_cache.invalidate(changed_ids)
+    speed_cache.save()
+
+    # recompute the warmed up observers without the removed kernels
+    warmup_scheduler.schedule()
+
+    return removed_bod_names
+
+
 @app.route('/api/spk-clear/', methods=['GET'])
 def clear_uploaded_kernels():
     """
     aether-rest-server.py -- spk_clear
-        This function allows users to clear all the uploaded kernels.
+        This function allows users to clear all the uploaded kernels. Within a session (see resolve_kernel_session),
+        only the kernels uploaded in the session are cleared.
 
     Params: None
 
@@ -665,17 +1916,96 @@ def clear_uploaded_kernels():
     # this function modifies the aether_bodies object so it must be declared global.
     global aether_bodies
 
-    removed_bod_names = aether_bodies.removeUploadedKernels()
+    if g.session_id is not None:
+        session = g.kernel_session
+        removed_bod_names = session.removeKernels(session.getKernels()) if session is not None else list()
 
-    spice.kclear()
+        return returnResponse(removed_bod_names, 200)
 
-    mkw.write()
+    removed_bod_names = remove_uploaded_kernels(aether_bodies.getUploadedKernels())
+
+    return returnResponse(removed_bod_names, 200)
+
+
+@app.route('/api/spk-clear/<string:kernel_name>', methods=['GET'])
+def clear_uploaded_kernel(kernel_name):
+    """
+    aether-rest-server.py -- clear_uploaded_kernel
+        This function allows users to remove a single uploaded kernel. Bodies which are also covered by other kernels
+        are kept, with the valid time ranges of the remaining kernels. Within a session, only a kernel uploaded in the
+        session may be removed.
+
+    Params: kernel_name <str> -- file name of the uploaded kernel, e.g. 'my_spacecraft.bsp'
+
+    Returns: a Flask response object with a list of strings. Each string in the list is the name of a body which was
+        removed.
+
+    """
+
+    # this function modifies the aether_bodies object so it must be declared global.
+    global aether_bodies
+
+    if g.session_id is not None:
+        session = g.kernel_session
+
+        if session is not None:
+            # same file name the kernel was saved with by spk_upload
+            kern_path = os.path.normpath(os.path.join(session.directory, secure_filename(kernel_name)))
+
+            if kern_path in session.getKernels():
+                return returnResponse(session.removeKernels([kern_path]), 200)
+
+        return returnResponse({'error': '{} is not an uploaded kernel.'.format(kernel_name)}, 404)
+
+    # same file name the kernel was saved with by spk_upload
+    kern_path = os.path.normpath('SPICE/kernels/user_uploaded/' + secure_filename(kernel_name))
+
+    if kern_path not in aether_bodies.getUploadedKernels():
+        return returnResponse({'error': '{} is not an uploaded kernel.'.format(kernel_name)}, 404)
 
-    spice.furnsh("./SPICE/kernels/cumulative_metakernel.tm")
+    removed_bod_names = remove_uploaded_kernels([kern_path])
 
     return returnResponse(removed_bod_names, 200)
 
 
+@app.route('/api/native-spk-check/', methods=['GET'])
+def get_native_spk_check():
+    """
+    aether-rest-server.py -- get_native_spk_check
+        This function serves a comparison of the native SPK engine against spkpos over the currently loaded kernels
+        (see check_native_spk). It is meant for checking the engine after uploading kernels and is not used by the
+        frontend.
+
+    Params: None
+
+    Returns: a Flask response object with the comparison.
+    """
+
+    return returnResponse(check_native_spk(), 200)
+
+
+@app.route('/api/cache-stats/', methods=['GET'])
+def get_cache_stats():
+    """
+    aether-rest-server.py -- get_cache_stats
+        This function serves the hit/miss counters and size of the ephemeris cache, the response compression counters
+        under 'compression', the state of the background warm-up under 'warmup', and the number of kernel sessions
+        under 'sessions'. It is meant for sizing the caches (see AETHER_CACHE_MAX_BYTES and AETHER_CACHE_DIR) and is
+        not used by the frontend.
+
+    Params: None
+
+    Returns: a Flask response object with a dictionary of cache statistics.
+    """
+
+    cache_stats = ephemeris_cache.getStats()
+    cache_stats['compression'] = response_compressor.getStats()
+    cache_stats['warmup'] = warmup_scheduler.getStats()
+    cache_stats['sessions'] = session_registry.getStats()
+
+    return returnResponse(cache_stats, 200)
+
+
 # -------------------- MAIN --------------------
 
 # create metakernel file
@@ -685,6 +2015,24 @@ mkw.write()
 # load the kernels
 spice.furnsh("./SPICE/kernels/cumulative_metakernel.tm")
 
+# set up everything that depends on the loaded kernels
+refresh_kernel_state()
+
+# make sure the native SPK engine agrees with SPICE on the default kernels before using it
+if native_spk.isEnabled():
+    native_check = check_native_spk()
+
+    if native_check['max error km'] is not None and native_check['max error km'] > NATIVE_SPK_TOLERANCE_KM:
+        print("Native SPK engine differs from spkpos by {} km, disabling it.".format(native_check['max error km']))
+        native_spk.enabled = False
+
+# precompute available-bodies for the common observers in the background
+warmup_scheduler.schedule()
+
+# pick up kernels added to or removed from the kernel directories from now on
+if os.environ.get('AETHER_KERNEL_WATCH', '1') != '0':
+    kernel_watcher.start()
+
 signal(SIGINT, exitNicely)
 
 
@@ -3,6 +3,7 @@ import json
 import argparse
 from pprint import pprint
 import time
+from PositionPacker import PositionPacker
 
 
 def get_solar_target_positions(ip, ref_frame, target_list, startDate, endDate, steps_list):
@@ -21,6 +22,23 @@ def get_solar_target_positions(ip, ref_frame, target_list, startDate, endDate, s
 	return response, json.loads(response.text)
 
 
+def get_positions_binary(ip, ref_frame, target_list, curVizJd, curVizJdDelta, tailLenJd, validSeconds, dtype='float64'):
+
+	targets = '+'.join(target_list)
+
+	addr = 'http://{}:5000/api/positions/{}/{}/{}/{}/{}/{}'.format(ip, ref_frame, targets, curVizJd, curVizJdDelta,
+																tailLenJd, validSeconds)
+
+	# ask for the binary payload instead of JSON
+	response = requests.get(addr, params={'dtype': dtype}, headers={'Accept': 'application/octet-stream'})
+
+	# decode response -- errors are still sent as JSON
+	if response.headers['Content-Type'] != 'application/octet-stream':
+		return response, json.loads(response.text)
+
+	return response, PositionPacker().unpack(response.content)
+
+
 def get_body_info(ip, ref_frame):
 
 	addr = 'http://{}:5000/api/available-bodies/{}'.format(ip, ref_frame)
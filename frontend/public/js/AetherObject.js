@@ -551,7 +551,7 @@ class AetherObject extends Spacekit.SphereObject {
         this.ephemUpdate(wrt, obj_name, start_date_jd, jd_delta, tail_length_jd, valid_time_seconds).then(data => {  
             // adjust results to be in km and in ecliptic plane
                 let this_reference = this;
-                var position_vectors = data[this.name].positions.map(function(pos){
+                var position_vectors = data.targets[this.name].positions.map(function(pos){
                     var adjusted_val = pos.map(Spacekit.kmToAu);//[Spacekit.kmToAu(pos[0]), Spacekit.kmToAu(pos[1]), Spacekit.kmToAu(pos[2])];
                     var adjusted_val2 = Spacekit.equatorialToEcliptic_Cartesian(adjusted_val[0], adjusted_val[1], adjusted_val[2], Spacekit.getObliquity());
                     return new Spacekit.THREE.Vector3(adjusted_val2[0] * this_reference._simulation._options.unitsPerAu, adjusted_val2[1] * this_reference._simulation._options.unitsPerAu, adjusted_val2[2] * this_reference._simulation._options.unitsPerAu);
@@ -563,7 +563,7 @@ class AetherObject extends Spacekit.SphereObject {
                 
                 // update position list, time list, and line
                 this.addPositionData(position_vectors, old_data);
-                this.addTimeData(data[obj_name].times, old_data);
+                this.addTimeData(data.times, old_data);
                 this.updateLineData();
                 this.isUpdating = false; // signal that object is done updating
         });
@@ -284,6 +284,7 @@ form.addEventListener('submit', function(event){
     // Call API endpoint that will submit the new file
     fetch('http://0.0.0.0:5000/api/spk-upload/' + viz.wrt, {
         method: 'POST',
+        headers: {'X-Aether-Session': session_id},
         body: formData
     })
     .then(response => {
@@ -39,6 +39,9 @@ const origin = new Spacekit.THREE.Vector3(0,0,0);
 // A number indicating the default amount of real time between each position point, as a fraction of a day
 const default_granularity = 1/12; // 2 hours per step, 2/24
 
+// The ID of this tab's kernel session on the backend -- kernels uploaded from this tab are only seen (and cleared) by it
+const session_id = getSessionId();
+
 
 
 /*----------------- Variables -----------------*/
@@ -146,6 +149,21 @@ function capitalizeFirstLetter(string) {
     return string.charAt(0).toUpperCase() + string.slice(1);
 }
 
+/**
+    Gets the ID of this tab's kernel session on the backend, creating it the first time
+    @return {string} id - 32 random hex characters, kept in sessionStorage so that reloading the page keeps the session
+*/
+function getSessionId(){
+    let id = sessionStorage.getItem("aether-session");
+    if(id === null){
+        let bytes = new Uint8Array(16);
+        window.crypto.getRandomValues(bytes);
+        id = Array.from(bytes, byte => byte.toString(16).padStart(2, "0")).join("");
+        sessionStorage.setItem("aether-session", id);
+    }
+    return id;
+}
+
 /**
     Displays a note in the info log
     @param {string} error - Error message to be displayed
@@ -254,7 +272,9 @@ function tick1(){
 	@return {json} data - JSON of body data
 */
 async function getPositionData(ref_frame, targets, cur_jd, jd_rate, tail_length, valid_time){
-	let response = await fetch('http://0.0.0.0:5000/api/positions/' + ref_frame + '/' + targets + '/' + cur_jd + '/' + jd_rate + '/' + tail_length + '/' + valid_time);
+	let response = await fetch('http://0.0.0.0:5000/api/positions/' + ref_frame + '/' + targets + '/' + cur_jd + '/' + jd_rate + '/' + tail_length + '/' + valid_time, {
+		headers: {'X-Aether-Session': session_id}
+	});
 	let data = await response.json();
 	return data;
 }
@@ -265,17 +285,21 @@ async function getPositionData(ref_frame, targets, cur_jd, jd_rate, tail_length,
 	@return {json} data - JSON of available bodies
 */
 async function getAvailableBodies(wrt){
-	let response = await fetch('http://0.0.0.0:5000/api/available-bodies/' + wrt);
+	let response = await fetch('http://0.0.0.0:5000/api/available-bodies/' + wrt, {
+		headers: {'X-Aether-Session': session_id}
+	});
 	let data = await response.json();
 	return data;
 }
 
 /*
-	async function to clear all user-uploaded kernels from the backend
+	async function to clear all kernels uploaded from this tab from the backend
 	@return {json} data - JSON list of all deleted bodies
 */
 async function clearKernels(){
-	let response = await fetch('http://0.0.0.0:5000/api/spk-clear/');
+	let response = await fetch('http://0.0.0.0:5000/api/spk-clear/', {
+		headers: {'X-Aether-Session': session_id}
+	});
 	let data = await response.json();
 	return data;
 }
@@ -336,7 +360,7 @@ function createBodiesFromData(data, new_viz, primary_sim){
     }
 
     // Iterate over each body returned by the API call
-    for(const property in data){
+    for(const property in data.targets){
         // Array of [x,y,z] coords in AU
         var allAdjustedVals = [];
         // Array of Julian Dates corresponding to each position
@@ -344,20 +368,20 @@ function createBodiesFromData(data, new_viz, primary_sim){
         // Current Julian Date
         var cur_jd = new_viz.getJd();
 
-        // Set tail indexes
-        var cur_idx = data[property].cur_time_idx;
+        // Set tail indexes -- times and the current index are shared by every body in the response
+        var cur_idx = data.cur_time_idx;
         const tail_start_idx = 0;
         var tail_end_idx;
-        if(data[property].times.length % 2 == 0){
-            tail_end_idx = data[property].times.length / 2;
+        if(data.times.length % 2 == 0){
+            tail_end_idx = data.times.length / 2;
         }
         else {
-            tail_end_idx = Math.ceil(data[property].times.length / 2);
+            tail_end_idx = Math.ceil(data.times.length / 2);
         }
 
         // Iterate over the data for the current body
         var i = 0;
-        for(pos of data[property].positions){
+        for(pos of data.targets[property].positions){
             // Convert coordinates in km to au
             adjustedVals = pos.map(Spacekit.kmToAu);
             // Convert coords to ecliptic
@@ -366,7 +390,7 @@ function createBodiesFromData(data, new_viz, primary_sim){
             
             // Push positions and their corresponding times to arrays
             allAdjustedVals.push(vector);
-            allAdjustedTimes.push(parseFloat(data[property].times[i]));
+            allAdjustedTimes.push(parseFloat(data.times[i]));
             i++;
         }
         